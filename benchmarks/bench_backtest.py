@@ -0,0 +1,75 @@
+"""Benchmark the vectorized backtester on a synthetic point-in-time history.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_backtest
+
+Builds ``--years`` of month-end snapshots for ``--tickers`` names, with some
+turnover in the universe and missing metrics, writes them to a temporary
+``FundamentalsStore`` and times reading the store and running the backtest.
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from qvs.backtest import METRIC_COLUMNS, FundamentalsStore, backtest
+
+
+def make_history(years, tickers, seed=0):
+    """Month-end snapshots as a long frame with the store's columns."""
+    rng = np.random.default_rng(seed)
+    dates = pd.period_range('2000-01', periods=years * 12, freq='M').to_timestamp(how='end').normalize()
+    names = np.array([f'T{i:05d}' for i in range(tickers)])
+
+    # Random-walk prices; each name is listed for a random span of months.
+    log_returns = rng.normal(0.005, 0.08, (len(dates), tickers))
+    prices = 50 * np.exp(np.cumsum(log_returns, axis=0))
+    listed = rng.integers(0, len(dates), tickers)
+    delisted = listed + rng.integers(24, 2 * len(dates), tickers)
+    months = np.arange(len(dates))[:, None]
+    alive = (months >= listed * (rng.random(tickers) < 0.2)) & (months < delisted)
+
+    metrics = rng.lognormal(2.5, 0.6, (len(dates), tickers, len(METRIC_COLUMNS)))
+    metrics[rng.random(metrics.shape) < 0.03] = np.nan
+
+    d, t = np.nonzero(alive)
+    frame = pd.DataFrame({'Date': dates[d], 'Ticker': names[t], 'Price': prices[d, t]})
+    for i, column in enumerate(METRIC_COLUMNS):
+        frame[column] = metrics[d, t, i]
+    return frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--years', type=int, default=20)
+    parser.add_argument('--tickers', type=int, default=3000)
+    parser.add_argument('--top', type=int, default=50)
+    args = parser.parse_args()
+
+    history = make_history(args.years, args.tickers)
+    print(f'{len(history):,} snapshot rows, {history["Date"].nunique()} dates')
+
+    start = time.perf_counter()
+    result = backtest(history, n=args.top)
+    print(f'backtest from frame: {time.perf_counter() - start:.2f}s')
+
+    with tempfile.TemporaryDirectory() as root:
+        store = FundamentalsStore(root)
+        start = time.perf_counter()
+        store.write(history)
+        print(f'store write:         {time.perf_counter() - start:.2f}s')
+
+        start = time.perf_counter()
+        result = backtest(store, n=args.top)
+        print(f'backtest from store: {time.perf_counter() - start:.2f}s')
+
+    cumulative = result.cumulative.iloc[-1]
+    print(f'{len(result.returns)} holding periods, cumulative return {cumulative:.1%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Benchmark rendering many returns-comparison charts to files.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_charts
+
+Builds ``--scenarios`` returns frames shaped like ``compare_schemes`` output
+(equal and 80-20 rows, four timeframes) and writes each one as a PNG with
+the script's original pyplot cell (a new figure and an ``annotate`` per bar,
+saved and closed instead of shown), then with ``render_charts`` in one
+process and over ``--workers`` processes.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from qvs.plotting import render_charts
+from qvs.returns import HORIZONS
+
+
+def make_scenarios(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return {f'Universe {i}': pd.DataFrame(rng.normal(2, 8, (2, len(HORIZONS))), index=['equal', '80-20'],
+                                          columns=list(HORIZONS.values()))
+            for i in range(count)}
+
+
+def pyplot_path(scenarios, output_dir):
+    """The script's original chart cell, once per scenario."""
+    import matplotlib
+
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    for name, returns in scenarios.items():
+        labels = list(returns.columns)
+        plt.figure(figsize=(8, 6))
+        width = 0.2
+        x = np.arange(len(labels))
+        rects1 = plt.bar(x - width / 2, returns.loc['equal'], width, label='Equal Weightage', color='skyblue')
+        rects2 = plt.bar(x + width / 2, returns.loc['80-20'], width, label='80-20 Principle', color='salmon')
+        plt.xlabel('Timeframe', fontsize=12)
+        plt.ylabel('Returns (%)', fontsize=12)
+        plt.title(name, fontsize=14)
+        plt.xticks(x, labels, fontsize=10)
+        plt.yticks(fontsize=10)
+        plt.legend(fontsize=10)
+        for rects in [rects1, rects2]:
+            for rect in rects:
+                height = rect.get_height()
+                plt.annotate('{}'.format(round(height, 2)), xy=(rect.get_x() + rect.get_width() / 2, height),
+                             xytext=(0, 3), textcoords='offset points', ha='center', va='bottom',
+                             fontsize=8, weight='bold')
+        plt.grid(axis='y', linestyle='--', alpha=0.7)
+        plt.tight_layout()
+        plt.savefig(os.path.join(output_dir, f'{name}.png'))
+        plt.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenarios', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: all cores)')
+    args = parser.parse_args()
+
+    scenarios = make_scenarios(args.scenarios)
+    targets = {
+        'pyplot per chart': lambda out: pyplot_path(scenarios, out),
+        'render_charts': lambda out: render_charts(scenarios, out),
+        'render_charts (workers)': lambda out: render_charts(scenarios, out, max_workers=args.workers),
+    }
+    print(f"{'target':<25} {'seconds':>8} {'ms/chart':>9}")
+    for label, target in targets.items():
+        with tempfile.TemporaryDirectory() as out:
+            start = time.perf_counter()
+            target(out)
+            seconds = time.perf_counter() - start
+        print(f'{label:<25} {seconds:>8.3f} {seconds / args.scenarios * 1e3:>9.2f}')
+
+
+if __name__ == '__main__':
+    main()
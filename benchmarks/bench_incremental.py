@@ -0,0 +1,80 @@
+"""Benchmark incremental RV re-scoring against a full re-score.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_incremental
+
+For each universe size, ``--updates`` random batches of ``--batch`` symbols
+move every metric by a random ``--move`` fraction, as an intraday quote
+refresh does. Each batch is applied with
+``IncrementalScorer.update`` and with a full ``score`` + ``top_n`` pass.
+The top 50 of the two paths is checked for equality after every batch.
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from qvs.columns import METRICS
+from qvs.incremental import IncrementalScorer
+from qvs.pipeline import score
+from qvs.topk import top_n
+
+
+def make_universe(n, seed=0, missing=0.03):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({metric: np.round(rng.lognormal(2.5, 0.6, n), 1) for metric in METRICS})
+    for metric in METRICS:
+        frame.loc[rng.random(n) < missing, metric] = np.nan
+    frame.insert(0, 'Ticker', [f'T{i:06d}' for i in range(n)])
+    return frame
+
+
+def make_updates(frame, count, batch, move=0.01, seed=1):
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        rows = rng.choice(len(frame), batch, replace=False)
+        update = pd.DataFrame({'Ticker': frame['Ticker'].to_numpy()[rows]})
+        for metric in METRICS:
+            values = frame[metric].to_numpy()[rows]
+            update[metric] = np.round(values * (1 + rng.normal(0, move, batch)), 1)
+        yield rows, update
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 5000, 50000])
+    parser.add_argument('--batch', type=int, default=10)
+    parser.add_argument('--updates', type=int, default=20)
+    parser.add_argument('--move', type=float, default=0.01,
+                        help='standard deviation of the relative change in each value')
+    args = parser.parse_args()
+
+    print(f"{'tickers':>8} {'full (ms)':>10} {'incremental (ms)':>17} {'re-ranked':>10} {'speed-up':>9}")
+    for n in args.sizes:
+        frame = make_universe(n)
+        scorer = IncrementalScorer(frame)
+        full = incremental = 0.0
+        rescored = 0
+        for rows, update in make_updates(frame, args.updates, args.batch, args.move):
+            frame.loc[rows, list(METRICS)] = update[list(METRICS)].to_numpy()
+
+            start = time.perf_counter()
+            expected = top_n(score(frame), 'RV Score', 50)['Ticker'].tolist()
+            full += time.perf_counter() - start
+
+            start = time.perf_counter()
+            change = scorer.update(update)
+            incremental += time.perf_counter() - start
+            rescored += change.rescored
+            assert change.top == expected
+
+        full, incremental = full / args.updates, incremental / args.updates
+        print(f'{n:>8} {full * 1e3:>10.2f} {incremental * 1e3:>17.2f} '
+              f'{rescored // args.updates:>10} {full / incremental:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
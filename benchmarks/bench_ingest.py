@@ -0,0 +1,113 @@
+"""Benchmark columnar ingestion against ``DataFrame._append`` row growth.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_ingest
+
+Both paths parse the same synthetic ``advanced-stats,quote`` batch responses
+for a 5,000-symbol universe (100 symbols per batch). Peak memory is measured
+with ``tracemalloc``.
+"""
+
+import argparse
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from qvs.columns import RV_COLUMNS
+from qvs.ingest import BatchIngestor, RV_FIELDS, rv_frame
+from qvs.synthetic import make_responses, make_symbols, split_batches
+
+
+def make_batches(n, batch_size=100, seed=0):
+    """Synthetic ``advanced-stats,quote`` batch responses, about 5% of fields missing."""
+    symbols = make_symbols(n)
+    responses = make_responses(symbols, endpoints=('quote', 'advanced-stats'), seed=seed)
+    return symbols, split_batches(responses, batch_size)
+
+
+def append_path(symbols, batches):
+    """The screener's original row-by-row ``_append`` loop."""
+    # pandas warns about concatenating the all-'N/A' columns on every call.
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', FutureWarning)
+        rv_dataframe = pd.DataFrame(columns=RV_COLUMNS)
+        for data in batches:
+            for symbol in data:
+                enterprise_value = data[symbol]['advanced-stats']['enterpriseValue']
+                ebitda = data[symbol]['advanced-stats']['EBITDA']
+                gross_profit = data[symbol]['advanced-stats']['grossProfit']
+                try:
+                    ev_to_ebitda = enterprise_value/ebitda
+                except TypeError:
+                    ev_to_ebitda = np.nan
+                try:
+                    ev_to_gross_profit = enterprise_value/gross_profit
+                except TypeError:
+                    ev_to_gross_profit = np.nan
+                rv_dataframe = rv_dataframe._append(
+                    pd.Series([
+                        symbol,
+                        data[symbol]['quote']['latestPrice'],
+                        data[symbol]['quote']['peRatio'],
+                        'N/A',
+                        data[symbol]['advanced-stats']['priceToBook'],
+                        'N/A',
+                        data[symbol]['advanced-stats']['priceToSales'],
+                        'N/A',
+                        ev_to_ebitda,
+                        'N/A',
+                        ev_to_gross_profit,
+                        'N/A',
+                        'N/A',
+                        data[symbol]['advanced-stats']['year1ChangePercent'],
+                        data[symbol]['advanced-stats']['month6ChangePercent'],
+                        data[symbol]['advanced-stats']['month3ChangePercent'],
+                        data[symbol]['advanced-stats']['month1ChangePercent'],
+                        data[symbol]['advanced-stats']['marketcap']
+                    ], index=RV_COLUMNS),
+                    ignore_index=True
+                )
+    return rv_dataframe
+
+
+def columnar_path(symbols, batches):
+    ingestor = BatchIngestor(symbols, RV_FIELDS)
+    for data in batches:
+        ingestor.add_batch(data)
+    return rv_frame(ingestor)
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    frame = func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=5000)
+    parser.add_argument('--skip-append', action='store_true',
+                        help='only time the columnar path')
+    args = parser.parse_args()
+
+    symbols, batches = make_batches(args.symbols)
+    print(f"{'path':>10} {'time (s)':>10} {'peak (MB)':>10} {'frame (MB)':>11}")
+    paths = [('columnar', columnar_path)]
+    if not args.skip_append:
+        paths.append(('_append', append_path))
+    for name, func in paths:
+        elapsed, peak, frame = measure(func, symbols, batches)
+        size = frame.memory_usage(deep=True).sum()
+        print(f'{name:>10} {elapsed:>10.3f} {peak / 2**20:>10.1f} {size / 2**20:>11.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Load-test the screen end to end against the local stand-in IEX server.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_load
+
+Serves ``--symbols`` synthetic tickers (or ``--fixtures`` recorded with
+``qvs record``) from a ``StubServer``. For each ``--workers`` setting,
+``run_screen`` runs through fetch, cache, scoring and sizing, first against
+an empty response cache and then rerun from the warm cache. The server adds
+``--latency``, fails ``--error-rate`` of requests and throttles above
+``--rate-limit`` requests per second. The table shows symbols scored per
+second and the responses the server sent by status.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from qvs.pipeline import ScreenConfig, run_screen
+from qvs.stub import StubServer, load_fixtures
+from qvs.synthetic import make_listing, make_responses
+from qvs.universe import Universe
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=5000)
+    parser.add_argument('--fixtures', help='recorded fixtures to serve instead of synthetic data')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--latency', type=float, nargs=2, default=[0.02, 0.1], metavar=('LOW', 'HIGH'))
+    parser.add_argument('--error-rate', type=float, default=0.02)
+    parser.add_argument('--rate-limit', type=float, default=100.0, help='requests per second (0: none)')
+    args = parser.parse_args()
+
+    if args.fixtures:
+        responses = load_fixtures(args.fixtures)
+        universe = Universe('fixtures', sorted(responses))
+    else:
+        listing = make_listing(args.symbols)
+        responses = make_responses(listing['Symbol'])
+        universe = Universe('synthetic', listing['Symbol'], listing)
+
+    print(f"{'workers':>7} {'cache':>5} {'seconds':>8} {'symbols/s':>10} {'failed':>7}  responses")
+    with StubServer(responses, latency=tuple(args.latency), error_rate=args.error_rate,
+                    rate_limit=args.rate_limit or None, seed=0) as server:
+        for workers in args.workers:
+            with tempfile.TemporaryDirectory() as directory:
+                config = ScreenConfig(token='token', base_url=server.url, fetch_workers=workers,
+                                      cache_path=os.path.join(directory, 'cache.sqlite'))
+                for cache in ('cold', 'warm'):
+                    server.reset_stats()
+                    start = time.perf_counter()
+                    result = run_screen(universe, config)
+                    seconds = time.perf_counter() - start
+                    statuses = ' '.join(f'{status}:{count}' for status, count in server.stats()['statuses'].items())
+                    print(f'{workers:>7} {cache:>5} {seconds:>8.2f} {len(universe) / seconds:>10.0f} '
+                          f'{len(result.failed):>7}  {statuses or "-"}')
+
+
+if __name__ == '__main__':
+    main()
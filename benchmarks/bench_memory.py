@@ -0,0 +1,80 @@
+"""Compare object-dtype and compact representations of listings and history.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_memory
+
+Reports the in-memory size of ``sp500.csv`` read with ``pd.read_csv`` and
+with ``qvs.compact.read_listing``, and of a synthetic ``--symbols`` listing.
+Then builds ``--years`` of month-end history for ``--tickers`` names (as in
+``bench_backtest``) and compares opening it from a ``FundamentalsStore``
+with opening a float32 ``Panel`` saved with ``Panel.save`` and memory-mapped
+by ``Panel.load``, and the backtest run on each.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.bench_backtest import make_history
+from qvs.backtest import STORE_COLUMNS, FundamentalsStore, Panel, backtest
+from qvs.compact import compact_frame, frame_bytes, read_listing
+from qvs.synthetic import make_listing
+
+
+def megabytes(n):
+    return f'{n / 2 ** 20:8.2f} MB'
+
+
+def show(label, frame):
+    print(f'{label:<28} {megabytes(frame_bytes(frame))}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--listing', default='sp500.csv')
+    parser.add_argument('--symbols', type=int, default=50000)
+    parser.add_argument('--years', type=int, default=20)
+    parser.add_argument('--tickers', type=int, default=3000)
+    parser.add_argument('--top', type=int, default=50)
+    args = parser.parse_args()
+
+    show(f'{args.listing} read_csv', pd.read_csv(args.listing))
+    show(f'{args.listing} read_listing', read_listing(args.listing))
+    listing = make_listing(args.symbols)
+    show(f'{args.symbols} symbols', listing)
+    show(f'{args.symbols} symbols compact', compact_frame(listing))
+
+    history = make_history(args.years, args.tickers)
+    show('history', history)
+    show('history compact', compact_frame(history))
+
+    with tempfile.TemporaryDirectory() as root:
+        store = FundamentalsStore(os.path.join(root, 'store'))
+        store.write(history)
+        panel_root = os.path.join(root, 'panel')
+        Panel.from_frame(history).save(panel_root)
+
+        start = time.perf_counter()
+        panel = Panel.from_frame(store.read(columns=STORE_COLUMNS))
+        print(f'{"store read + pivot":<28} {time.perf_counter() - start:7.3f} s '
+              f'{megabytes(panel.values.nbytes + panel.prices.nbytes)}')
+        start = time.perf_counter()
+        backtest(panel, n=args.top)
+        print(f'{"backtest (float64)":<28} {time.perf_counter() - start:7.3f} s')
+
+        start = time.perf_counter()
+        mapped = Panel.load(panel_root)
+        print(f'{"Panel.load (mmap)":<28} {time.perf_counter() - start:7.3f} s '
+              f'{megabytes(mapped.values.nbytes + mapped.prices.nbytes)} on disk')
+        start = time.perf_counter()
+        backtest(mapped, n=args.top)
+        print(f'{"backtest (float32)":<28} {time.perf_counter() - start:7.3f} s')
+        del mapped
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark the vectorized percentile engine against the per-row loop.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_percentiles
+
+The per-row ``percentileofscore`` loop is quadratic, so it is only timed up to
+``--max-loop`` tickers; at those sizes the two results are also checked for
+exact equality. The ``grouped`` column ranks within ``--groups`` sectors.
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from qvs.columns import METRICS
+from qvs.ranking import assign_percentiles
+
+
+def make_frame(n, groups=11, seed=0):
+    """Random metric columns, rounded so that ties are common."""
+    rng = np.random.default_rng(seed)
+    data = {metric: np.round(rng.lognormal(2.5, 0.6, n), 1) for metric in METRICS}
+    data['GICS Sector'] = rng.integers(0, groups, n)
+    return pd.DataFrame(data)
+
+
+def loop_percentiles(frame):
+    """The screener's original per-row, per-metric loop."""
+    for row in frame.index:
+        for metric in METRICS.keys():
+            frame.loc[row, METRICS[metric]] = stats.percentileofscore(frame[metric], frame.loc[row, metric])/100
+    return frame
+
+
+def timed(func, frame, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        copy = frame.copy()
+        start = time.perf_counter()
+        func(copy)
+        best = min(best, time.perf_counter() - start)
+    return best, copy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 1000, 5000, 10000, 50000])
+    parser.add_argument('--max-loop', type=int, default=2000,
+                        help='largest universe to time the per-row loop on')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--groups', type=int, default=11)
+    args = parser.parse_args()
+
+    print(f"{'tickers':>8} {'vectorized (ms)':>16} {'grouped (ms)':>13} {'loop (ms)':>12} {'speed-up':>9}")
+    for n in args.sizes:
+        frame = make_frame(n, args.groups)
+        fast, fast_frame = timed(assign_percentiles, frame, args.repeat)
+        grouped, _ = timed(lambda f: assign_percentiles(f, group_by='GICS Sector'), frame, args.repeat)
+        if n <= args.max_loop:
+            slow, slow_frame = timed(loop_percentiles, frame, 1)
+            columns = list(METRICS.values())
+            assert np.array_equal(fast_frame[columns].to_numpy(float),
+                                  slow_frame[columns].to_numpy(float))
+            print(f'{n:>8} {fast * 1e3:>16.2f} {grouped * 1e3:>13.2f} {slow * 1e3:>12.1f} {slow / fast:>8.0f}x')
+        else:
+            print(f"{n:>8} {fast * 1e3:>16.2f} {grouped * 1e3:>13.2f} {'-':>12} {'-':>9}")
+
+
+if __name__ == '__main__':
+    main()
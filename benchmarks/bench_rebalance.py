@@ -0,0 +1,75 @@
+"""Benchmark batched rebalancing of many sub-accounts.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_rebalance
+
+Draws a 50-name target portfolio and ``--accounts`` sub-accounts, each
+holding yesterday's 50 names of which ``--overlap`` are still in the
+target, then times one ``rebalance`` call over all accounts against calling
+it once per account. The two order lists are checked against each other.
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from qvs.rebalance import rebalance
+
+
+def make_accounts(accounts, names=50, overlap=40, seed=0):
+    """A target frame and a holdings frame of ``accounts`` accounts, plus their cash."""
+    rng = np.random.default_rng(seed)
+    tickers = np.array([f'T{i:04d}' for i in range(names * 3)])
+    prices = pd.Series(rng.lognormal(4, 1, len(tickers)).round(2), index=tickers)
+    target = pd.DataFrame({'Ticker': tickers[:names], 'Price': prices.iloc[:names].to_numpy(),
+                           'Weight': np.full(names, 1 / names)})
+
+    kept = np.argsort(rng.random((accounts, names)), axis=1)[:, :overlap]
+    dropped = names + np.argsort(rng.random((accounts, len(tickers) - names)), axis=1)[:, :names - overlap]
+    columns = np.concatenate([kept, dropped], axis=1)
+    sizes = rng.lognormal(12, 1, accounts)
+    shares = np.floor(sizes[:, None] / names / prices.to_numpy()[columns] * rng.uniform(0.7, 1.3, columns.shape))
+    holdings = pd.DataFrame({
+        'Account': np.repeat([f'A{i:06d}' for i in range(accounts)], names),
+        'Ticker': tickers[columns].ravel(),
+        'Shares': shares.ravel(),
+        'Price': prices.to_numpy()[columns].ravel(),
+    })
+    cash = pd.Series(sizes * rng.uniform(0, 0.05, accounts), index=pd.unique(holdings['Account']))
+    return target, holdings, cash
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--accounts', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--overlap', type=int, default=40, help='names kept from the previous portfolio')
+    parser.add_argument('--band', type=float, default=0.002)
+    parser.add_argument('--turnover', type=float, default=0.2)
+    parser.add_argument('--loop-limit', type=int, default=1000, help='largest account count to loop over')
+    args = parser.parse_args()
+    options = dict(lot_size=1, band=args.band, turnover=args.turnover)
+
+    print(f"{'accounts':>9} {'orders':>8} {'batch (s)':>10} {'loop (s)':>10} {'speedup':>8}")
+    for n in args.accounts:
+        target, holdings, cash = make_accounts(n, overlap=args.overlap)
+        start = time.perf_counter()
+        plan = rebalance(holdings, target, cash=cash, **options)
+        batch = time.perf_counter() - start
+
+        loop = ''
+        if n <= args.loop_limit:
+            start = time.perf_counter()
+            orders = [rebalance(group, target, cash=cash[[account]], **options).orders
+                      for account, group in holdings.groupby('Account', sort=False)]
+            seconds = time.perf_counter() - start
+            orders = pd.concat(orders, ignore_index=True)
+            assert orders[['Account', 'Ticker', 'Shares']].equals(plan.orders[['Account', 'Ticker', 'Shares']])
+            loop = f'{seconds:>10.3f} {seconds / batch:>7.0f}x'
+        print(f'{n:>9} {len(plan.orders):>8} {batch:>10.3f} {loop}')
+
+
+if __name__ == '__main__':
+    main()
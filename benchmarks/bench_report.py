@@ -0,0 +1,101 @@
+"""Benchmark report export: scenario sheets through each writer.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_report
+
+Writes ``--sheets`` scenario frames of ``--rows`` rows each (RV columns plus
+share counts) with the original ``pd.ExcelWriter`` + ``set_column`` path,
+the streaming ``ReportWriter``, and the Parquet and CSV exporters. With
+``--memory`` each target is run a second time under ``tracemalloc`` to report
+its peak allocation (tracing slows Python down, so it is not timed).
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from qvs.columns import RV_COLUMNS
+from qvs.report import ReportWriter, column_kind, export_scenarios
+
+
+def make_scenarios(sheets, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    scenarios = {}
+    for i in range(sheets):
+        frame = pd.DataFrame(rng.random((rows, len(RV_COLUMNS) - 1)), columns=RV_COLUMNS[1:])
+        frame.insert(0, 'Ticker', [f'T{j:05d}' for j in range(rows)])
+        frame['Number of Shares to Buy'] = rng.integers(0, 1000, rows)
+        scenarios[f'Scenario {i}'] = frame
+    return scenarios
+
+
+def excelwriter_path(scenarios, path):
+    """The screener's original pandas ``ExcelWriter`` approach, one sheet per scenario."""
+    writer = pd.ExcelWriter(path, engine='xlsxwriter')
+    templates = {}
+    for name, frame in scenarios.items():
+        frame.to_excel(writer, sheet_name=name, index=False)
+        sheet = writer.sheets[name]
+        for i, column in enumerate(frame.columns):
+            kind = column_kind(column, frame[column].dtype)
+            if kind not in templates:
+                templates[kind] = writer.book.add_format({'border': 1})
+            sheet.set_column(i, i, 25, templates[kind])
+            sheet.write(0, i, column, templates[kind])
+    writer.close()
+
+
+def reportwriter_path(scenarios, path):
+    with ReportWriter(path) as report:
+        for name, frame in scenarios.items():
+            report.add_sheet(frame, name)
+
+
+def timed(func):
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        func(directory)
+        return time.perf_counter() - start
+
+
+def peak_memory(func):
+    with tempfile.TemporaryDirectory() as directory:
+        tracemalloc.start()
+        func(directory)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sheets', type=int, default=100)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--skip-excelwriter', action='store_true',
+                        help='leave out the slow pandas ExcelWriter path')
+    parser.add_argument('--memory', action='store_true', help='also report peak traced memory')
+    args = parser.parse_args()
+
+    scenarios = make_scenarios(args.sheets, args.rows)
+    targets = [('ReportWriter', lambda d: reportwriter_path(scenarios, os.path.join(d, 'report.xlsx'))),
+               ('parquet', lambda d: export_scenarios(scenarios, os.path.join(d, 'parquet'), 'parquet')),
+               ('csv', lambda d: export_scenarios(scenarios, os.path.join(d, 'csv'), 'csv'))]
+    if not args.skip_excelwriter:
+        targets.insert(0, ('ExcelWriter', lambda d: excelwriter_path(scenarios, os.path.join(d, 'pandas.xlsx'))))
+
+    print(f'{args.sheets} sheets x {args.rows} rows')
+    print(f"{'target':>13} {'time (s)':>9} {'peak (MB)':>10}")
+    for name, func in targets:
+        elapsed = timed(func)
+        peak = f'{peak_memory(func) / 2**20:.1f}' if args.memory else '-'
+        print(f'{name:>13} {elapsed:>9.2f} {peak:>10}')
+
+
+if __name__ == '__main__':
+    main()
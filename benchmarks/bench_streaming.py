@@ -0,0 +1,63 @@
+"""Benchmark the streaming (asyncio) screen against fetch-then-score.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_streaming
+
+Serves synthetic batch responses for ``--symbols`` tickers from a local
+``StubServer`` that delays every response by a random ``--latency`` range,
+then times ``run_screen`` end to end with and without ``stream``. The
+streamed scores are checked against the sequential ones.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from qvs.pipeline import ScreenConfig, run_screen
+from qvs.stub import StubServer
+from qvs.synthetic import make_listing, make_responses
+from qvs.universe import Universe
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, nargs='+', default=[5000, 50000])
+    parser.add_argument('--latency', type=float, nargs=2, default=[0.05, 0.25],
+                        metavar=('LOW', 'HIGH'), help='response delay range in seconds')
+    parser.add_argument('--workers', type=int, default=32, help='concurrent batch requests')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'symbols':>8} {'mode':>10} {'total (s)':>10} {'fetch (s)':>10} {'after (s)':>10}")
+    for n in args.symbols:
+        listing = make_listing(n)
+        universe = Universe('synthetic', listing['Symbol'], listing)
+        with StubServer(make_responses(listing['Symbol']), latency=tuple(args.latency)) as server:
+            results = {}
+            for stream in (False, True):
+                config = ScreenConfig(token='token', base_url=server.url, fetch_workers=args.workers,
+                                      stream=stream)
+                best = None
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    result = run_screen(universe, config)
+                    total = time.perf_counter() - start
+                    if best is None or total < best[0]:
+                        fetch = sum(stage.seconds for stage in result.stages if stage.name == 'fetch')
+                        best = (total, fetch)
+                results[stream] = result
+                total, fetch = best
+                mode = 'streaming' if stream else 'sequential'
+                print(f'{n:>8} {mode:>10} {total:>10.3f} {fetch:>10.3f} {total - fetch:>10.3f}')
+
+        columns = results[False].scored.columns[1:]
+        same = np.allclose(results[False].scored[columns].to_numpy(dtype=float),
+                           results[True].scored[columns].to_numpy(dtype=float), equal_nan=True)
+        print(f'{n:>8} scores match: {same}')
+        assert same
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Benchmark the parameter sweep on a synthetic point-in-time history.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_sweep
+
+Builds ``--years`` of month-end snapshots for ``--tickers`` names (as in
+``bench_backtest``), assigns each name a random GICS sector, and times
+``Sweep`` preparation (the rank matrices) and a random search of
+``--candidates`` configurations over ``--workers`` processes. For
+comparison it also times running ``backtest`` from scratch for a few
+configurations. The best results are printed and, with ``--results``,
+stored in a ``ResultStore``.
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_backtest import make_history
+from qvs.backtest import backtest
+from qvs.sweep import ResultStore, Sweep, random_candidates
+from qvs.synthetic import GICS_SECTORS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--tickers', type=int, default=1000)
+    parser.add_argument('--candidates', type=int, default=100000)
+    parser.add_argument('--weight-step', type=float, default=0.05)
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: all cores)')
+    parser.add_argument('--results', help='SQLite file to store the results in')
+    args = parser.parse_args()
+
+    history = make_history(args.years, args.tickers)
+    tickers = history['Ticker'].unique()
+    rng = np.random.default_rng(0)
+    sectors = pd.Series(np.array(GICS_SECTORS)[rng.integers(0, len(GICS_SECTORS), len(tickers))],
+                        index=tickers)
+
+    start = time.perf_counter()
+    for n in (25, 50, 100):
+        backtest(history, n=n)
+    per_backtest = (time.perf_counter() - start) / 3
+    print(f'backtest from scratch: {per_backtest:.3f}s per configuration')
+
+    start = time.perf_counter()
+    sweep = Sweep(history, sectors=sectors)
+    print(f'sweep preparation:     {time.perf_counter() - start:.3f}s')
+
+    candidates = random_candidates(args.candidates, weight_step=args.weight_step)
+    weights = candidates.groupby(sweep.metrics).ngroups
+    start = time.perf_counter()
+    results = sweep.run(candidates, max_workers=args.workers)
+    seconds = time.perf_counter() - start
+    print(f'{len(candidates):,} candidates ({weights:,} weight vectors): {seconds:.1f}s, '
+          f'{seconds / len(candidates) * 1e3:.3f} ms each, '
+          f'{per_backtest * len(candidates) / seconds:.0f}x faster than separate backtests')
+
+    print(results.nlargest(5, 'sharpe').to_string(index=False))
+    if args.results:
+        with ResultStore(args.results) as store:
+            store.save(f'random-{args.candidates}', results, years=args.years, tickers=args.tickers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark partial top-N selection against sort-and-slice.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_topk
+
+``sort`` is the screener's original ``sort_values(...)[:50]``, ``top_n`` is
+the partial selection and ``streaming`` feeds the same rows to
+``StreamingTopK`` in 100-row batches.
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from qvs.topk import StreamingTopK, top_n
+
+
+def make_frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Ticker': [f'T{i:07d}' for i in rng.permutation(n)],
+        'RV Score': np.round(rng.random(n), 4),
+    })
+
+
+def sort_path(frame, n):
+    frame = frame.sort_values('RV Score', ascending=True)
+    return frame[:n].reset_index(drop=True)
+
+
+def streaming_path(frame, n, batch_size=100):
+    top = StreamingTopK('RV Score', n)
+    for start in range(0, len(frame), batch_size):
+        top.push(frame.iloc[start:start + batch_size])
+    return top.top
+
+
+def best_of(func, repeat, *args):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5000, 50000, 500000, 5000000])
+    parser.add_argument('--top', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-streaming', type=int, default=50000,
+                        help='largest universe to run the 100-row streaming path on')
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'sort (ms)':>10} {'top_n (ms)':>11} {'streaming (ms)':>15}")
+    for n in args.sizes:
+        frame = make_frame(n)
+        assert np.array_equal(sort_path(frame, args.top)['RV Score'],
+                              top_n(frame, 'RV Score', args.top)['RV Score'])
+        sort_time = best_of(sort_path, args.repeat, frame, args.top)
+        top_time = best_of(lambda f, k: top_n(f, 'RV Score', k), args.repeat, frame, args.top)
+        if n <= args.max_streaming:
+            streaming = f'{best_of(streaming_path, 1, frame, args.top) * 1e3:>15.1f}'
+        else:
+            streaming = f"{'-':>15}"
+        print(f'{n:>9} {sort_time * 1e3:>10.1f} {top_time * 1e3:>11.1f} {streaming}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Benchmark the dated membership index against filtering the interval table.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_universe
+
+Starts a ``MembershipIndex`` from a synthetic ``--members``-stock listing
+and applies ``--updates`` monthly listings. Each one replaces a few
+members and renames one. It then times "members as of D" lookups for
+random dates against a pandas filter of the interval table, and the
+backtest ``mask`` for every month-end. It also reports how many request
+batches the last update rewrote, compared with rebuilding them all.
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from qvs.synthetic import make_listing
+from qvs.universe import MembershipIndex
+
+
+def make_index(members, updates, churn=2, seed=0):
+    """An index after ``updates`` monthly listings with ``churn`` swaps and one rename each."""
+    rng = np.random.default_rng(seed)
+    pool = make_listing(members + updates * churn, seed=seed)
+    listing = pool.iloc[:members]
+    start = pd.Timestamp('2000-01-31')
+    index = MembershipIndex.from_listing(listing, start)
+    spare = members
+    for month in range(1, updates + 1):
+        leaving = rng.choice(len(listing), churn, replace=False)
+        listing = pd.concat([listing.drop(listing.index[leaving]), pool.iloc[spare:spare + churn]])
+        spare += churn
+        renamed = listing.index[rng.integers(len(listing))]
+        listing.loc[renamed, 'Symbol'] = f"{listing.loc[renamed, 'Symbol']}.{month}"
+        changes = index.update(listing, start + pd.offsets.MonthEnd(month))
+    return index, changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--members', type=int, default=500)
+    parser.add_argument('--updates', type=int, default=240, help='monthly listing updates')
+    parser.add_argument('--queries', type=int, default=2000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index, changes = make_index(args.members, args.updates)
+    print(f'{args.updates} updates: {time.perf_counter() - start:.3f}s, {len(index.intervals)} intervals')
+
+    rng = np.random.default_rng(1)
+    dates = index.dates[0] + pd.to_timedelta(rng.integers(0, (index.dates[-1] - index.dates[0]).days,
+                                                          args.queries), unit='D')
+    intervals = index.intervals
+
+    start = time.perf_counter()
+    filtered = [intervals.loc[(intervals['Start'] <= date) & ~(intervals['End'] <= date), 'Symbol'].tolist()
+                for date in dates]
+    scan = time.perf_counter() - start
+    start = time.perf_counter()
+    indexed = [index.symbols(date) for date in dates]
+    lookup = time.perf_counter() - start
+    assert all(sorted(a) == sorted(b) for a, b in zip(filtered, indexed))
+    print(f'as-of lookup: {lookup / args.queries * 1e6:.0f} us (interval filter: '
+          f'{scan / args.queries * 1e6:.0f} us)')
+
+    month_ends = pd.date_range(index.dates[0], index.dates[-1], freq=pd.offsets.MonthEnd())
+    start = time.perf_counter()
+    mask = index.mask(month_ends, intervals['Symbol'].unique())
+    print(f'backtest mask {mask.shape}: {(time.perf_counter() - start) * 1e3:.1f} ms')
+    print(f'last update: {changes}, rewrote {len(changes.batches)} of {len(index.batches)} batches')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""Time every stage of the RV screen on synthetic universes, against a baseline.
+
+Run from the repository root:
+
+    python -m benchmarks.suite                    # compare with baseline.json
+    python -m benchmarks.suite --save-baseline    # record a new baseline
+
+For each ``--sizes`` universe, ``qvs.synthetic`` generates a listing and
+IEX-shaped ``quote``/``stats``/``advanced-stats`` responses. The responses
+are served by a local ``StubServer``, and the run goes through fetch,
+ingest, impute, percentile, RV score, top-K, sizing, returns and export,
+with each stage timed by a ``Recorder``. After one untimed warm-up run, the
+best of ``--repeat`` runs is kept per stage. A stage regresses when it is
+more than ``--tolerance`` slower than its baseline, and also more than
+``--min-delta`` seconds slower.
+Any regression makes the suite exit with status 1. Baselines depend on the
+machine, so record one on the machine the suite is compared on.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from qvs.cleaning import clean_metrics
+from qvs.columns import METRICS
+from qvs.fetch import BatchFetcher
+from qvs.ingest import BatchIngestor, RV_FIELDS, rv_frame
+from qvs.instrument import Recorder
+from qvs.ranking import assign_percentiles
+from qvs.report import ReportWriter
+from qvs.returns import compare_schemes
+from qvs.stub import StubServer
+from qvs.synthetic import make_listing, make_responses
+from qvs.topk import top_n
+from qvs.weighting import allocate
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+STAGES = ['fetch', 'ingest', 'impute', 'percentile', 'rv score', 'top-k', 'sizing', 'returns', 'export']
+
+
+def run_stages(url, listing, recorder, directory):
+    """One screen of ``listing`` against the stub at ``url``, one recorder stage per step."""
+    symbols = listing['Symbol'].tolist()
+    with recorder.stage('fetch', rows=len(symbols)) as stage, \
+            BatchFetcher('token', base_url=url) as fetcher:
+        data = fetcher.fetch(symbols).data
+        stage.requests, stage.bytes = fetcher.requests, fetcher.bytes_received
+    with recorder.stage('ingest', rows=len(data)):
+        ingestor = BatchIngestor(symbols, RV_FIELDS)
+        ingestor.add_batch(data)
+        frame = rv_frame(ingestor)
+    with recorder.stage('impute', rows=len(frame)):
+        frame['GICS Sector'] = listing['GICS Sector'].to_numpy()
+        frame, _ = clean_metrics(frame, group_by='GICS Sector')
+    with recorder.stage('percentile', rows=len(frame)):
+        assign_percentiles(frame)
+    with recorder.stage('rv score', rows=len(frame)):
+        frame['RV Score'] = frame[list(METRICS.values())].mean(axis=1)
+    with recorder.stage('top-k', rows=len(frame)):
+        portfolio = top_n(frame, 'RV Score', 50)
+    with recorder.stage('sizing', rows=len(portfolio)):
+        portfolio = allocate(portfolio, 1000000.0)
+    with recorder.stage('returns', rows=len(portfolio)):
+        compare_schemes(portfolio, ['equal', '80-20'])
+    with recorder.stage('export', rows=len(frame)), \
+            ReportWriter(os.path.join(directory, 'value_strategy.xlsx')) as report:
+        report.add_sheet(portfolio, 'Value Strategy')
+        report.add_sheet(frame, 'Universe')
+
+
+def measure(n, repeat, missing, null_fundamentals, profile_dir=None):
+    """Best time of every stage over ``repeat`` runs on an ``n``-symbol universe."""
+    listing = make_listing(n)
+    responses = make_responses(listing['Symbol'], missing=missing, null_fundamentals=null_fundamentals)
+    best = {}
+    with StubServer(responses) as server, tempfile.TemporaryDirectory() as directory:
+        run_stages(server.url, listing, Recorder(), directory)
+        for _ in range(repeat):
+            recorder = Recorder(profile_dir=profile_dir and os.path.join(profile_dir, str(n)))
+            run_stages(server.url, listing, recorder, directory)
+            for stage in recorder.stages:
+                best[stage.name] = min(best.get(stage.name, float('inf')), stage.seconds)
+    return best
+
+
+def regressions(results, baseline, tolerance, min_delta):
+    """``(size, stage, seconds, baseline seconds)`` for every stage slower than allowed."""
+    slow = []
+    for size, stages in results.items():
+        for name, seconds in stages.items():
+            base = baseline.get(size, {}).get(name)
+            if base is not None and seconds > base * (1 + tolerance) and seconds - base > min_delta:
+                slow.append((size, name, seconds, base))
+    return slow
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 5000, 50000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--missing', type=float, default=0.05,
+                        help='share of response fields that are null')
+    parser.add_argument('--null-fundamentals', type=float, default=0.05,
+                        help='extra share of null EBITDA and grossProfit')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='allowed slowdown as a fraction of the baseline')
+    parser.add_argument('--min-delta', type=float, default=0.02,
+                        help='slowdowns smaller than this many seconds are ignored')
+    parser.add_argument('--profile', nargs='?', const='profiles', default=None, metavar='DIR',
+                        help='write a cProfile dump per stage')
+    args = parser.parse_args()
+
+    baseline = {}
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    print(f"{'symbols':>8} {'stage':>11} {'time (ms)':>10} {'baseline':>10} {'ratio':>6}")
+    for n in args.sizes:
+        results[str(n)] = stages = measure(n, args.repeat, args.missing, args.null_fundamentals, args.profile)
+        for name in STAGES:
+            base = baseline.get(str(n), {}).get(name)
+            ratio = f'{stages[name] / base:.2f}' if base else '-'
+            base = f'{base * 1e3:.1f}' if base is not None else '-'
+            print(f'{n:>8} {name:>11} {stages[name] * 1e3:>10.1f} {base:>10} {ratio:>6}')
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'baseline written to {args.baseline}')
+        return
+
+    slow = regressions(results, baseline, args.tolerance, args.min_delta)
+    for size, name, seconds, base in slow:
+        print(f'REGRESSION: {name} at {size} symbols took {seconds * 1e3:.1f} ms '
+              f'(baseline {base * 1e3:.1f} ms)', file=sys.stderr)
+    if slow:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -15,24 +15,45 @@ For this project, we're going to build an investing strategy that selects the 50
 The first thing we need to do is import the open-source software libraries that we'll be using in this tutorial.
 """
 
-pip install xlsxwriter pandas numpy spicy
+# In Colab, install the dependencies first: !pip install xlsxwriter pandas numpy requests
+
+import os
 
-import numpy as np
 import pandas as pd
-import xlsxwriter
-import math
 import requests
-from spicy import stats
+
+"""Each stage of the screener below is timed by a `Recorder` from `qvs/instrument.py`. Run the script with `--profile` to also record the peak memory of every stage, write a cProfile dump per stage to `profiles/` and save a JSON run report at the end."""
+
+from qvs.instrument import Recorder
+
+recorder = Recorder.from_argv()
 
 """## Importing Our List of Stocks & API Token
 As before, we'll need to import our list of stocks and our API token before proceeding. Make sure the .csv file is still in your working directory and import it with the following command:
 """
 
-stocks = pd.read_csv('/content/sp500.csv')
+"""`read_listing` from `qvs/compact.py` only parses the columns the screener uses and stores the sectors and sub-industries as categoricals instead of one Python string per row."""
+
+from qvs.compact import read_listing
+
+stocks = read_listing('sp500.csv')
 stocks
 
-from google.colab import userdata
-API_TOKEN = userdata.get('API_TOKEN')
+"""The token is read from the `IEX_TOKEN` environment variable, falling back to the Colab secret `API_TOKEN`."""
+
+API_TOKEN = os.environ.get('IEX_TOKEN')
+if API_TOKEN is None:
+    try:
+        from google.colab import userdata
+        API_TOKEN = userdata.get('API_TOKEN')
+    except ImportError:
+        pass
+
+"""IEX Cloud has been shut down, so every API call below goes to `BASE_URL`. Set the `IEX_BASE_URL` environment variable to point the script at a local stand-in: `qvs serve` serves synthetic responses for `sp500.csv`, or ones captured earlier with `qvs record`, at `http://127.0.0.1:8000`. The stand-in accepts any token."""
+
+from qvs.fetch import IEX_BASE_URL
+
+BASE_URL = os.environ.get('IEX_BASE_URL', IEX_BASE_URL)
 
 """## Making Our First API Call
 It's now time to make the first version of our value screener!
@@ -41,7 +62,7 @@ We'll start by building a simple value screener that ranks securities based on a
 """
 
 symbol = 'AAPL'
-api_url = f'https://cloud.iexapis.com/stable/stock/{symbol}/stats?token={API_TOKEN}'
+api_url = f'{BASE_URL}/stock/{symbol}/stats?token={API_TOKEN}'
 data = requests.get(api_url).json()
 data
 
@@ -57,42 +78,37 @@ data['peRatio']
 
 Just like in our first project, it's now time to execute several batch API calls and add the information we need to our DataFrame.
 
-We'll start by running the following code cell, which contains some code we already built last time that we can re-use for this project. More specifically, it contains a function called chunks that we can use to divide our list of securities into groups of 100.
-"""
+In the first project we split our list of securities into groups of 100 on every run. Here the groups are kept from run to run instead.
 
-# Function sourced from
-# https://stackoverflow.com/questions/312443/how-do-you-split-a-list-into-evenly-sized-chunks
-def chunks(lst, n):
-    """Yield successive n-sized chunks from lst."""
-    for i in range(0, len(lst), n):
-        yield lst[i:i + n]
+`sp500.csv` is only today's snapshot. `MembershipIndex` from `qvs/universe.py` keeps the index membership over time in `sp500_membership.json`, keyed by `CIK`, so a ticker change is recorded as a rename rather than one company leaving and another joining. Each run diffs the listing against the last one. Only the 100-symbol batches in `membership.batches` that lost or gained symbols are rewritten, and cached responses for tickers that left are dropped. The fetches below request along these batches, so a batch whose symbols are all cached is skipped and only changed batches and stale entries go to the API."""
 
-symbol_groups = list(chunks(stocks['Symbol'], 100))
-symbol_strings = []
-for i in range(0, len(symbol_groups)):
-    symbol_strings.append(','.join(symbol_groups[i]))
-#     print(symbol_strings[i])
+from qvs.cache import ResponseCache
+from qvs.universe import MembershipIndex
 
-my_columns = ['Ticker', 'Price', 'Price-to-Earnings Ratio']
+cache = ResponseCache('iex_cache.sqlite')
+membership, membership_changes = MembershipIndex.sync('sp500_membership.json', stocks, cache = cache)
+membership_changes
 
-"""Now we need to create a blank DataFrame and add our data to the data frame one-by-one."""
+"""Now we need to fill our DataFrame with the data from each batch. Rather than appending rows one-by-one (which copies the whole DataFrame every time), `BatchIngestor` writes each response into preallocated numeric columns and builds the DataFrame once at the end.
 
-final_dataframe = pd.DataFrame(columns = my_columns)
+The batches are requested concurrently by `BatchFetcher`, which sends the same 100-symbol batch calls over one pooled connection, retries throttled requests and reports any symbols it could not fetch instead of failing with a `KeyError`.
 
-for symbol_string in symbol_strings:
-#     print(symbol_strings)
-    batch_api_call_url = f'https://cloud.iexapis.com/stable/stock/market/batch/?types=stats,quote&symbols={symbol_string}&token={API_TOKEN}'
-    data = requests.get(batch_api_call_url).json()
-    for symbol in symbol_string.split(','):
-        final_dataframe = final_dataframe._append(
-                                        pd.Series([symbol,
-                                                   data[symbol]['quote']['latestPrice'],
-                                                   data[symbol]['stats']['peRatio']
-                                                   ],
-                                                  index = my_columns),
-                                        ignore_index = True)
+Responses are also kept in a local `ResponseCache`. Prices expire after 15 minutes and fundamentals after a day, so rerunning the screener later in the day only requests what has gone stale.
+"""
+
+from qvs.cache import CachedFetcher
+from qvs.fetch import BatchFetcher
+from qvs.ingest import BatchIngestor, PE_FIELDS
+
+pe_ingestor = BatchIngestor(stocks['Symbol'], PE_FIELDS)
 
+with BatchFetcher(API_TOKEN, types = ('stats', 'quote'), base_url = BASE_URL) as fetcher:
+    pe_ingestor.add_batch(CachedFetcher(fetcher, cache).fetch(stocks['Symbol'], groups = membership.batches).data)
 
+if pe_ingestor.missing:
+    print(f'Could not fetch {len(pe_ingestor.missing)} symbols: {pe_ingestor.missing}')
+
+final_dataframe = pe_ingestor.to_frame()
 final_dataframe
 
 """## Removing Glamour Stocks
@@ -101,14 +117,13 @@ The opposite of a "value stock" is a "glamour stock".
 
 Since the goal of this strategy is to identify the 50 best value stocks from our universe, our next step is to remove glamour stocks from the DataFrame.
 
-We'll sort the DataFrame by the stocks' price-to-earnings ratio, and drop all stocks outside the top 50.
+We'll keep the 50 stocks with the lowest positive price-to-earnings ratio. `top_n` gives the same result as sorting the DataFrame and slicing off the first 50 rows, but it only sorts the rows that make the cut, and it breaks ties by ticker so the result is always the same.
 """
 
-final_dataframe.sort_values('Price-to-Earnings Ratio', inplace = True)
+from qvs.topk import top_n
+
 final_dataframe = final_dataframe[final_dataframe['Price-to-Earnings Ratio'] > 0]
-final_dataframe = final_dataframe[:50]
-final_dataframe.reset_index(inplace = True)
-final_dataframe.drop('index', axis = 1, inplace = True)
+final_dataframe = top_n(final_dataframe, 'Price-to-Earnings Ratio', 50)
 final_dataframe
 
 """## Calculating the Number of Shares to Buy
@@ -120,24 +135,25 @@ I have included this function below.
 """
 
 def portfolio_input():
-    global portfolio_size
-    portfolio_size = input("Enter the value of your portfolio:")
+    value = os.environ.get('PORTFOLIO_SIZE')
+    while True:
+        if value is None:
+            value = input("Enter the value of your portfolio:")
+        try:
+            return float(value)
+        except ValueError:
+            print("That's not a number! \n Try again:")
+            value = None
 
-    try:
-        val = float(portfolio_size)
-    except ValueError:
-        print("That's not a number! \n Try again:")
-        portfolio_size = input("Enter the value of your portfolio:")
+"""Use the `portfolio_input` function to accept a `portfolio_size` variable from the user of this script. Setting the `PORTFOLIO_SIZE` environment variable skips the prompt, so the script can run unattended; `qvs screen` (see the README) is the fully headless version."""
 
-"""Use the `portfolio_input` function to accept a `portfolio_size` variable from the user of this script."""
+portfolio_size = portfolio_input()
 
-portfolio_input()
+"""You can now use the `portfolio_size` variable to calculate the number of shares that our strategy should purchase. `allocate` sizes every position in one array operation: it gives each stock an equal weight and rounds the dollar amount down to whole shares."""
 
-"""You can now use the global `portfolio_size` variable to calculate the number of shares that our strategy should purchase."""
+from qvs.weighting import allocate
 
-position_size = float(portfolio_size) / len(final_dataframe.index)
-for i in range(0, len(final_dataframe['Ticker'])-1):
-    final_dataframe.loc[i, 'Number Of Shares to Buy'] = math.floor(position_size / final_dataframe['Price'][i])
+final_dataframe = allocate(final_dataframe, portfolio_size, shares_column = 'Number Of Shares to Buy')
 final_dataframe
 
 """## Building a Better (and More Realistic) Value Strategy
@@ -159,7 +175,7 @@ Some of these metrics aren't provided directly by the IEX Cloud API, and must be
 """
 
 symbol = 'AAPL'
-batch_api_call_url = f'https://cloud.iexapis.com/stable/stock/market/batch/?types=advanced-stats,quote&symbols={symbol}&token={API_TOKEN}'
+batch_api_call_url = f'{BASE_URL}/stock/market/batch/?types=advanced-stats,quote&symbols={symbol}&token={API_TOKEN}'
 data = requests.get(batch_api_call_url).json()
 
 # P/E Ratio
@@ -180,71 +196,23 @@ ev_to_ebitda = enterprise_value/ebitda
 gross_profit = data[symbol]['advanced-stats']['grossProfit']
 ev_to_gross_profit = enterprise_value/gross_profit
 
-"""Let's move on to building our DataFrame. You'll notice that I use the abbreviation `rv` often. It stands for `robust value`, which is what we'll call this sophisticated strategy moving forward."""
-
-rv_columns = [
-    'Ticker',
-    'Price',
-    'Price-to-Earnings Ratio',
-    'PE Percentile',
-    'Price-to-Book Ratio',
-    'PB Percentile',
-    'Price-to-Sales Ratio',
-    'PS Percentile',
-    'EV/EBITDA',
-    'EV/EBITDA Percentile',
-    'EV/GP',
-    'EV/GP Percentile',
-    'RV Score',
-    'One-Year Price Return',
-    'Six-Month Price Return',
-    'Three-Month Price Return',
-    'One-Month Price Return'
-]
-
-rv_dataframe = pd.DataFrame(columns = rv_columns)
-
-for symbol_string in symbol_strings:
-    batch_api_call_url = f'https://cloud.iexapis.com/stable/stock/market/batch/?types=advanced-stats,quote&symbols={symbol_string}&token={API_TOKEN}'
-    data = requests.get(batch_api_call_url).json()
-    for symbol in symbol_string.split(','):
-        enterprise_value = data[symbol]['advanced-stats']['enterpriseValue']
-        ebitda = data[symbol]['advanced-stats']['EBITDA']
-        gross_profit = data[symbol]['advanced-stats']['grossProfit']
+"""Let's move on to building our DataFrame. You'll notice that I use the abbreviation `rv` often. It stands for `robust value`, which is what we'll call this sophisticated strategy moving forward. Its columns (`RV_COLUMNS` in `qvs/columns.py`) are the ticker and price, each value metric with its percentile, the RV Score and the price returns used later."""
 
-        try:
-            ev_to_ebitda = enterprise_value/ebitda
-        except TypeError:
-            ev_to_ebitda = np.NaN
+from qvs.ingest import RV_FIELDS, rv_frame
 
-        try:
-            ev_to_gross_profit = enterprise_value/gross_profit
-        except TypeError:
-            ev_to_gross_profit = np.NaN
-
-        rv_dataframe = rv_dataframe._append(
-            pd.Series([
-                symbol,
-                data[symbol]['quote']['latestPrice'],
-                data[symbol]['quote']['peRatio'],
-                'N/A',
-                data[symbol]['advanced-stats']['priceToBook'],
-                'N/A',
-                data[symbol]['advanced-stats']['priceToSales'],
-                'N/A',
-                ev_to_ebitda,
-                'N/A',
-                ev_to_gross_profit,
-                'N/A',
-                'N/A',
-                data[symbol]['advanced-stats']['year1ChangePercent'],
-                data[symbol]['advanced-stats']['month6ChangePercent'],
-                data[symbol]['advanced-stats']['month3ChangePercent'],
-                data[symbol]['advanced-stats']['month1ChangePercent']
-        ],
-        index = rv_columns),
-            ignore_index = True
-        )
+rv_ingestor = BatchIngestor(stocks['Symbol'], RV_FIELDS)
+
+with recorder.stage('fetch', rows = len(stocks)) as stage, BatchFetcher(API_TOKEN, types = ('advanced-stats', 'quote'), base_url = BASE_URL) as fetcher:
+    rv_results = CachedFetcher(fetcher, cache).fetch(stocks['Symbol'], groups = membership.batches)
+    stage.requests, stage.bytes = fetcher.requests, fetcher.bytes_received
+
+with recorder.stage('ingest', rows = len(rv_results.data)):
+    rv_ingestor.add_batch(rv_results.data)
+    # EV/EBITDA and EV/GP are computed for the whole column at once; a missing, zero or negative denominator gives NaN.
+    rv_dataframe = rv_frame(rv_ingestor)
+
+if rv_ingestor.missing:
+    print(f'Could not fetch {len(rv_ingestor.missing)} symbols: {rv_ingestor.missing}')
 
 rv_dataframe
 
@@ -252,10 +220,11 @@ rv_dataframe
 
 Our DataFrame contains some missing data because all of the metrics we require are not available through the API we're using.
 
-You can use pandas' `isnull` method to identify missing data:
+You can use pandas' `isnull` method to identify missing data. The percentile and RV Score columns are still empty at this point, so we only look at the value metrics:
 """
 
-rv_dataframe[rv_dataframe.isnull().any(axis=1)]
+value_columns = ['Price-to-Earnings Ratio', 'Price-to-Book Ratio','Price-to-Sales Ratio',  'EV/EBITDA','EV/GP']
+rv_dataframe[rv_dataframe[value_columns].isnull().any(axis=1)]
 
 """Dealing with missing data is an important topic in data science.
 
@@ -264,17 +233,25 @@ There are two main approaches:
 * Drop missing data from the data set (pandas' `dropna` method is useful here)
 * Replace missing data with a new value (pandas' `fillna` method is useful here)
 
-In this tutorial, we will replace missing data with the average non-`NaN` data point from that column.
+In this tutorial, we will replace missing data, but not with the column average: a single extreme multiple drags the average far from any typical stock. `clean_metrics` from `qvs/cleaning.py` cleans all five metric columns in one pass:
 
-Here is the code to do this:
+* A multiple that is zero or negative (negative earnings, EBITDA or gross profit) is not a valuation, so it is treated as missing rather than ranked as the cheapest stock in the universe
+* Each metric is winsorized, i.e. clipped to its 1st and 99th percentiles
+* Missing values take the median of the stock's GICS sector, or the median of the whole universe if the sector has no data
+
+It also returns how many values each step changed in every column:
 """
 
-for column in ['Price-to-Earnings Ratio', 'Price-to-Book Ratio','Price-to-Sales Ratio',  'EV/EBITDA','EV/GP']:
-    rv_dataframe[column].fillna(rv_dataframe[column].mean(), inplace = True)
+from qvs.cleaning import clean_metrics
+
+with recorder.stage('clean', rows = len(rv_dataframe)):
+    rv_dataframe['GICS Sector'] = rv_dataframe['Ticker'].map(stocks.set_index('Symbol')['GICS Sector'])
+    rv_dataframe, diagnostics = clean_metrics(rv_dataframe, group_by='GICS Sector')
+diagnostics
 
 """Now, if we run the statement from earlier to print rows that contain missing data, nothing should be returned:"""
 
-rv_dataframe[rv_dataframe.isnull().any(axis=1)]
+rv_dataframe[rv_dataframe[value_columns].isnull().any(axis=1)]
 
 """## Calculating Value Percentiles
 
@@ -297,9 +274,12 @@ metrics = {
             'EV/GP':'EV/GP Percentile'
 }
 
-for row in rv_dataframe.index:
-    for metric in metrics.keys():
-        rv_dataframe.loc[row, metrics[metric]] = stats.percentileofscore(rv_dataframe[metric], rv_dataframe.loc[row, metric])/100
+"""Calling `stats.percentileofscore` once per row and metric gets slow quickly on large universes, so `assign_percentiles` ranks every metric column in a single sorted pass. It uses the same "rank" tie handling as `percentileofscore`, so the scores are identical."""
+
+from qvs.ranking import assign_percentiles
+
+with recorder.stage('percentiles', rows = len(rv_dataframe)):
+    assign_percentiles(rv_dataframe, metrics)
 
 # Print each percentile score to make sure it was calculated properly
 # for metric in metrics.values():
@@ -311,45 +291,46 @@ rv_dataframe
 """## Calculating the RV Score
 We'll now calculate our RV Score (which stands for Robust Value), which is the value score that we'll use to filter for stocks in this investing strategy.
 
-The RV Score will be the arithmetic mean of the 4 percentile scores that we calculated in the last section.
+The RV Score will be the arithmetic mean of the 5 percentile scores that we calculated in the last section.
 
-To calculate arithmetic mean, we will use the mean function from Python's built-in statistics module.
+Rather than looping over the rows, we take the mean across the percentile columns for every stock at once, as `qvs.pipeline.score` does.
 """
 
-from statistics import mean
-
-for row in rv_dataframe.index:
-    value_percentiles = []
-    for metric in metrics.keys():
-        value_percentiles.append(rv_dataframe.loc[row, metrics[metric]])
-    rv_dataframe.loc[row, 'RV Score'] = mean(value_percentiles)
+with recorder.stage('rv score', rows = len(rv_dataframe)):
+    rv_dataframe['RV Score'] = rv_dataframe[list(metrics.values())].mean(axis = 1)
 
 rv_dataframe
 
 """## Selecting the 50 Best Value Stocks¶
 
-As before, we can identify the 50 best value stocks in our universe by sorting the DataFrame on the RV Score column and dropping all but the top 50 entries.
+As before, we can identify the 50 best value stocks in our universe by keeping the 50 lowest RV Scores with `top_n`.
 """
 
-rv_dataframe.sort_values('RV Score', ascending = True, inplace = True)
-rv_dataframe = rv_dataframe[:50]
-rv_dataframe.reset_index(drop = True, inplace = True)
+rv_dataframe = top_n(rv_dataframe, 'RV Score', 50)
 
 rv_dataframe
 
 """## Calculating the Number of Shares to Buy
-We'll use the `portfolio_input` function that we created earlier to accept our portfolio size. Then we will use similar logic in a for loop to calculate the number of shares to buy for each stock in our investment universe.
+We'll use the `portfolio_input` function that we created earlier to accept our portfolio size. Then we will use `allocate` again to calculate the number of shares to buy for each stock in our investment universe. Other weighting schemes (`'80-20'`, `'score'`, `'market-cap'`, and `'inverse-volatility'` once a `Volatility` column is added) can be passed as `scheme`, and `redistribute = True` spends the cash left over after rounding down.
 """
 
 # portfolio_input()
 
-position_size = float(portfolio_size)/len(rv_dataframe)
-
-for i in range(len(rv_dataframe['Ticker'])):
-  rv_dataframe.loc[i, 'Number of Shares to Buy'] = math.floor(position_size/rv_dataframe['Price'][i])
+rv_dataframe = allocate(rv_dataframe, portfolio_size)
 
 rv_dataframe
 
+"""## Rebalancing From Current Holdings
+The share counts above assume we start from cash. If we already hold last period's portfolio, `rebalance` works out the orders that take us from those holdings to `rv_dataframe` instead. Put the current positions in `holdings.csv` (columns `Ticker`, `Shares` and `Price`, plus `Account` for several sub-accounts). Positions within half a percentage point of their target weight are not traded, and at most a quarter of the portfolio is turned over.
+"""
+
+from qvs.rebalance import rebalance
+
+if os.path.exists('holdings.csv'):
+    plan = rebalance(pd.read_csv('holdings.csv'), rv_dataframe, band = 0.005, turnover = 0.25)
+    print(plan.summary)
+    plan.orders
+
 
 
 """# Calculate Returns for Various Timeframes
@@ -362,29 +343,28 @@ It assumes equal weighting for all stocks in the portfolio.
 - six_month_return: Total return over six month period
 - three_month_return: Total return over three month period
 - one_month_return: Total return over one month period
-- position_size: Size of each position in the portfolio
+- Position Size: Amount `allocate` put into each stock (its `Weight` times the portfolio size)
 - portfolio_size: Total value of the portfolio
 
 ## The returns are calculated using the formula:
 ```Return = (100 * Position Size * Price Return) / ((100 + Price Return) * Portfolio Size)```
-- where Price Return is the price return of each stock.
+- where Price Return is the price return of each stock over the same timeframe.
+
+`compare_schemes` evaluates this formula for every weighting scheme and timeframe in a single matrix product: a weights matrix (schemes × stocks) times a returns matrix (stocks × timeframes).
 
-### Adjust the variables 'position_size' and 'portfolio_size' as per your portfolio setup before running this code.
+### Adjust 'portfolio_size' (or the weighting scheme passed to `allocate`) as per your portfolio setup before running this code.
 
 #### Uncomment the variables at the end of the code to view the calculated returns for each timeframe.
 
 
 """
 
-one_year_return = 0
-one_month_return = 0
-three_month_return = 0
-six_month_return = 0
-for i in range(0, len(rv_dataframe['Ticker'])-1):
-  one_year_return += 100*position_size*(rv_dataframe['One-Year Price Return'][i])/((100+rv_dataframe['One-Year Price Return'][i])*float(portfolio_size))
-  six_month_return += 100*position_size*(rv_dataframe['Six-Month Price Return'][i])/((100+rv_dataframe['One-Year Price Return'][i])*float(portfolio_size))
-  three_month_return += 100*position_size*(rv_dataframe['Three-Month Price Return'][i])/((100+rv_dataframe['One-Year Price Return'][i])*float(portfolio_size))
-  one_month_return += 100*position_size*(rv_dataframe['One-Month Price Return'][i])/((100+rv_dataframe['One-Year Price Return'][i])*float(portfolio_size))
+from qvs.returns import compare_schemes
+
+# One row per weighting scheme, one column per timeframe ('1 Month', '3 Month', '6 Month', '1 Year').
+scheme_returns = compare_schemes(rv_dataframe, ['equal', '80-20'])
+
+one_month_return, three_month_return, six_month_return, one_year_return = scheme_returns.loc['equal']
 
 # one_year_return
 # six_month_return
@@ -402,7 +382,7 @@ for i in range(0, len(rv_dataframe['Ticker'])-1):
 - one_month_return_unequal_weightage: Total return over one month period with unequal weighting
 - portfolio_size: Total value of the portfolio
 
-### The code iterates through the stocks in 'rv_dataframe' and calculates returns for each timeframe based on the 80-20 principle.
+### The '80-20' row of `scheme_returns` holds the returns for each timeframe based on the 80-20 principle.
 ### For the top 20% stocks, 80% of the portfolio size is allocated, and for the remaining 80% of stocks, 20% of the portfolio size is allocated.
 
 ## The returns are calculated using the formula:
@@ -417,22 +397,7 @@ for i in range(0, len(rv_dataframe['Ticker'])-1):
 
 #If 80-20 principle is followed for investment
 
-one_year_return_unequal_weightage = 0
-six_month_return_unequal_weightage = 0
-three_month_return_unequal_weightage = 0
-one_month_return_unequal_weightage = 0
-
-for i in range(0, len(rv_dataframe['Ticker'])):
-  if(i<10):
-    one_year_return_unequal_weightage += 100*8*float(portfolio_size)*(rv_dataframe['One-Year Price Return'][i])/((100+rv_dataframe['One-Year Price Return'][i])*100*float(portfolio_size))
-    six_month_return_unequal_weightage += 100*8*float(portfolio_size)*(rv_dataframe['Six-Month Price Return'][i])/((100+rv_dataframe['One-Year Price Return'][i])*100*float(portfolio_size))
-    three_month_return_unequal_weightage += 100*8*float(portfolio_size)*(rv_dataframe['Three-Month Price Return'][i])/((100+rv_dataframe['One-Year Price Return'][i])*100*float(portfolio_size))
-    one_month_return_unequal_weightage += 100*8*float(portfolio_size)*(rv_dataframe['One-Month Price Return'][i])/((100+rv_dataframe['One-Year Price Return'][i])*100*float(portfolio_size))
-  else:
-    one_year_return_unequal_weightage += 100*5*float(portfolio_size)*(rv_dataframe['One-Year Price Return'][i])/((100+rv_dataframe['One-Year Price Return'][i])*1000*float(portfolio_size))
-    six_month_return_unequal_weightage += 100*5*float(portfolio_size)*(rv_dataframe['Six-Month Price Return'][i])/((100+rv_dataframe['One-Year Price Return'][i])*1000*float(portfolio_size))
-    three_month_return_unequal_weightage += 100*5*float(portfolio_size)*(rv_dataframe['Three-Month Price Return'][i])/((100+rv_dataframe['One-Year Price Return'][i])*1000*float(portfolio_size))
-    one_month_return_unequal_weightage += 100*5*float(portfolio_size)*(rv_dataframe['One-Month Price Return'][i])/((100+rv_dataframe['One-Year Price Return'][i])*1000*float(portfolio_size))
+one_month_return_unequal_weightage, three_month_return_unequal_weightage, six_month_return_unequal_weightage, one_year_return_unequal_weightage = scheme_returns.loc['80-20']
 
 
 # one_year_return_unequal_weightage
@@ -449,45 +414,17 @@ Annotations on top display return values.
 
 Usage: Adjust return values for each strategy and run the code to visualize the comparison.
 
+`ReturnsChart` from `qvs/plotting.py` plots the rows of `scheme_returns` and saves the chart as `returns_comparison.png`. `render_charts` writes one chart per scenario for many universes or parameter sets.
+
 """
 
-import matplotlib.pyplot as plt
-# Define the data
-labels = ['1 Month', '3 Month', '6 Month', '1 Year']
-returns_equal = [one_month_return, three_month_return, six_month_return, one_year_return]
-returns_unequal = [one_month_return_unequal_weightage, three_month_return_unequal_weightage, six_month_return_unequal_weightage, one_year_return_unequal_weightage]
-
-# Create the plot
-plt.figure(figsize=(8, 6))
-width = 0.2
-x = np.arange(len(labels))
-rects1 = plt.bar(x - width/2, returns_equal, width, label='Equal Weightage', color='skyblue')
-rects2 = plt.bar(x + width/2, returns_unequal, width, label='80-20 Principle', color='salmon')
-
-# Add labels and title
-plt.xlabel("Timeframe", fontsize=12)
-plt.ylabel("Returns (%)", fontsize=12)
-plt.title('Comparison of Returns', fontsize=14)
-plt.xticks(x, labels, fontsize=10)
-plt.yticks(fontsize=10)
-plt.legend(fontsize=10)
-
-# Add annotations
-for rects in [rects1, rects2]:
-    for rect in rects:
-        height = rect.get_height()
-        plt.annotate('{}'.format(round(height, 2)),  # Format the value
-                     xy=(rect.get_x() + rect.get_width() / 2, height),  # Center of the bar
-                     xytext=(0, 3),  # Offset text slightly above the bar
-                     textcoords="offset points",
-                     ha='center', va='bottom', fontsize=8, weight='bold')  # Bold annotation
-
-# Add gridlines
-plt.grid(axis='y', linestyle='--', alpha=0.7)
-
-# Display the plot
-plt.tight_layout()
-plt.show()
+from qvs.plotting import ReturnsChart
+
+# ReturnsChart draws with the non-interactive Agg backend, so this cell also runs without a display.
+chart = ReturnsChart()
+chart.draw(scheme_returns, title = 'Comparison of Returns')
+chart.save('returns_comparison.png')
+chart.figure
 
 """# Bar Graph: Returns Comparison
 
@@ -502,97 +439,32 @@ Usage: Adjust return values for each strategy and run the code to visualize the
 
 We will be using the XlsxWriter library for Python to create nicely-formatted Excel files.
 
-XlsxWriter is an excellent package and offers tons of customization. However, the tradeoff for this is that the library can seem very complicated to new users. Accordingly, this section will be fairly long because I want to do a good job of explaining how XlsxWriter works.
-"""
-
-writer = pd.ExcelWriter('value_strategy.xlsx', engine='xlsxwriter')
-rv_dataframe.to_excel(writer, sheet_name='Value Strategy', index = False)
-
-"""## Creating the Formats We'll Need For Our .xlsx File
-You'll recall from our first project that formats include colors, fonts, and also symbols like % and $. We'll need four main formats for our Excel document:
+`ReportWriter` from `qvs/report.py` streams the DataFrame into the workbook row by row (XlsxWriter's `constant_memory` mode), so memory stays flat however large the report. Rather than a hand-written map from column letters to formats, each column's format is picked from its name:
 
 * String format for tickers
 * \$XX.XX format for stock prices
-* \$XX,XXX format for market capitalization
 * Integer format for the number of shares to purchase
+* Percent format for percentiles and the RV Score
 * Float formats with 1 decimal for each valuation metric
 
-Since we already built some formats in past sections of this course, I've included them below for you. Run this code cell before proceeding.
-"""
+so the formatting stays lined up with the columns however the frame changes. `qvs.report.export` writes the same frame as CSV, Parquet or Arrow instead, and `export_scenarios` writes many frames at once.
 
-background_color = '#ffffff'
-font_color = '#000000'
-
-string_template = writer.book.add_format(
-        {
-            'font_color': font_color,
-            'bg_color': background_color,
-            'border': 1
-        }
-    )
-
-dollar_template = writer.book.add_format(
-        {
-            'num_format':'$0.00',
-            'font_color': font_color,
-            'bg_color': background_color,
-            'border': 1
-        }
-    )
-
-integer_template = writer.book.add_format(
-        {
-            'num_format':'0',
-            'font_color': font_color,
-            'bg_color': background_color,
-            'border': 1
-        }
-    )
-
-float_template = writer.book.add_format(
-        {
-            'num_format':'0',
-            'font_color': font_color,
-            'bg_color': background_color,
-            'border': 1
-        }
-    )
-
-percent_template = writer.book.add_format(
-        {
-            'num_format':'0.0%',
-            'font_color': font_color,
-            'bg_color': background_color,
-            'border': 1
-        }
-    )
-
-column_formats = {
-                    'A': ['Ticker', string_template],
-                    'B': ['Price', dollar_template],
-                    'C': ['Number of Shares to Buy', integer_template],
-                    'D': ['Price-to-Earnings Ratio', float_template],
-                    'E': ['PE Percentile', percent_template],
-                    'F': ['Price-to-Book Ratio', float_template],
-                    'G': ['PB Percentile',percent_template],
-                    'H': ['Price-to-Sales Ratio', float_template],
-                    'I': ['PS Percentile', percent_template],
-                    'J': ['EV/EBITDA', float_template],
-                    'K': ['EV/EBITDA Percentile', percent_template],
-                    'L': ['EV/GP', float_template],
-                    'M': ['EV/GP Percentile', percent_template],
-                    'N': ['RV Score', percent_template]
-                 }
-
-for column in column_formats.keys():
-    writer.sheets['Value Strategy'].set_column(f'{column}:{column}', 25, column_formats[column][1])
-    writer.sheets['Value Strategy'].write(f'{column}1', column_formats[column][0], column_formats[column][1])
-
-"""## Saving Our Excel Output
-As before, saving our Excel output is very easy:
+## Saving Our Excel Output
 """
 
-writer._save()
+from qvs.report import ReportWriter
+
+with recorder.stage('export', rows = len(rv_dataframe)), ReportWriter('value_strategy.xlsx') as report:
+    report.add_sheet(rv_dataframe, 'Value Strategy')
+
+"""The time each stage took (and, with `--profile`, its peak memory) is in `recorder.frame()`. A profiled run also saves the whole report as `run_report.json`."""
+
+if recorder.enabled:
+    recorder.write('run_report.json', universe = 'sp500', symbols = len(stocks))
+recorder.frame()
 
-from google.colab import files
-files.download('value_strategy.xlsx')
\ No newline at end of file
+try:
+    from google.colab import files
+    files.download('value_strategy.xlsx')
+except ImportError:
+    pass
\ No newline at end of file
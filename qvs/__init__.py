@@ -0,0 +1,5 @@
+"""Quantitative Value Strategy.
+
+Reusable building blocks for the robust value (RV) screener in
+``quantitative_value_strategy.py``.
+"""
@@ -0,0 +1,5 @@
+"""``python -m qvs``: the same as the ``qvs`` command."""
+
+from qvs.cli import main
+
+main()
@@ -0,0 +1,369 @@
+"""Historical backtest of the RV strategy over a point-in-time store.
+
+``FundamentalsStore`` keeps dated snapshots (``Date``, ``Ticker``, ``Price``
+and the five value metrics) as Parquet files partitioned by date, so a date
+range can be read without touching the rest of the history. ``backtest``
+turns the snapshots into a dates x tickers x metrics panel and scores every
+rebalance date at once: the metrics are cleaned as the script's
+``clean_metrics`` does (sign guard, winsorizing and sector medians; plain
+date means with ``impute='mean'``), every (date, metric) column is ranked in a single ``percentile_ranks`` call,
+and the top ``n`` RV Scores per date are picked with ``top_k_indices``
+(equal scores go to the earlier ticker). The equal-weight portfolio is held
+until the next rebalance date.
+
+A ``Panel`` can also be saved as raw float32 ``.npy`` arrays with
+``Panel.save``. ``Panel.load`` memory-maps them back with no parse step, so
+a multi-year history takes half the memory and opens instantly. Rebalance
+dates are scored in blocks, so only one block at a time is held in float64.
+
+The store needs ``pyarrow``; the scoring functions only need numpy.
+"""
+
+import json
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from qvs.cleaning import group_medians
+from qvs.columns import METRICS
+from qvs.ranking import percentile_ranks
+from qvs.topk import top_k_indices
+
+METRIC_COLUMNS = list(METRICS.keys())
+
+STORE_COLUMNS = ['Date', 'Ticker', 'Price'] + METRIC_COLUMNS
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError as error:
+        raise ImportError('FundamentalsStore requires pyarrow (pip install pyarrow)') from error
+    return pyarrow
+
+
+class FundamentalsStore:
+    """Dated fundamentals and prices stored as ``<root>/Date=YYYY-MM-DD/*.parquet``."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def write(self, frame):
+        """Add the rows of ``frame`` (with ``STORE_COLUMNS``), one partition per date.
+
+        Writing a date that is already stored replaces that partition.
+        """
+        pa = _pyarrow()
+        frame = frame[STORE_COLUMNS].copy()
+        frame['Date'] = pd.to_datetime(frame['Date']).dt.strftime('%Y-%m-%d')
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        pa.parquet.write_to_dataset(
+            table, self.root, partition_cols=['Date'],
+            existing_data_behavior='delete_matching')
+
+    def dates(self):
+        """Stored dates, read from the partition names without opening any file."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name.split('=', 1)[1] for name in os.listdir(self.root)
+                      if name.startswith('Date='))
+
+    def read(self, start=None, end=None, columns=None):
+        """Return the rows dated between ``start`` and ``end`` (inclusive) as a DataFrame."""
+        pa = _pyarrow()
+        dataset = pa.dataset.dataset(self.root, format='parquet', partitioning='hive')
+        condition = None
+        for op, bound in (('>=', start), ('<=', end)):
+            if bound is None:
+                continue
+            field = pa.dataset.field('Date')
+            bound = pd.Timestamp(bound).strftime('%Y-%m-%d')
+            clause = field >= bound if op == '>=' else field <= bound
+            condition = clause if condition is None else condition & clause
+        if columns is not None:
+            columns = ['Date', 'Ticker'] + [c for c in columns if c not in ('Date', 'Ticker')]
+        frame = dataset.to_table(columns=columns, filter=condition).to_pandas()
+        frame['Date'] = pd.to_datetime(frame['Date'].astype(str))
+        return frame
+
+
+class Panel:
+    """Snapshots pivoted to ``values[date, ticker, metric]`` and ``prices[date, ticker]``.
+
+    A ticker is a member of the universe on a date when it has a price.
+    """
+
+    META = 'panel.json'
+
+    def __init__(self, dates, tickers, values, prices, metrics=METRIC_COLUMNS):
+        self.dates = dates
+        self.tickers = tickers
+        self.values = values
+        self.prices = prices
+        self.metrics = list(metrics)
+
+    @classmethod
+    def from_frame(cls, frame, metrics=METRIC_COLUMNS, dtype=np.float64):
+        """Pivot a long frame with ``Date``, ``Ticker``, ``Price`` and ``metrics``."""
+        date_codes, dates = pd.factorize(pd.to_datetime(frame['Date']), sort=True)
+        ticker_codes, tickers = pd.factorize(frame['Ticker'], sort=True)
+        values = np.full((len(dates), len(tickers), len(metrics)), np.nan, dtype=dtype)
+        values[date_codes, ticker_codes] = frame[list(metrics)].to_numpy(dtype=dtype)
+        prices = np.full((len(dates), len(tickers)), np.nan, dtype=dtype)
+        prices[date_codes, ticker_codes] = frame['Price'].to_numpy(dtype=dtype)
+        return cls(pd.DatetimeIndex(dates), pd.Index(tickers), values, prices, metrics)
+
+    def save(self, root, dtype=np.float32):
+        """Write the panel to ``root`` as ``values.npy``, ``prices.npy`` and ``panel.json``."""
+        os.makedirs(root, exist_ok=True)
+        np.save(os.path.join(root, 'values.npy'), np.asarray(self.values, dtype=dtype))
+        np.save(os.path.join(root, 'prices.npy'), np.asarray(self.prices, dtype=dtype))
+        meta = {
+            'dates': self.dates.strftime('%Y-%m-%d').tolist(),
+            'tickers': [str(ticker) for ticker in self.tickers],
+            'metrics': self.metrics,
+        }
+        with open(os.path.join(root, self.META), 'w') as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, root, mmap_mode='r'):
+        """Open a panel written by ``save``; the arrays are memory-mapped unless ``mmap_mode`` is None."""
+        with open(os.path.join(root, cls.META)) as f:
+            meta = json.load(f)
+        values = np.load(os.path.join(root, 'values.npy'), mmap_mode=mmap_mode)
+        prices = np.load(os.path.join(root, 'prices.npy'), mmap_mode=mmap_mode)
+        return cls(pd.DatetimeIndex(meta['dates']), pd.Index(meta['tickers']), values, prices,
+                   meta['metrics'])
+
+    @classmethod
+    def is_saved(cls, root):
+        return os.path.isfile(os.path.join(root, cls.META))
+
+    @property
+    def members(self):
+        return ~np.isnan(self.prices)
+
+    def take_dates(self, mask):
+        return Panel(self.dates[mask], self.tickers, self.values[mask], self.prices[mask], self.metrics)
+
+    def between(self, start=None, end=None):
+        """The dates from ``start`` to ``end`` (inclusive); a slice, so memory maps stay mapped."""
+        first = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start), 'left')
+        last = len(self.dates) if end is None else self.dates.searchsorted(pd.Timestamp(end), 'right')
+        return Panel(self.dates[first:last], self.tickers, self.values[first:last],
+                     self.prices[first:last], self.metrics)
+
+
+def rebalance_mask(dates, freq='M'):
+    """Mark the last available date of every ``freq`` period (e.g. ``'M'``, ``'Q'``)."""
+    periods = pd.DatetimeIndex(dates).to_period(freq)
+    last = np.ones(len(periods), dtype=bool)
+    last[:-1] = periods[1:] != periods[:-1]
+    return last
+
+
+def sector_codes(tickers, sectors=None):
+    """Sector code of every ticker (-1 for none) from a ticker -> sector dict or Series."""
+    if sectors is None:
+        return np.full(len(tickers), -1, dtype=np.intp)
+    return pd.factorize(pd.Series(tickers).map(pd.Series(sectors)))[0].astype(np.intp)
+
+
+def clean_panel(values, members, groups=None, limits=(0.01, 0.99)):
+    """``clean_metrics`` on every date of a panel at once; ``NaN`` outside the universe.
+
+    Multiples that are not positive become missing, each (date, metric) is
+    winsorized to its ``limits`` quantiles, and gaps take the median of the
+    stock's sector (``groups``, as from ``sector_codes``) on that date, or
+    the date's median when the sector has no data.
+    """
+    n_dates, n_tickers, n_metrics = values.shape
+    values = np.where(members[:, :, None], np.asarray(values, dtype=np.float64), np.nan)
+    with np.errstate(invalid='ignore'):
+        values[values <= 0] = np.nan
+    absent = np.isnan(values) & members[:, :, None]
+    if limits is not None:
+        with warnings.catch_warnings():
+            # A metric missing for every member on a date has no quantiles.
+            warnings.simplefilter('ignore', RuntimeWarning)
+            low, high = np.nanquantile(values, limits, axis=1, keepdims=True)
+        values = np.clip(values, low, high)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        fill = np.broadcast_to(np.nanmedian(values, axis=1, keepdims=True), values.shape)
+    if groups is not None and groups.max(initial=-1) >= 0:
+        flat = values.reshape(-1, n_metrics)
+        dates = np.repeat(np.arange(n_dates), n_tickers)
+        sectors = np.tile(groups, n_dates)
+        codes = np.where(sectors >= 0, dates * (groups.max() + 1) + sectors, -1)
+        by_group = np.full(flat.shape, np.nan)
+        by_group[codes >= 0] = group_medians(flat, codes)[codes[codes >= 0]]
+        by_group = by_group.reshape(values.shape)
+        fill = np.where(np.isnan(by_group), fill, by_group)
+    return np.where(absent, fill, values)
+
+
+def rank_panel(values, members, block=None, impute='median', groups=None):
+    """Percentile of every (date, ticker, metric), ``NaN`` outside the universe.
+
+    Mirrors the screener on each date. With ``impute='median'`` (the
+    script's ``clean_metrics``) the metrics are cleaned by ``clean_panel``,
+    with sector medians when ``groups`` gives each ticker's sector code.
+    With ``impute='mean'`` missing member metrics take the date's
+    cross-sectional mean. Each metric is then ranked with
+    ``percentileofscore`` semantics. Dates are independent, so with
+    ``block`` they are ranked ``block`` dates at a time to bound the float64
+    working memory.
+    """
+    if impute not in ('mean', 'median'):
+        raise ValueError(f"impute must be 'mean' or 'median', not {impute!r}")
+    if block is not None and len(values) > block:
+        return np.concatenate([rank_panel(values[i:i + block], members[i:i + block], impute=impute, groups=groups)
+                               for i in range(0, len(values), block)])
+    n_dates, n_tickers, n_metrics = values.shape
+    if impute == 'median':
+        values = clean_panel(values, members, groups)
+    else:
+        values = np.where(members[:, :, None], np.asarray(values, dtype=np.float64), np.nan)
+        with warnings.catch_warnings():
+            # A metric missing for every member on a date has no mean.
+            warnings.simplefilter('ignore', RuntimeWarning)
+            means = np.nanmean(values, axis=1, keepdims=True)
+        values = np.where(np.isnan(values) & members[:, :, None], means, values)
+
+    # Every (date, metric) pair becomes one column of a tickers x columns matrix.
+    columns = values.transpose(1, 0, 2).reshape(n_tickers, n_dates * n_metrics)
+    ranks = percentile_ranks(columns, nan_policy='omit')
+    return ranks.reshape(n_tickers, n_dates, n_metrics).transpose(1, 0, 2)
+
+
+def weighted_scores(ranks, weights=None):
+    """Weighted mean of the per-metric percentiles ``ranks[0]``, ``ranks[1]``, ...
+
+    The metrics are added one at a time, so every caller rounds the same way
+    whatever the memory layout, and equal scores stay equal for the tie-break.
+    ``weights`` defaults to equal weights.
+    """
+    weights = np.ones(len(ranks)) if weights is None else np.asarray(weights, dtype=np.float64)
+    weights = weights / weights.sum()
+    scores = np.zeros(np.shape(ranks[0]))
+    for weight, rank in zip(weights, ranks):
+        scores += weight * rank
+    return scores
+
+
+def score_panel(values, members, block=None, impute='median', groups=None):
+    """RV Score for every (date, ticker): the mean of its ``rank_panel`` percentiles."""
+    return weighted_scores(np.moveaxis(rank_panel(values, members, block, impute, groups), 2, 0))
+
+
+def panel_members(panel, membership=None):
+    """(dates x tickers) mask of the stocks eligible on each date.
+
+    A stock needs a price; with a ``qvs.universe.MembershipIndex`` it must
+    also have been in the index on that date, which keeps a backtest free of
+    survivorship bias.
+    """
+    members = panel.members
+    if membership is not None:
+        members = members & membership.mask(panel.dates, panel.tickers)
+    return members
+
+
+def forward_returns(prices):
+    """Return from each date to the next, ``NaN`` where either price is missing."""
+    prices = np.asarray(prices, dtype=np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return prices[1:] / prices[:-1] - 1
+
+
+def select_top(scores, n):
+    """Boolean mask of the ``n`` lowest scores on every date (row).
+
+    Scores tied at the cut-off go to the earlier column, i.e. the earlier
+    ticker of the panel, as in ``top_n`` and ``Sweep``.
+    """
+    selected = np.zeros(scores.shape, dtype=bool)
+    for row, date_scores in zip(selected, scores):
+        row[top_k_indices(date_scores, n)] = True
+    return selected & ~np.isnan(scores)
+
+
+class BacktestResult:
+    """Portfolio returns per holding period plus the selections behind them."""
+
+    def __init__(self, panel, scores, selected, returns):
+        self.panel = panel
+        self.scores = scores
+        self.selected = selected
+        self.returns = returns
+
+    @property
+    def cumulative(self):
+        return (1 + self.returns).cumprod() - 1
+
+    def holdings(self, date):
+        """Tickers selected on rebalance ``date``."""
+        row = self.panel.dates.get_loc(pd.Timestamp(date))
+        return list(self.panel.tickers[self.selected[row]])
+
+
+def rebalance_panel(source, start=None, end=None, freq='M'):
+    """The ``Panel`` of ``source`` between ``start`` and ``end``, on ``freq`` rebalance dates.
+
+    ``source`` is a ``FundamentalsStore``, a ``Panel`` or a long DataFrame of
+    snapshots; ``freq=None`` keeps every date.
+    """
+    if isinstance(source, Panel):
+        frame = None
+    elif isinstance(source, FundamentalsStore):
+        frame = source.read(start, end, columns=STORE_COLUMNS)
+    else:
+        dates = pd.to_datetime(source['Date'])
+        keep = np.ones(len(source), dtype=bool)
+        if start is not None:
+            keep &= dates >= pd.Timestamp(start)
+        if end is not None:
+            keep &= dates <= pd.Timestamp(end)
+        frame = source[keep]
+
+    panel = source.between(start, end) if frame is None else Panel.from_frame(frame)
+    if freq is not None:
+        panel = panel.take_dates(rebalance_mask(panel.dates, freq))
+    return panel
+
+
+def backtest(source, n=50, start=None, end=None, freq='M', block=64, membership=None, impute='median',
+             sectors=None):
+    """Run the RV strategy over history and return a ``BacktestResult``.
+
+    ``source`` is a ``FundamentalsStore``, a ``Panel`` (e.g. one opened with
+    ``Panel.load``) or a long DataFrame of snapshots. ``block`` rebalance
+    dates are scored at a time. With a ``MembershipIndex``, each date only
+    ranks the index members of that date. ``impute`` is ``'median'`` (the
+    script's cleaning; ``sectors`` maps tickers to the sector whose median
+    fills a gap) or ``'mean'``.
+    ``returns`` is indexed by the end of each holding period; stocks with no
+    price at the end of a period (e.g. delisted) are left out of its average.
+    """
+    panel = rebalance_panel(source, start, end, freq)
+
+    scores = score_panel(panel.values, panel_members(panel, membership), block, impute,
+                         sector_codes(panel.tickers, sectors))
+    selected = select_top(scores, n)
+
+    forward = forward_returns(panel.prices)
+    held = selected[:-1] & ~np.isnan(forward)
+    counts = held.sum(axis=1)
+    totals = np.where(held, forward, 0).sum(axis=1)
+    with np.errstate(invalid='ignore'):
+        period_returns = np.where(counts > 0, totals / counts, np.nan)
+    returns = pd.Series(period_returns, index=panel.dates[1:], name='RV Portfolio Return')
+    return BacktestResult(panel, scores, selected, returns)
+
@@ -0,0 +1,225 @@
+"""Persistent per-symbol, per-endpoint cache of IEX responses.
+
+Responses are stored in a single SQLite file as zlib-compressed JSON, keyed
+by ``(symbol, endpoint, as_of)`` where ``as_of`` is the date the payload was
+fetched. Each endpoint belongs to a field group with its own time-to-live:
+prices (``quote``) go stale after minutes, fundamentals (``stats``,
+``advanced-stats``) after a day. Once the compressed payloads add up to more
+than ``max_bytes`` the least recently read entries are evicted. The file
+uses SQLite's incremental auto-vacuum, so the pages freed by an eviction are
+returned to the filesystem and the file stays close to that cap.
+
+``CachedFetcher`` wraps a ``BatchFetcher`` so that only stale or missing
+``(symbol, endpoint)`` pairs are requested; intraday reruns are then served
+almost entirely from disk.
+"""
+
+import json
+import sqlite3
+import time
+import zlib
+from datetime import date
+
+from qvs.fetch import FetchResult, chunks
+
+# Endpoint -> field group, and field group -> time-to-live in seconds.
+DEFAULT_GROUPS = {
+    'quote': 'prices',
+    'stats': 'fundamentals',
+    'advanced-stats': 'fundamentals',
+}
+
+DEFAULT_TTLS = {
+    'prices': 15 * 60,
+    'fundamentals': 24 * 60 * 60,
+}
+
+# Stay well below SQLite's limit on bound parameters per statement.
+_SQL_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    symbol TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    as_of TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    size INTEGER NOT NULL,
+    payload BLOB NOT NULL,
+    PRIMARY KEY (symbol, endpoint, as_of)
+);
+CREATE INDEX IF NOT EXISTS responses_access ON responses (last_access);
+"""
+
+
+class ResponseCache:
+    """On-disk response cache with per-group TTLs and an LRU size cap."""
+
+    def __init__(self, path, ttls=None, groups=None, max_bytes=256 * 2**20, clock=time.time):
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.groups = dict(DEFAULT_GROUPS, **(groups or {}))
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._db = sqlite3.connect(path)
+        if self._db.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            # Takes effect on a new file at once; an existing one must be rebuilt.
+            self._db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            self._db.execute("VACUUM")
+        self._db.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._db.close()
+
+    def ttl(self, endpoint):
+        """Time-to-live in seconds for ``endpoint``'s field group."""
+        return self.ttls[self.groups.get(endpoint, 'prices')]
+
+    def get_many(self, symbols, endpoint):
+        """Return ``{symbol: payload}`` for the symbols with a fresh entry."""
+        symbols = list(symbols)
+        now = self.clock()
+        oldest = now - self.ttl(endpoint)
+        found = {}
+        for group in chunks(symbols, _SQL_CHUNK):
+            rows = self._db.execute(
+                f"SELECT symbol, payload FROM responses "
+                f"WHERE endpoint = ? AND fetched_at >= ? AND symbol IN ({','.join('?' * len(group))}) "
+                f"ORDER BY as_of",
+                [endpoint, oldest, *group])
+            # Rows come oldest first, so the latest as_of wins.
+            for symbol, payload in rows:
+                found[symbol] = payload
+        with self._db:
+            self._db.executemany(
+                "UPDATE responses SET last_access = ? WHERE symbol = ? AND endpoint = ?",
+                [(now, symbol, endpoint) for symbol in found])
+        self.hits += len(found)
+        self.misses += len(symbols) - len(found)
+        return {symbol: json.loads(zlib.decompress(payload)) for symbol, payload in found.items()}
+
+    def get(self, symbol, endpoint):
+        """Return the fresh payload for one symbol, or ``None``."""
+        return self.get_many([symbol], endpoint).get(symbol)
+
+    def stale(self, symbols, endpoint):
+        """Symbols with no fresh entry for ``endpoint``, in their original order."""
+        symbols = list(symbols)
+        oldest = self.clock() - self.ttl(endpoint)
+        fresh = set()
+        for group in chunks(symbols, _SQL_CHUNK):
+            rows = self._db.execute(
+                f"SELECT DISTINCT symbol FROM responses "
+                f"WHERE endpoint = ? AND fetched_at >= ? AND symbol IN ({','.join('?' * len(group))})",
+                [endpoint, oldest, *group])
+            fresh.update(symbol for symbol, in rows)
+        return [symbol for symbol in symbols if symbol not in fresh]
+
+    def put_many(self, endpoint, payloads, as_of=None):
+        """Store ``{symbol: payload}`` for one endpoint, then enforce the size cap."""
+        now = self.clock()
+        as_of = as_of or date.fromtimestamp(now).isoformat()
+        rows = []
+        for symbol, payload in payloads.items():
+            blob = zlib.compress(json.dumps(payload, separators=(',', ':')).encode())
+            rows.append((symbol, endpoint, as_of, now, now, len(blob), blob))
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        self.evict()
+
+    def put(self, symbol, endpoint, payload, as_of=None):
+        self.put_many(endpoint, {symbol: payload}, as_of)
+
+    @property
+    def size(self):
+        """Total compressed payload bytes held in the cache."""
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def evict(self):
+        """Drop least recently read entries until the cache fits in ``max_bytes``."""
+        excess = self.size - self.max_bytes
+        if excess <= 0:
+            return
+        doomed = []
+        for rowid, size in self._db.execute(
+                "SELECT rowid, size FROM responses ORDER BY last_access"):
+            doomed.append((rowid,))
+            excess -= size
+            if excess <= 0:
+                break
+        with self._db:
+            self._db.executemany("DELETE FROM responses WHERE rowid = ?", doomed)
+        self._vacuum()
+
+    def drop(self, symbols):
+        """Delete every entry for ``symbols``, e.g. tickers that left the universe."""
+        symbols = list(symbols)
+        with self._db:
+            for group in chunks(symbols, _SQL_CHUNK):
+                self._db.execute(f"DELETE FROM responses WHERE symbol IN ({','.join('?' * len(group))})", group)
+        self._vacuum()
+
+    def _vacuum(self):
+        # Run as a script: through ``execute`` each step frees a single page.
+        self._db.executescript("PRAGMA incremental_vacuum")
+
+    def clear(self):
+        with self._db:
+            self._db.execute("DELETE FROM responses")
+        self._vacuum()
+
+
+class CachedFetcher:
+    """Serve batch data from a ``ResponseCache`` and fetch only what is stale.
+
+    Symbols are grouped by the set of endpoints they are missing, so a rerun
+    where only prices have expired requests ``quote`` alone. With ``groups``
+    (e.g. ``MembershipIndex.batches``) the stale symbols are requested along
+    those batches, so batches that are fully cached cost no request.
+    """
+
+    def __init__(self, fetcher, cache, types=None):
+        self.fetcher = fetcher
+        self.cache = cache
+        self.types = list(types or fetcher.types)
+
+    def fetch(self, symbols, types=None, groups=None):
+        """Return a ``FetchResult`` merging cached and freshly fetched payloads."""
+        symbols = list(symbols)
+        types = list(types or self.types)
+        result = FetchResult()
+
+        needed = {symbol: [] for symbol in symbols}
+        for endpoint in types:
+            cached = self.cache.get_many(symbols, endpoint)
+            for symbol, payload in cached.items():
+                result.data.setdefault(symbol, {})[endpoint] = payload
+            for symbol in symbols:
+                if symbol not in cached:
+                    needed[symbol].append(endpoint)
+
+        by_types = {}
+        for symbol, missing in needed.items():
+            if missing:
+                by_types.setdefault(tuple(missing), []).append(symbol)
+
+        for missing, group in by_types.items():
+            fetched = self.fetcher.fetch(group, types=missing, groups=groups)
+            result.requests += fetched.requests
+            result.failed.update(fetched.failed)
+            for endpoint in missing:
+                payloads = {symbol: data[endpoint] for symbol, data in fetched.data.items()
+                            if data.get(endpoint) is not None}
+                self.cache.put_many(endpoint, payloads)
+            for symbol, data in fetched.data.items():
+                result.data.setdefault(symbol, {}).update(data)
+        return result
@@ -0,0 +1,112 @@
+"""Cleaning the value metrics before they are ranked.
+
+The screener used to fill each missing metric with its whole-universe mean,
+one column at a time. A single extreme multiple drags that mean far from any
+typical stock. Negative or zero earnings, EBITDA or gross profit also give
+multiples that rank as the cheapest in the universe. ``clean_metrics``
+treats all five metric columns as one array and, in a single pass:
+
+1. guards signs: a multiple that is not positive is not a valuation, so it
+   is set to missing (EV/EBITDA and EV/GP are already missing where EBITDA
+   or gross profit is not positive, see ``qvs.ingest.rv_frame``);
+2. winsorizes: each column is clipped to its ``limits`` quantiles;
+3. imputes: a missing value takes the median of its sector (``group_by``),
+   or the universe median when the sector has no data.
+
+It returns the cleaned frame and the number of values each step touched in
+each column.
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from qvs.columns import METRICS
+from qvs.ranking import group_codes
+
+DIAGNOSTICS = ['missing', 'non-positive', 'winsorized', 'group median', 'universe median', 'imputed']
+
+
+def group_medians(values, codes):
+    """Median of every column of ``values`` within each group, ignoring NaN.
+
+    ``codes`` gives each row a group code; rows with a negative code are left
+    out. Returns a (groups x columns) array, with NaN where a group has no
+    values. All groups and columns are handled in one sort.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    codes = np.asarray(codes, dtype=np.intp)
+    groups = codes.max(initial=-1) + 1
+    keep = codes >= 0
+    values, codes = values[keep], codes[keep]
+    medians = np.full((groups, values.shape[1]), np.nan)
+    if not len(codes):
+        return medians
+
+    # Sort by value (NaN last) and then, stably, by group.
+    order = np.argsort(values, axis=0, kind='stable')
+    order = np.take_along_axis(order, np.argsort(codes[order], axis=0, kind='stable'), axis=0)
+    ordered = np.take_along_axis(values, order, axis=0)
+
+    starts = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=groups))[:-1]])
+    counts = np.zeros((groups, values.shape[1]), dtype=np.intp)
+    np.add.at(counts, codes, ~np.isnan(values))
+    present = counts > 0
+    low = starts[:, None] + np.maximum(counts - 1, 0) // 2
+    high = starts[:, None] + counts // 2
+    high = np.where(present, high, low)
+    columns = np.arange(values.shape[1])
+    middle = (ordered[low, columns] + ordered[high, columns]) / 2
+    medians[present] = middle[present]
+    return medians
+
+
+def clean_metrics(frame, metrics=METRICS, group_by=None, limits=(0.01, 0.99), positive=True):
+    """Return ``(cleaned copy of frame, diagnostics)`` for the ``metrics`` columns.
+
+    ``group_by`` names a column such as ``'GICS Sector'`` to impute with group
+    medians. Without it, or when a group has no data, the universe median is
+    used. ``limits`` are the winsorizing quantiles (``None`` turns clipping
+    off). With ``positive`` false, zero and negative multiples are kept. The
+    diagnostics frame has one row per metric and one column per
+    ``DIAGNOSTICS`` count.
+    """
+    columns = list(metrics)
+    values = frame[columns].to_numpy(dtype=np.float64, copy=True)
+    missing = np.isnan(values)
+    non_positive = ~missing & (values <= 0) if positive else np.zeros_like(missing)
+    values[non_positive] = np.nan
+    absent = missing | non_positive
+
+    winsorized = np.zeros_like(missing)
+    if limits is not None:
+        with warnings.catch_warnings():
+            # A column with no values at all has no quantiles; it stays NaN.
+            warnings.simplefilter('ignore', RuntimeWarning)
+            low, high = np.nanquantile(values, limits, axis=0)
+        clipped = np.clip(values, low, high)
+        winsorized = ~absent & (clipped != values)
+        values = clipped
+
+    universe = group_medians(values, np.zeros(len(values), dtype=np.intp))[0]
+    if group_by is None:
+        by_group = np.zeros_like(missing)
+    else:
+        codes = group_codes(frame, group_by)
+        grouped = codes >= 0
+        fill = np.full(values.shape, np.nan)
+        if grouped.any():
+            # Rows without a group keep NaN here and take the universe median below.
+            fill[grouped] = group_medians(values, codes)[codes[grouped]]
+        by_group = absent & ~np.isnan(fill)
+        values = np.where(by_group, fill, values)
+    by_universe = absent & ~by_group & ~np.isnan(universe)
+    values = np.where(by_universe, universe, values)
+
+    cleaned = frame.copy()
+    cleaned[columns] = values
+    counts = [missing, non_positive, winsorized, by_group, by_universe, by_group | by_universe]
+    diagnostics = pd.DataFrame(np.column_stack([c.sum(axis=0) for c in counts]),
+                               index=columns, columns=DIAGNOSTICS)
+    return cleaned, diagnostics
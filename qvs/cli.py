@@ -0,0 +1,330 @@
+"""Command-line interface: ``qvs screen``, ``qvs backtest``, ``qvs rebalance``, ``qvs export``,
+``qvs serve`` and ``qvs record``.
+
+    qvs screen --config screen.toml --output value_strategy.xlsx
+    qvs backtest --store fundamentals --start 2015-01-01 --output returns.csv
+    qvs rebalance holdings.csv --target value_strategy.csv --band 0.005 --output orders.csv
+    qvs export value_strategy.parquet --output value_strategy.xlsx
+    qvs record --listing sp500.csv --output fixtures.json
+    qvs serve --fixtures fixtures.json --port 8000 --latency 0.05 0.2 --rate-limit 100
+
+Settings are layered, later sources winning: ``ScreenConfig`` defaults, then
+the top level of a TOML or JSON ``--config`` file, then the file's
+``[screen]``, ``[backtest]`` or ``[rebalance]`` table, then command-line flags. The IEX
+token comes from the ``IEX_TOKEN`` environment variable or the config file.
+It is never accepted on the command line, where it would show up in shell
+history and process listings.
+
+Only the standard library is imported at start-up. numpy, pandas, requests
+and the optional xlsxwriter and pyarrow are imported by the command that
+needs them, so a scheduled screen starts quickly.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+TOKEN_VARIABLE = 'IEX_TOKEN'
+
+# Command-line options that are not ``ScreenConfig`` fields.
+SCREEN_OPTIONS = {'listing', 'sector', 'sub_industry', 'output', 'scored_output', 'report'}
+BACKTEST_OPTIONS = {'store', 'start', 'end', 'freq', 'top', 'impute', 'listing', 'output'}
+REBALANCE_OPTIONS = {'holdings', 'target', 'cash', 'lot_size', 'band', 'turnover', 'output'}
+
+
+def load_config(path):
+    """Read a TOML (``.toml``) or JSON config file into a dict."""
+    if path.endswith('.toml'):
+        try:
+            import tomllib
+        except ImportError:  # Python < 3.11
+            import tomli as tomllib
+        with open(path, 'rb') as f:
+            return tomllib.load(f)
+    with open(path) as f:
+        return json.load(f)
+
+
+def settings_for(command, args, allowed):
+    """Merge the config file (top level, then its ``command`` table) with the flags given.
+
+    Top-level keys are shared by every command, so ones a command does not
+    use are ignored; unknown keys in the command's own table are an error.
+    """
+    given = dict(vars(args))
+    for key in ('command', 'func', 'config', 'profile'):
+        given.pop(key, None)
+    settings = {}
+    if getattr(args, 'config', None):
+        config = load_config(args.config)
+        section = config.get(command, {})
+        unknown = set(section) - set(allowed)
+        if unknown:
+            raise SystemExit(f'qvs {command}: unknown settings {sorted(unknown)} in {args.config}')
+        settings.update({k: v for k, v in config.items() if k in allowed and not isinstance(v, dict)})
+        settings.update(section)
+    settings.update(given)
+    return settings
+
+
+def make_recorder(args):
+    from qvs.instrument import Recorder
+
+    if args.profile is None:
+        return Recorder()
+    return Recorder(trace_memory=True, profile_dir=args.profile)
+
+
+def screen(args):
+    from dataclasses import fields, replace
+
+    from qvs.pipeline import ScreenConfig, run_screen
+    from qvs.universe import load_universe
+
+    names = {field.name for field in fields(ScreenConfig)}
+    settings = settings_for('screen', args, names | SCREEN_OPTIONS)
+    config = ScreenConfig(**{k: v for k, v in settings.items() if k in names})
+    if 'compare' in settings:
+        config = replace(config, compare=tuple(config.compare))
+    if config.token is None:
+        config = replace(config, token=os.environ.get(TOKEN_VARIABLE))
+    if config.token is None:
+        raise SystemExit(f'qvs screen: set the {TOKEN_VARIABLE} environment variable '
+                         f'(or token in the config file)')
+
+    universe = load_universe(settings.get('listing', 'sp500.csv'), sector=settings.get('sector'),
+                             sub_industry=settings.get('sub_industry'))
+    recorder = make_recorder(args)
+    result = run_screen(universe, config, recorder=recorder)
+    if result.failed:
+        print(f'could not fetch {len(result.failed)} of {len(universe)} symbols', file=sys.stderr)
+
+    if 'output' in settings or 'scored_output' in settings:
+        from qvs.report import export
+
+        with recorder.stage('export', rows=len(result.portfolio)):
+            if 'output' in settings:
+                export(result.portfolio, settings['output'])
+            if 'scored_output' in settings:
+                export(result.scored, settings['scored_output'], sheet_name='Universe')
+    else:
+        print(result.portfolio.to_string(index=False))
+    print(result.returns.to_string(), file=sys.stderr)
+
+    if 'report' in settings:
+        recorder.write(settings['report'], command='screen', universe=universe.name,
+                       symbols=len(universe), failed=len(result.failed))
+
+
+def backtest(args):
+    settings = settings_for('backtest', args, BACKTEST_OPTIONS)
+    if 'store' not in settings:
+        raise SystemExit('qvs backtest: --store (or store in the config file) is required')
+
+    from qvs.backtest import FundamentalsStore, Panel, backtest as run_backtest
+
+    sectors = None
+    if 'listing' in settings:
+        from qvs.compact import read_listing
+
+        listing = read_listing(settings['listing'])
+        if 'GICS Sector' in listing:
+            sectors = listing.set_index('Symbol')['GICS Sector']
+
+    store = settings['store']
+    recorder = make_recorder(args)
+    with recorder.stage('backtest'):
+        source = Panel.load(store) if Panel.is_saved(store) else FundamentalsStore(store)
+        result = run_backtest(source, n=settings.get('top', 50),
+                              start=settings.get('start'), end=settings.get('end'),
+                              freq=settings.get('freq', 'M'), impute=settings.get('impute', 'median'),
+                              sectors=sectors)
+    returns = result.returns.rename('Return').to_frame()
+    returns['Cumulative'] = result.cumulative
+    if 'output' in settings:
+        from qvs.report import export
+
+        export(returns.reset_index(), settings['output'], sheet_name='Backtest')
+    else:
+        print(returns.to_string())
+
+
+def read_frame(path, command):
+    """Read saved output (CSV, Parquet or Arrow) into a DataFrame."""
+    import pandas as pd
+
+    from qvs.report import EXTENSIONS
+
+    readers = {'csv': pd.read_csv, 'parquet': pd.read_parquet, 'arrow': pd.read_feather}
+    fmt = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if fmt not in readers:
+        raise SystemExit(f'qvs {command}: cannot read {path}; use a .csv, .parquet or .arrow file')
+    return readers[fmt](path)
+
+
+def rebalance(args):
+    settings = settings_for('rebalance', args, REBALANCE_OPTIONS)
+    if 'target' not in settings:
+        raise SystemExit('qvs rebalance: --target (or target in the config file) is required')
+
+    from qvs.rebalance import rebalance as plan_rebalance
+
+    try:
+        plan = plan_rebalance(read_frame(settings['holdings'], 'rebalance'),
+                              read_frame(settings['target'], 'rebalance'),
+                              cash=settings.get('cash'), lot_size=settings.get('lot_size', 1),
+                              band=settings.get('band', 0.0), turnover=settings.get('turnover'))
+    except ValueError as error:
+        raise SystemExit(f'qvs rebalance: {error}')
+    if 'output' in settings:
+        from qvs.report import export
+
+        export(plan.orders, settings['output'], sheet_name='Orders')
+    else:
+        print(plan.orders.to_string(index=False))
+    print(plan.summary.to_string(), file=sys.stderr)
+
+
+def export_files(args):
+    """Convert saved screen output (CSV, Parquet or Arrow) to another format."""
+    from qvs.report import EXTENSIONS, export, export_scenarios
+
+    frames = {}
+    for path in args.inputs:
+        frames[os.path.splitext(os.path.basename(path))[0]] = read_frame(path, 'export')
+    if len(frames) == 1:
+        export(next(iter(frames.values())), args.output, sheet_name=args.sheet or next(iter(frames)))
+    else:
+        export_scenarios(frames, args.output, EXTENSIONS.get(os.path.splitext(args.output)[1].lower(), 'csv'))
+
+
+def serve(args):
+    """Run the local stand-in IEX server until interrupted."""
+    from qvs.stub import StubServer, load_fixtures
+
+    if args.fixtures:
+        fixtures = load_fixtures(args.fixtures)
+    else:
+        from qvs.synthetic import make_responses
+        from qvs.universe import load_universe
+
+        fixtures = make_responses(load_universe(args.listing, columns=['Symbol']).symbols, seed=args.seed)
+    latency = args.latency[0] if len(args.latency) == 1 else tuple(args.latency[:2])
+    server = StubServer(fixtures, host=args.host, port=args.port, latency=latency, error_rate=args.error_rate,
+                        rate_limit=args.rate_limit, burst=args.burst, seed=args.seed)
+    print(f'serving {len(fixtures)} symbols at {server.url} (Ctrl-C to stop)', file=sys.stderr)
+    server.serve_forever()
+    print(json.dumps(server.stats(), indent=2), file=sys.stderr)
+
+
+def record(args):
+    """Capture real batch responses for a listing into a fixture file."""
+    from qvs.fetch import IEX_BASE_URL, BatchFetcher
+    from qvs.stub import load_fixtures, record_fixtures
+    from qvs.universe import load_universe
+
+    token = os.environ.get(TOKEN_VARIABLE)
+    if token is None:
+        raise SystemExit(f'qvs record: set the {TOKEN_VARIABLE} environment variable')
+    symbols = load_universe(args.listing, columns=['Symbol']).symbols
+    existing = load_fixtures(args.output) if args.append and os.path.exists(args.output) else None
+    with BatchFetcher(token, types=args.types.split(','), base_url=args.base_url or IEX_BASE_URL) as fetcher:
+        fixtures, failed = record_fixtures(fetcher, symbols, args.output, existing)
+    print(f'recorded {len(fixtures)} symbols to {args.output}', file=sys.stderr)
+    if failed:
+        print(f'could not fetch {len(failed)} of {len(symbols)} symbols', file=sys.stderr)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='qvs', description='Quantitative value (RV) screener.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    # Unset flags are left out of the namespace so they do not override the config file.
+    common = argparse.ArgumentParser(add_help=False, argument_default=argparse.SUPPRESS)
+    common.add_argument('--config', help='TOML or JSON settings file')
+    common.add_argument('--profile', nargs='?', const='profiles', default=None, metavar='DIR',
+                        help='trace memory and write a cProfile dump per stage to DIR')
+
+    run = commands.add_parser('screen', parents=[common], argument_default=argparse.SUPPRESS,
+                              help='fetch, score and size the RV portfolio')
+    run.add_argument('--listing', help='CSV with a Symbol column (default sp500.csv)')
+    run.add_argument('--sector', help='only screen this GICS sector')
+    run.add_argument('--sub-industry', dest='sub_industry', help='only screen this GICS sub-industry')
+    run.add_argument('--top', type=int, help='number of stocks to hold (default 50)')
+    run.add_argument('--portfolio-size', dest='portfolio_size', type=float)
+    run.add_argument('--scheme', help='weighting scheme: equal, 80-20, score, market-cap')
+    run.add_argument('--redistribute', action='store_true', help='spend cash left over after rounding')
+    run.add_argument('--group-by', dest='group_by', help='rank within this column, e.g. "GICS Sector"')
+    run.add_argument('--sector-cap', dest='sector_cap', type=int, help='most holdings per sector')
+    run.add_argument('--impute', choices=['mean', 'median'])
+    run.add_argument('--cache', dest='cache_path', help='SQLite response cache file')
+    run.add_argument('--base-url', dest='base_url', help='API base URL, e.g. a local stub server')
+    run.add_argument('--workers', dest='fetch_workers', type=int, help='concurrent batch requests')
+    run.add_argument('--stream', action='store_true', help='score batches as they arrive (asyncio)')
+    run.add_argument('--output', '-o', help='portfolio file: .xlsx, .csv, .parquet or .arrow')
+    run.add_argument('--scored-output', dest='scored_output', help='file for the whole scored universe')
+    run.add_argument('--report', help='write a JSON run report here')
+    run.set_defaults(func=screen)
+
+    back = commands.add_parser('backtest', parents=[common], argument_default=argparse.SUPPRESS,
+                               help='run the RV strategy over a fundamentals store')
+    back.add_argument('--store', help='FundamentalsStore directory or a saved Panel')
+    back.add_argument('--start')
+    back.add_argument('--end')
+    back.add_argument('--freq', help='rebalance frequency (default M)')
+    back.add_argument('--top', type=int)
+    back.add_argument('--impute', choices=['mean', 'median'], help='gap filling (default median, as the script)')
+    back.add_argument('--listing', help='CSV with Symbol and GICS Sector, for sector medians')
+    back.add_argument('--output', '-o', help='returns file: .xlsx, .csv, .parquet or .arrow')
+    back.set_defaults(func=backtest)
+
+    trade = commands.add_parser('rebalance', parents=[common], argument_default=argparse.SUPPRESS,
+                                help='orders that move current holdings to a screened portfolio')
+    trade.add_argument('holdings', help='Ticker and Shares (and Account) as .csv, .parquet or .arrow')
+    trade.add_argument('--target', help='screen output with Ticker, Price and Weight')
+    trade.add_argument('--cash', type=float, help='uninvested cash in each account')
+    trade.add_argument('--lot-size', dest='lot_size', type=int, help='round orders to this many shares')
+    trade.add_argument('--band', type=float, help='weight drift left untraded, e.g. 0.005')
+    trade.add_argument('--turnover', type=float, help='most of each account to trade, one way (exits aside)')
+    trade.add_argument('--output', '-o', help='orders file: .xlsx, .csv, .parquet or .arrow')
+    trade.set_defaults(func=rebalance)
+
+    convert = commands.add_parser('export', help='convert saved output to xlsx, csv, parquet or arrow')
+    convert.add_argument('inputs', nargs='+', help='.csv, .parquet or .arrow files')
+    convert.add_argument('--output', '-o', required=True,
+                         help='output file; several inputs become one sheet or file each')
+    convert.add_argument('--sheet', help='sheet name for a single input (default: its file name)')
+    convert.set_defaults(func=export_files)
+
+    stub = commands.add_parser('serve', help='serve recorded or synthetic responses as a local IEX API')
+    stub.add_argument('--fixtures', help='JSON fixtures from qvs record (default: synthetic data)')
+    stub.add_argument('--listing', default='sp500.csv', help='symbols for synthetic data (default sp500.csv)')
+    stub.add_argument('--host', default='127.0.0.1')
+    stub.add_argument('--port', type=int, default=8000)
+    stub.add_argument('--latency', type=float, nargs='+', default=[0.0], metavar='SECONDS',
+                      help='response delay, or a LOW HIGH range')
+    stub.add_argument('--error-rate', dest='error_rate', type=float, default=0.0,
+                      help='share of requests answered with a server error')
+    stub.add_argument('--rate-limit', dest='rate_limit', type=float, help='requests per second before 429s')
+    stub.add_argument('--burst', type=int, help='requests allowed at once under --rate-limit')
+    stub.add_argument('--seed', type=int, default=0)
+    stub.set_defaults(func=serve)
+
+    rec = commands.add_parser('record', help='capture real API responses into a fixture file')
+    rec.add_argument('--listing', default='sp500.csv', help='CSV with a Symbol column (default sp500.csv)')
+    rec.add_argument('--types', default='advanced-stats,quote,stats', help='endpoints to record')
+    rec.add_argument('--base-url', dest='base_url', help='API base URL')
+    rec.add_argument('--output', '-o', default='fixtures.json')
+    rec.add_argument('--append', action='store_true', help='merge into an existing fixture file')
+    rec.set_defaults(func=record)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
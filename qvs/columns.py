@@ -0,0 +1,31 @@
+"""Column names shared by the screener stages."""
+
+RV_COLUMNS = [
+    'Ticker',
+    'Price',
+    'Price-to-Earnings Ratio',
+    'PE Percentile',
+    'Price-to-Book Ratio',
+    'PB Percentile',
+    'Price-to-Sales Ratio',
+    'PS Percentile',
+    'EV/EBITDA',
+    'EV/EBITDA Percentile',
+    'EV/GP',
+    'EV/GP Percentile',
+    'RV Score',
+    'One-Year Price Return',
+    'Six-Month Price Return',
+    'Three-Month Price Return',
+    'One-Month Price Return',
+    'Market Capitalization',
+]
+
+# Value metric -> the percentile column it is ranked into.
+METRICS = {
+    'Price-to-Earnings Ratio': 'PE Percentile',
+    'Price-to-Book Ratio': 'PB Percentile',
+    'Price-to-Sales Ratio': 'PS Percentile',
+    'EV/EBITDA': 'EV/EBITDA Percentile',
+    'EV/GP': 'EV/GP Percentile'
+}
@@ -0,0 +1,73 @@
+"""Compact in-memory representations of listings and screener frames.
+
+``pd.read_csv('sp500.csv')`` stores every column as Python string objects,
+including ones the screen never looks at, and a float64 metric frame is
+twice as wide as the data needs. ``read_listing`` reads only the columns
+asked for and gives each a compact dtype: categories for sectors,
+sub-industries and locations, a nullable ``Int32`` for ``CIK`` and a
+datetime for ``Date added``. ``compact_frame`` applies the same idea to any
+screener frame. Float columns become float32, repeated strings (tickers in
+a multi-date history, sectors) become categoricals, and integers are
+downcast.
+
+Missing values stay NaN inside the float arrays. NaN already is the null
+mask for IEEE floats, and every ranking and imputation routine reads plain
+float arrays, so a separate mask would only add a copy. For dated panels
+stored on disk without a parse step, see ``qvs.backtest.Panel.save`` and
+``Panel.load``.
+"""
+
+import numpy as np
+import pandas as pd
+
+LISTING_DTYPES = {
+    'Symbol': object,
+    'Security': object,
+    'GICS Sector': 'category',
+    'GICS Sub-Industry': 'category',
+    'Headquarters Location': 'category',
+    'CIK': 'Int32',
+    'Founded': 'category',
+}
+
+LISTING_COLUMNS = ['Symbol', 'Security', 'GICS Sector', 'GICS Sub-Industry', 'Date added', 'CIK']
+
+CATEGORY_COLUMNS = ('Ticker', 'Symbol', 'GICS Sector', 'GICS Sub-Industry')
+
+
+def read_listing(path, columns=LISTING_COLUMNS):
+    """Read a listing CSV such as ``sp500.csv`` with compact dtypes.
+
+    ``columns`` limits which columns are parsed (``None`` reads all of them);
+    columns the file does not have are skipped.
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    usecols = list(header) if columns is None else [c for c in columns if c in header]
+    dates = ['Date added'] if 'Date added' in usecols else False
+    return pd.read_csv(path, usecols=usecols, parse_dates=dates,
+                       dtype={c: t for c, t in LISTING_DTYPES.items() if c in usecols})
+
+
+def compact_frame(frame, float_dtype=np.float32, categories=CATEGORY_COLUMNS, max_unique=0.5):
+    """Return a copy of ``frame`` with narrow dtypes.
+
+    Float columns are cast to ``float_dtype`` and integer columns are
+    downcast. ``categories`` columns become categoricals. So does any other
+    string column where at most ``max_unique`` of the values are distinct.
+    """
+    frame = frame.copy()
+    for column in frame.columns:
+        values = frame[column]
+        kind = values.dtype.kind if isinstance(values.dtype, np.dtype) else None
+        if kind == 'f':
+            frame[column] = values.astype(float_dtype)
+        elif kind in ('i', 'u'):
+            frame[column] = pd.to_numeric(values, downcast='integer' if kind == 'i' else 'unsigned')
+        elif kind == 'O' and (column in categories or values.nunique() <= max_unique * len(values)):
+            frame[column] = values.astype('category')
+    return frame
+
+
+def frame_bytes(frame):
+    """Memory used by ``frame``, counting the contents of string objects."""
+    return int(frame.memory_usage(deep=True, index=True).sum())
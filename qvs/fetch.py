@@ -0,0 +1,191 @@
+"""Concurrent fetching from the IEX ``stock/market/batch`` endpoint.
+
+``BatchFetcher`` splits the universe into 100-symbol chunks, like the
+screener's ``chunks`` helper, and requests them from a bounded thread pool
+over one keep-alive ``requests.Session``. Throttled (429) and server-error
+responses are retried with exponential backoff, honouring ``Retry-After``.
+A chunk that still fails, or a symbol that is absent from its response, is
+reported in ``FetchResult.failed`` instead of raising.
+"""
+
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+IEX_BASE_URL = 'https://cloud.iexapis.com/stable'
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def chunks(lst, n):
+    """Yield successive n-sized chunks from lst."""
+    for i in range(0, len(lst), n):
+        yield lst[i:i + n]
+
+
+def regroup(symbols, groups, n):
+    """Split ``symbols`` along the prebuilt batches ``groups``.
+
+    Each group keeps only its symbols that are in ``symbols`` (empty groups
+    are dropped, long ones split into n-sized chunks); symbols in no group
+    follow in n-sized chunks.
+    """
+    wanted = dict.fromkeys(symbols)
+    batches = []
+    for group in groups:
+        kept = [symbol for symbol in group if symbol in wanted]
+        for symbol in kept:
+            wanted.pop(symbol, None)
+        batches.extend(chunks(kept, n))
+    batches.extend(chunks(list(wanted), n))
+    return batches
+
+
+class FetchError(Exception):
+    """A batch request that failed after all of its retries."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class FetchResult:
+    """Merged batch responses plus the symbols that could not be fetched."""
+
+    def __init__(self):
+        self.data = {}
+        self.failed = {}
+        self.requests = 0
+
+    @property
+    def ok(self):
+        return not self.failed
+
+
+class BatchFetcher:
+    """Fetch ``types`` for many symbols with concurrent batch requests.
+
+    Use as a context manager (or call ``close``) so the pooled connections are
+    released. ``base_url`` can point at a local stub server for testing.
+    ``requests`` and ``bytes_received`` count every HTTP response, retries
+    included.
+    """
+
+    def __init__(self, token, types=('advanced-stats', 'quote'), base_url=IEX_BASE_URL,
+                 chunk_size=100, max_workers=8, timeout=10.0, retries=3,
+                 backoff=0.5, max_backoff=30.0, session=None):
+        self.token = token
+        self.types = list(types)
+        self.base_url = base_url.rstrip('/')
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.requests = 0
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    @property
+    def batch_url(self):
+        return f'{self.base_url}/stock/market/batch/'
+
+    def _redact(self, message):
+        # Connection errors quote the request URL, which carries the token.
+        return re.sub(r'token=[^&\s]+', 'token=***', message)
+
+    def _delay(self, attempt, response=None):
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after is not None:
+                try:
+                    return min(float(retry_after), self.max_backoff)
+                except ValueError:
+                    pass
+        delay = self.backoff * 2 ** attempt
+        return min(delay + random.uniform(0, delay / 2), self.max_backoff)
+
+    def fetch_chunk(self, symbols, types=None):
+        """Request one chunk, retrying throttled and transient failures."""
+        params = {'types': ','.join(types or self.types), 'symbols': ','.join(symbols), 'token': self.token}
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            try:
+                response = self.session.get(self.batch_url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as error:
+                if last_attempt:
+                    raise FetchError(self._redact(str(error))) from error
+                time.sleep(self._delay(attempt))
+                continue
+
+            with self._lock:
+                self.requests += 1
+                self.bytes_received += len(response.content)
+            if response.status_code == 200:
+                try:
+                    return response.json()
+                except ValueError as error:
+                    raise FetchError(f'invalid JSON: {error}', response.status_code) from error
+            if response.status_code not in RETRY_STATUSES or last_attempt:
+                raise FetchError(f'HTTP {response.status_code}: {response.text[:200]}',
+                                 response.status_code)
+            time.sleep(self._delay(attempt, response))
+
+    def iter_batches(self, symbols, types=None, groups=None):
+        """Yield ``(chunk, data, error)`` for every chunk as soon as it completes.
+
+        ``data`` is the parsed response (empty when the chunk failed) and
+        ``error`` is the ``FetchError`` or ``None``. ``types`` overrides the
+        fetcher's endpoint list for this call. ``groups`` are prebuilt
+        batches, such as ``MembershipIndex.batches``, to request instead of
+        re-chunking ``symbols`` (see ``regroup``).
+        """
+        if groups is None:
+            groups = list(chunks(list(symbols), self.chunk_size))
+        else:
+            groups = regroup(symbols, groups, self.chunk_size)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self.fetch_chunk, group, types): group for group in groups}
+            for future in as_completed(futures):
+                group = futures[future]
+                try:
+                    yield group, future.result(), None
+                except FetchError as error:
+                    yield group, {}, error
+
+    def fetch(self, symbols, types=None, groups=None):
+        """Fetch every symbol and return a ``FetchResult``."""
+        result = FetchResult()
+        for group, data, error in self.iter_batches(symbols, types, groups):
+            result.requests += 1
+            if error is not None:
+                result.failed.update((symbol, str(error)) for symbol in group)
+                continue
+            for symbol in group:
+                if symbol in data:
+                    result.data[symbol] = data[symbol]
+                else:
+                    result.failed[symbol] = 'missing from response'
+        return result
@@ -0,0 +1,218 @@
+"""Incremental RV re-scoring for intraday updates.
+
+A full re-score imputes every metric with its column mean, re-ranks every
+column and re-averages every ``RV Score``. When a quote batch refreshes only
+a few symbols, most of that work gives the same answer again.
+``IncrementalScorer`` keeps each metric's observed values in a sorted index,
+with a running sum and count for the imputation mean. An update moves the
+changed values within the index. Only the stocks whose rank can have moved
+are re-ranked: those whose value lies between a changed value's old and new
+position, and the imputed stocks when the mean moves. Scores are then
+re-averaged for those stocks, and the changes to the top of the book are
+reported.
+
+The results match ``qvs.pipeline.score`` on the updated frame. Grouped
+scoring (``group_by``) is not handled incrementally.
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from qvs.columns import METRICS
+from qvs.ranking import percentile_ranks
+from qvs.topk import top_k_indices
+
+
+class TopChange:
+    """What an update did to the top ``n``: tickers that entered, that left, and the new top."""
+
+    def __init__(self, added, removed, top, rescored):
+        self.added = added
+        self.removed = removed
+        self.top = top
+        self.rescored = rescored
+
+    def __bool__(self):
+        return bool(self.added or self.removed)
+
+    def __repr__(self):
+        return f'TopChange(added={self.added}, removed={self.removed}, rescored={self.rescored})'
+
+
+class IncrementalScorer:
+    """Keep RV percentiles, scores and the top ``n`` current as values change.
+
+    ``frame`` is an RV frame with a ``Ticker`` column and the ``metrics``
+    columns. Pass later values to ``update``. Functions registered with
+    ``subscribe`` are called with each ``TopChange`` that alters the top
+    ``n``.
+    """
+
+    def __init__(self, frame, metrics=METRICS, top=50):
+        self.metrics = dict(metrics)
+        self.top = top
+        self._listeners = []
+        self._load(frame.reset_index(drop=True))
+
+    def _load(self, frame):
+        self._frame = frame.copy()
+        self.tickers = frame['Ticker'].to_numpy(dtype=object)
+        self._rows = pd.Index(self.tickers)
+        self.values = frame[list(self.metrics)].to_numpy(dtype=np.float64, copy=True)
+
+        observed = ~np.isnan(self.values)
+        self._count = observed.sum(axis=0)
+        self._sum = np.where(observed, self.values, 0.0).sum(axis=0)
+        self._index = []
+        for j in range(self.values.shape[1]):
+            rows = np.flatnonzero(observed[:, j])
+            order = np.argsort(self.values[rows, j], kind='stable')
+            self._index.append((self.values[rows[order], j], rows[order]))
+
+        self.ranks = percentile_ranks(self._effective(np.arange(len(self.tickers))))
+        self.scores = self._row_scores(self.ranks)
+        self.members = self._select()
+
+    def _means(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self._sum / self._count
+
+    def _effective(self, rows):
+        """Values of ``rows`` as scored: missing entries take their column mean."""
+        values = self.values[rows]
+        return np.where(np.isnan(values), self._means(), values)
+
+    def _row_scores(self, ranks):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            return np.nanmean(ranks, axis=1)
+
+    def _select(self):
+        return top_k_indices(self.scores, self.top, tie_keys=self.tickers)
+
+    def subscribe(self, callback):
+        """Call ``callback(change)`` whenever an update alters the top ``n``."""
+        self._listeners.append(callback)
+        return callback
+
+    def update(self, changes):
+        """Apply new values and return the ``TopChange``.
+
+        ``changes`` is a frame with a ``Ticker`` column and any of the
+        scorer's columns. Unknown tickers are added to the universe. Every
+        stock's percentile depends on the universe size, so adding tickers
+        re-scores everything.
+        """
+        changes = changes.drop_duplicates('Ticker', keep='last')
+        before = self.tickers[self.members].tolist()
+        rows = self._rows.get_indexer(changes['Ticker'])
+        known = rows >= 0
+        if known.all():
+            self._write(changes, rows)
+            rescored = self._rescore(changes, rows)
+        else:
+            self._write(changes[known], rows[known])
+            self._load(pd.concat([self._frame, changes[~known]], ignore_index=True))
+            rescored = len(self.tickers)
+
+        after = self.tickers[self.members].tolist()
+        change = TopChange([t for t in after if t not in set(before)],
+                           [t for t in before if t not in set(after)], after, rescored)
+        if change:
+            for callback in self._listeners:
+                callback(change)
+        return change
+
+    def _write(self, changes, rows):
+        columns = [c for c in changes.columns if c != 'Ticker' and c in self._frame.columns]
+        for column in columns:
+            self._frame.iloc[rows, self._frame.columns.get_loc(column)] = changes[column].to_numpy()
+
+    def _rescore(self, changes, rows):
+        """Move the changed values in each index and re-rank the stocks they can affect."""
+        n = len(self.tickers)
+        touched = [rows]
+        for j, metric in enumerate(self.metrics):
+            if metric not in changes.columns:
+                continue
+            new = changes[metric].to_numpy(dtype=np.float64)
+            old = self.values[rows, j]
+            moved = ~((old == new) | (np.isnan(old) & np.isnan(new)))
+            if not moved.any():
+                continue
+            count_before = self._count[j]
+            mean_before = self._sum[j] / count_before if count_before else np.nan
+            self._move(j, rows[moved], old[moved], new[moved])
+            mean_after = self._sum[j] / self._count[j] if self._count[j] else np.nan
+
+            if np.isnan(mean_before) or np.isnan(mean_after):
+                # The column went from or to all-missing: every rank changes.
+                affected = np.arange(n)
+            else:
+                # A stock's rank moves only if some scored value crossed or
+                # touched its own: a changed value, or the imputed mean.
+                was = np.where(np.isnan(old[moved]), mean_before, old[moved])
+                now = np.where(np.isnan(new[moved]), mean_after, new[moved])
+                lows, highs = np.minimum(was, now), np.maximum(was, now)
+                if min(count_before, self._count[j]) < n:
+                    lows = np.append(lows, min(mean_before, mean_after))
+                    highs = np.append(highs, max(mean_before, mean_after))
+                values, index_rows = self._index[j]
+                starts = np.searchsorted(values, lows, 'left')
+                stops = np.searchsorted(values, highs, 'right')
+                affected = np.unique(np.concatenate(
+                    [index_rows[a:b] for a, b in zip(starts, stops)]
+                    + [rows[moved], np.flatnonzero(np.isnan(self.values[:, j]))]))
+            self.ranks[affected, j] = self._column_ranks(j, affected)
+            touched.append(affected)
+
+        rescored = np.unique(np.concatenate(touched))
+        self.scores[rescored] = self._row_scores(self.ranks[rescored])
+        self.members = self._select()
+        return len(rescored)
+
+    def _move(self, j, rows, old, new):
+        """Replace ``old`` with ``new`` for ``rows`` in column ``j``'s index, sum and count."""
+        values, index_rows = self._index[j]
+        had, has = ~np.isnan(old), ~np.isnan(new)
+        if had.any():
+            remove = np.flatnonzero(np.isin(index_rows, rows[had]))
+            values, index_rows = np.delete(values, remove), np.delete(index_rows, remove)
+        if has.any():
+            order = np.argsort(new[has], kind='stable')
+            at = np.searchsorted(values, new[has][order], 'right')
+            values = np.insert(values, at, new[has][order])
+            index_rows = np.insert(index_rows, at, rows[has][order])
+        self._index[j] = (values, index_rows)
+        self._sum[j] += new[has].sum() - old[had].sum()
+        self._count[j] += has.sum() - had.sum()
+        self.values[rows, j] = new
+
+    def _column_ranks(self, j, rows):
+        """``percentile_ranks`` of ``rows`` in column ``j``, from the sorted index."""
+        n = len(self.tickers)
+        if self._count[j] == 0:
+            return np.full(len(rows), np.nan)
+        values = self._index[j][0]
+        mean = self._sum[j] / self._count[j]
+        imputed = n - self._count[j]
+        x = self.values[rows, j]
+        x = np.where(np.isnan(x), mean, x)
+        left = np.searchsorted(values, x, 'left') + imputed * (mean < x)
+        right = np.searchsorted(values, x, 'right') + imputed * (mean <= x)
+        return (left + right + (left < right)) * (50.0 / n) / 100
+
+    def frame(self):
+        """The scored frame: imputed metrics, percentile columns and ``RV Score``."""
+        frame = self._frame.copy()
+        frame[list(self.metrics)] = self._effective(np.arange(len(self.tickers)))
+        for j, column in enumerate(self.metrics.values()):
+            frame[column] = self.ranks[:, j]
+        frame['RV Score'] = self.scores
+        return frame
+
+    def portfolio(self):
+        """The current top ``n`` rows of ``frame()``, best first."""
+        return self.frame().iloc[self.members].reset_index(drop=True)
@@ -0,0 +1,120 @@
+"""Columnar ingestion of IEX batch responses.
+
+Growing a DataFrame with ``_append`` copies every existing row on each call.
+``BatchIngestor`` instead preallocates one typed array per column for the
+whole universe, writes each batch response straight into those arrays and
+builds the DataFrame once at the end. Missing fields stay ``NaN`` rather than
+being replaced with ``'N/A'`` strings, so every metric column is numeric.
+"""
+
+import numpy as np
+import pandas as pd
+
+from qvs.columns import METRICS, RV_COLUMNS
+
+# Output column -> (batch endpoint, response field).
+PE_FIELDS = {
+    'Price': ('quote', 'latestPrice'),
+    'Price-to-Earnings Ratio': ('stats', 'peRatio'),
+}
+
+RV_FIELDS = {
+    'Price': ('quote', 'latestPrice'),
+    'Price-to-Earnings Ratio': ('quote', 'peRatio'),
+    'Price-to-Book Ratio': ('advanced-stats', 'priceToBook'),
+    'Price-to-Sales Ratio': ('advanced-stats', 'priceToSales'),
+    'Enterprise Value': ('advanced-stats', 'enterpriseValue'),
+    'EBITDA': ('advanced-stats', 'EBITDA'),
+    'Gross Profit': ('advanced-stats', 'grossProfit'),
+    'One-Year Price Return': ('advanced-stats', 'year1ChangePercent'),
+    'Six-Month Price Return': ('advanced-stats', 'month6ChangePercent'),
+    'Three-Month Price Return': ('advanced-stats', 'month3ChangePercent'),
+    'One-Month Price Return': ('advanced-stats', 'month1ChangePercent'),
+    'Market Capitalization': ('advanced-stats', 'marketcap'),
+}
+
+
+class BatchIngestor:
+    """Collect batch responses for a fixed universe into column arrays.
+
+    ``fields`` maps each output column to the ``(endpoint, field)`` it is read
+    from. Call ``add_batch`` with every parsed batch response, then
+    ``to_frame`` once all of them have arrived.
+    """
+
+    def __init__(self, symbols, fields, dtype=np.float64):
+        self.symbols = np.asarray(list(symbols), dtype=object)
+        self.fields = dict(fields)
+        self.positions = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.columns = {column: np.full(len(self.symbols), np.nan, dtype=dtype)
+                        for column in self.fields}
+        self.received = np.zeros(len(self.symbols), dtype=bool)
+
+        # Group the lookups by endpoint so each section is fetched once.
+        self._by_endpoint = {}
+        for column, (endpoint, field) in self.fields.items():
+            self._by_endpoint.setdefault(endpoint, []).append((self.columns[column], field))
+
+    def add_batch(self, data):
+        """Write one batch response (``{symbol: {endpoint: {...}}}``) into the arrays.
+
+        Symbols outside the universe are ignored; fields that are absent or
+        ``None`` are left as ``NaN``.
+        """
+        positions = self.positions
+        for symbol, payload in data.items():
+            row = positions.get(symbol)
+            if row is None or not payload:
+                continue
+            self.received[row] = True
+            for endpoint, targets in self._by_endpoint.items():
+                section = payload.get(endpoint)
+                if not section:
+                    continue
+                for array, field in targets:
+                    value = section.get(field)
+                    if value is not None:
+                        array[row] = value
+
+    @property
+    def missing(self):
+        """Symbols that no batch response has covered yet."""
+        return list(self.symbols[~self.received])
+
+    def to_frame(self):
+        """Build the DataFrame (``Ticker`` plus one column per field) in one go."""
+        frame = pd.DataFrame(self.columns)
+        frame.insert(0, 'Ticker', self.symbols)
+        return frame
+
+
+def safe_ratio(numerator, denominator, positive=False):
+    """Element-wise ``numerator / denominator`` with ``NaN`` for zero or missing denominators.
+
+    With ``positive``, negative denominators give ``NaN`` as well.
+    """
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    out = np.full(np.broadcast(numerator, denominator).shape, np.nan)
+    np.divide(numerator, denominator, out=out, where=denominator > 0 if positive else denominator != 0)
+    return out
+
+
+def rv_frame(ingestor):
+    """Turn an ingestor built with ``RV_FIELDS`` into a frame with ``RV_COLUMNS``.
+
+    EV/EBITDA and EV/GP are derived column-wise, and are ``NaN`` where EBITDA
+    or gross profit is not positive: a negative EV over a negative
+    denominator would otherwise look like a cheap multiple. The percentile
+    and ``RV Score`` columns start out as ``NaN`` floats.
+    """
+    columns = ingestor.columns
+    data = {'Ticker': ingestor.symbols}
+    for column in RV_COLUMNS[1:]:
+        if column in columns:
+            data[column] = columns[column]
+    data['EV/EBITDA'] = safe_ratio(columns['Enterprise Value'], columns['EBITDA'], positive=True)
+    data['EV/GP'] = safe_ratio(columns['Enterprise Value'], columns['Gross Profit'], positive=True)
+    for column in list(METRICS.values()) + ['RV Score']:
+        data[column] = np.full(len(ingestor.symbols), np.nan)
+    return pd.DataFrame(data, columns=RV_COLUMNS)
@@ -0,0 +1,121 @@
+"""Per-stage instrumentation of a screener run.
+
+Wrap each stage of a run (fetch, ingest, score, export, ...) in
+``recorder.stage(name)``. Wall time is always recorded. The stage code can
+also set ``rows``, ``requests`` and ``bytes`` on the ``Stage`` it is given.
+With ``trace_memory`` on, the peak memory allocated during each stage
+(numpy arrays included) is measured with ``tracemalloc``. With
+``profile_dir`` set, each stage also runs under ``cProfile`` and its stats
+are dumped to ``<profile_dir>/<n>-<stage>.prof``, for ``pstats`` or
+snakeviz. ``report()`` and ``write(path)`` produce a JSON run report.
+
+``Recorder.from_argv()`` turns memory tracing and profiling on when the
+process was started with ``--profile`` (or ``--profile=DIR``), so a run can
+be profiled without editing code. Stages are not meant to be nested.
+"""
+
+import cProfile
+import json
+import os
+import re
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+DEFAULT_PROFILE_DIR = 'profiles'
+
+
+class Stage:
+    """What one stage did: wall time, rows, requests, bytes and peak memory."""
+
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.seconds = None
+        self.rows = rows
+        self.requests = None
+        self.bytes = None
+        self.peak_memory = None
+        self.profile = None
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    def __repr__(self):
+        return f'Stage({self.name!r}, {self.seconds:.3f}s)' if self.seconds is not None else f'Stage({self.name!r})'
+
+
+class Recorder:
+    """Collect a ``Stage`` for every ``stage(name)`` block of a run."""
+
+    def __init__(self, trace_memory=False, profile_dir=None, clock=time.perf_counter):
+        self.trace_memory = trace_memory
+        self.profile_dir = profile_dir
+        self.clock = clock
+        self.started = datetime.now(timezone.utc)
+        self.stages = []
+
+    @classmethod
+    def from_argv(cls, argv=None):
+        """A recorder that traces and profiles if ``argv`` (default ``sys.argv``) has ``--profile``."""
+        for arg in sys.argv[1:] if argv is None else argv:
+            if arg == '--profile' or arg.startswith('--profile='):
+                return cls(trace_memory=True, profile_dir=arg.partition('=')[2] or DEFAULT_PROFILE_DIR)
+        return cls()
+
+    @property
+    def enabled(self):
+        return self.trace_memory or self.profile_dir is not None
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """Time the block as stage ``name`` and yield its ``Stage`` to fill in."""
+        stage = Stage(name, rows)
+        tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        elif self.trace_memory:
+            tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0] if self.trace_memory else 0
+        profiler = cProfile.Profile() if self.profile_dir is not None else None
+        if profiler is not None:
+            profiler.enable()
+        start = self.clock()
+        try:
+            yield stage
+        finally:
+            stage.seconds = self.clock() - start
+            if profiler is not None:
+                profiler.disable()
+                os.makedirs(self.profile_dir, exist_ok=True)
+                slug = re.sub(r'[^\w.-]+', '_', name)
+                stage.profile = os.path.join(self.profile_dir, f'{len(self.stages):02d}-{slug}.prof')
+                profiler.dump_stats(stage.profile)
+            if self.trace_memory:
+                stage.peak_memory = tracemalloc.get_traced_memory()[1] - baseline
+                if tracing:
+                    tracemalloc.stop()
+            self.stages.append(stage)
+
+    def report(self, **meta):
+        """The run report as a JSON-serializable dict; ``meta`` is stored alongside."""
+        return {
+            'started': self.started.isoformat(),
+            'total_seconds': sum(stage.seconds for stage in self.stages),
+            'python': sys.version.split()[0],
+            'meta': meta,
+            'stages': [stage.to_dict() for stage in self.stages],
+        }
+
+    def write(self, path, **meta):
+        """Write ``report(**meta)`` to ``path`` as JSON and return the path."""
+        with open(path, 'w') as handle:
+            json.dump(self.report(**meta), handle, indent=2, default=str)
+        return path
+
+    def frame(self):
+        """The stages as a DataFrame, one row per stage."""
+        import pandas as pd
+
+        return pd.DataFrame([stage.to_dict() for stage in self.stages]).set_index('name')
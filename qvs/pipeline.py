@@ -0,0 +1,245 @@
+"""The RV screen as a reentrant function, and a process pool to run many.
+
+``run_screen(universe, config)`` runs the whole screener (fetch, ingest,
+impute, rank, score, select, size, returns) using only its arguments, so any
+number of screens can run side by side. With ``config.stream`` the fetch
+runs through ``qvs.streaming``, which scores each batch as it arrives. ``run_many`` fans universes or
+parameter sets out across CPU cores. When the fundamentals are already in
+hand they are packed once into shared memory and every worker reads them in
+place rather than receiving its own copy.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from qvs.cleaning import clean_metrics
+from qvs.columns import METRICS
+from qvs.fetch import IEX_BASE_URL
+from qvs.instrument import Recorder
+from qvs.ranking import assign_percentiles
+from qvs.returns import compare_schemes
+from qvs.topk import top_n
+from qvs.weighting import allocate
+
+
+@dataclass(frozen=True)
+class ScreenConfig:
+    """Parameters of one screen."""
+
+    portfolio_size: float = 1000000.0
+    top: int = 50
+    scheme: str = 'equal'
+    redistribute: bool = False
+    compare: tuple = ('equal', '80-20')
+    group_by: str = None
+    sector_cap: int = None
+    sector_column: str = 'GICS Sector'
+    impute: str = 'mean'
+    token: str = None
+    base_url: str = IEX_BASE_URL
+    cache_path: str = None
+    fetch_workers: int = 8
+    stream: bool = False
+
+
+class ScreenResult:
+    """Everything one screen produced."""
+
+    def __init__(self, universe, config, scored, portfolio, returns, failed, stages=()):
+        self.universe = universe
+        self.config = config
+        self.scored = scored
+        self.portfolio = portfolio
+        self.returns = returns
+        self.failed = failed
+        self.stages = list(stages)
+
+    def __repr__(self):
+        return f'ScreenResult({self.universe!r}, {len(self.portfolio)} positions)'
+
+
+def fetch_fundamentals(symbols, config, recorder=None):
+    """Download the RV inputs for ``symbols`` and return ``(rv frame, failed symbols)``."""
+    from qvs.fetch import BatchFetcher
+    from qvs.ingest import RV_FIELDS, BatchIngestor, rv_frame
+
+    recorder = recorder or Recorder()
+    with recorder.stage('fetch', rows=len(symbols)) as stage, \
+            BatchFetcher(config.token, types=('advanced-stats', 'quote'), base_url=config.base_url,
+                         max_workers=config.fetch_workers) as fetcher:
+        if config.cache_path:
+            from qvs.cache import CachedFetcher, ResponseCache
+            with ResponseCache(config.cache_path) as cache:
+                result = CachedFetcher(fetcher, cache).fetch(symbols)
+        else:
+            result = fetcher.fetch(symbols)
+        stage.requests, stage.bytes = fetcher.requests, fetcher.bytes_received
+    with recorder.stage('ingest', rows=len(result.data)):
+        ingestor = BatchIngestor(symbols, RV_FIELDS)
+        ingestor.add_batch(result.data)
+        frame = rv_frame(ingestor)
+    return frame, result.failed
+
+
+def score(frame, group_by=None, impute='mean', sector_column='GICS Sector'):
+    """Impute missing metrics, rank them and add ``RV Score``.
+
+    With ``impute='mean'`` gaps take the column mean. With ``group_by`` (e.g.
+    ``'GICS Sector'`` or ``'GICS Sub-Industry'``) both that mean and the
+    percentiles are taken within each group. ``impute='median'`` runs
+    ``clean_metrics`` instead, with medians taken per ``sector_column`` when
+    the frame has one.
+    """
+    metrics = list(METRICS)
+    if impute == 'median':
+        frame, _ = clean_metrics(frame, group_by=sector_column if sector_column in frame else None)
+    elif impute == 'mean':
+        frame = frame.copy()
+        if group_by is None:
+            frame[metrics] = frame[metrics].fillna(frame[metrics].mean())
+        else:
+            frame[metrics] = frame[metrics].fillna(frame.groupby(group_by, observed=True)[metrics].transform('mean'))
+    else:
+        raise ValueError(f"impute must be 'mean' or 'median', not {impute!r}")
+    assign_percentiles(frame, group_by=group_by)
+    frame['RV Score'] = frame[list(METRICS.values())].mean(axis=1)
+    return frame
+
+
+def run_screen(universe, config=ScreenConfig(), fundamentals=None, recorder=None):
+    """Screen ``universe`` and return a ``ScreenResult``.
+
+    ``fundamentals`` is an RV frame (``Ticker`` plus the ``rv_frame`` columns)
+    covering at least the universe; when omitted the data is fetched. Each
+    stage is timed by ``recorder`` (a fresh ``Recorder`` by default) and the
+    stages end up in ``ScreenResult.stages``.
+
+    ``config.stream`` fetches with ``qvs.streaming.stream_fundamentals`` on a
+    new event loop (so not from inside a running one). Its running
+    aggregates are used for the score when ``impute`` is ``'mean'`` and
+    there is no ``group_by``. The response cache is not used when streaming.
+    """
+    recorder = recorder or Recorder()
+    scorer = None
+    if fundamentals is None and config.stream:
+        from qvs.streaming import stream_fundamentals
+
+        frame, failed, scorer = asyncio.run(stream_fundamentals(universe.symbols, config, recorder))
+    elif fundamentals is None:
+        frame, failed = fetch_fundamentals(universe.symbols, config, recorder)
+    else:
+        with recorder.stage('ingest') as stage:
+            frame = fundamentals[fundamentals['Ticker'].isin(universe.symbols)].reset_index(drop=True)
+            failed = {symbol: 'not in fundamentals' for symbol in
+                      set(universe.symbols).difference(frame['Ticker'])}
+            stage.rows = len(frame)
+
+    group_columns = {c for c in (config.group_by, config.sector_cap and config.sector_column) if c}
+    if config.impute == 'median' and universe.info is not None and config.sector_column in universe.info:
+        # Sector medians when the listing has sectors; universe medians otherwise.
+        group_columns.add(config.sector_column)
+    if group_columns - set(frame.columns):
+        if universe.info is None:
+            raise ValueError(f'grouping by {sorted(group_columns)} needs a universe loaded from a listing')
+        info = universe.info.drop_duplicates('Symbol').set_index('Symbol')
+        for column in group_columns - set(frame.columns):
+            frame[column] = frame['Ticker'].map(info[column])
+
+    with recorder.stage('score', rows=len(frame)):
+        if scorer is not None and config.group_by is None and config.impute == 'mean':
+            scored = scorer.score(frame)
+        else:
+            scored = score(frame, config.group_by, config.impute, config.sector_column)
+    with recorder.stage('select', rows=len(scored)):
+        portfolio = top_n(scored, 'RV Score', config.top,
+                          group_by=config.sector_column, group_cap=config.sector_cap)
+    with recorder.stage('size', rows=len(portfolio)):
+        portfolio = allocate(portfolio, config.portfolio_size, config.scheme, config.redistribute)
+        returns = compare_schemes(portfolio, list(config.compare))
+    return ScreenResult(universe.name, config, scored, portfolio, returns, failed, recorder.stages)
+
+
+class SharedFrame:
+    """A DataFrame's numeric columns held in one shared-memory block.
+
+    The creating process owns the block (``close`` then ``unlink`` it);
+    workers ``attach`` by description and get a frame whose numeric columns
+    are views of the same memory. The block is column-major, so every column
+    is one contiguous slice. Non-numeric columns (tickers, sectors) are not
+    shared: they travel as lists in the description, so every worker
+    receives its own copy of them through ``initargs``.
+    """
+
+    def __init__(self, frame):
+        numeric = [c for c in frame.columns if pd.api.types.is_numeric_dtype(frame[c])]
+        values = frame[numeric].to_numpy(dtype=np.float64).T
+        self._shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        np.ndarray(values.shape, dtype=np.float64, buffer=self._shm.buf)[:] = values
+        self.spec = {
+            'name': self._shm.name,
+            'shape': values.shape,
+            'numeric': numeric,
+            'other': {c: frame[c].tolist() for c in frame.columns if c not in numeric},
+            'order': list(frame.columns),
+        }
+
+    @staticmethod
+    def attach(spec):
+        """Return ``(frame, handle)``; keep ``handle`` alive while the frame is used."""
+        shm = shared_memory.SharedMemory(name=spec['name'])
+        values = np.ndarray(spec['shape'], dtype=np.float64, buffer=shm.buf)
+        # The transpose of the (columns x rows) block is pandas' own block layout, so no copy is made.
+        frame = pd.DataFrame(values.T, columns=spec['numeric'], copy=False)
+        for position, column in enumerate(spec['order']):
+            if column in spec['other']:
+                frame.insert(position, column, spec['other'][column])
+        return frame, shm
+
+    def close(self):
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_worker_fundamentals = None
+_worker_handle = None
+
+
+def _init_worker(spec):
+    global _worker_fundamentals, _worker_handle
+    if spec is not None:
+        _worker_fundamentals, _worker_handle = SharedFrame.attach(spec)
+
+
+def _run_job(job):
+    universe, config = job
+    return run_screen(universe, config, _worker_fundamentals)
+
+
+def run_many(jobs, fundamentals=None, max_workers=None):
+    """Run ``(universe, config)`` jobs across processes; results come back in job order.
+
+    With ``fundamentals`` every job screens from that shared frame; without
+    it each job fetches its own data.
+    """
+    jobs = list(jobs)
+    max_workers = max_workers or min(len(jobs), os.cpu_count() or 1) or 1
+    shared = SharedFrame(fundamentals) if fundamentals is not None else None
+    try:
+        with ProcessPoolExecutor(max_workers, initializer=_init_worker,
+                                 initargs=(shared.spec if shared else None,)) as pool:
+            return list(pool.map(_run_job, jobs))
+    finally:
+        if shared is not None:
+            shared.close()
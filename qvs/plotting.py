@@ -0,0 +1,160 @@
+"""Headless bar charts of scheme returns, rendered in bulk.
+
+The script's returns comparison draws through pyplot: a new figure per
+chart, an ``annotate`` call per bar, then a blocking ``plt.show()``.
+``ReturnsChart`` draws on a ``Figure`` with the Agg canvas attached
+directly. It never touches pyplot, so it needs no display and keeps no
+global state. Its bars, value labels, axes and legend are created once. Each
+``draw`` then only sets bar heights, label texts and positions, the y limits
+and the title, and the artists are rebuilt only when the schemes or
+timeframes change. ``render_charts`` renders a set of scenarios (a name and
+a returns frame such as ``compare_schemes`` output) to PNG and/or SVG files.
+It reuses one chart per process and can spread the scenarios over worker
+processes.
+
+matplotlib is imported when the first chart is created.
+"""
+
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+FORMATS = ('png', 'svg')
+COLORS = ('skyblue', 'salmon', 'mediumseagreen', 'plum', 'khaki', 'lightslategray')
+# Legend labels for the ``compare_schemes`` row names; other rows are labelled by name.
+LABELS = {'equal': 'Equal Weightage', '80-20': '80-20 Principle'}
+
+
+class ReturnsChart:
+    """A reusable grouped bar chart: one bar series per scheme, one group per timeframe."""
+
+    def __init__(self, figsize=(8, 6), dpi=100, width=0.2, labels=LABELS, colors=COLORS):
+        try:
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            from matplotlib.figure import Figure
+        except ImportError as error:
+            raise ImportError('ReturnsChart requires matplotlib (pip install matplotlib)') from error
+
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        FigureCanvasAgg(self.figure)
+        # Fixed margins: a tight layout would be recomputed on every render.
+        self.figure.subplots_adjust(left=0.1, right=0.97, bottom=0.1, top=0.92)
+        self.axes = self.figure.add_subplot()
+        self.width = width
+        self.labels = dict(labels)
+        self.colors = colors
+        self.shape = None
+
+    def _build(self, schemes, horizons):
+        axes = self.axes
+        axes.clear()
+        x = np.arange(len(horizons))
+        offsets = (np.arange(len(schemes)) - (len(schemes) - 1) / 2) * self.width
+        self.bars = [axes.bar(x + offset, np.zeros(len(x)), self.width, color=self.colors[i % len(self.colors)])
+                     for i, offset in enumerate(offsets)]
+        self.texts = [[axes.annotate('', xy=(rect.get_x() + rect.get_width() / 2, 0), xytext=(0, 3),
+                                     textcoords='offset points', ha='center', va='bottom',
+                                     fontsize=8, weight='bold') for rect in bars]
+                      for bars in self.bars]
+        axes.set_xlabel('Timeframe', fontsize=12)
+        axes.set_ylabel('Returns (%)', fontsize=12)
+        axes.set_xticks(x, [str(horizon) for horizon in horizons], fontsize=10)
+        axes.tick_params(axis='y', labelsize=10)
+        axes.grid(axis='y', linestyle='--', alpha=0.7)
+        axes.set_axisbelow(True)
+        axes.legend(self.bars, [self.labels.get(scheme, str(scheme)) for scheme in schemes], fontsize=10)
+        self.title = axes.set_title('', fontsize=14)
+        self.shape = (schemes, horizons)
+
+    def draw(self, returns, title='Comparison of Returns'):
+        """Show ``returns`` (rows: schemes, columns: timeframes) and return the figure."""
+        shape = (tuple(returns.index), tuple(returns.columns))
+        if shape != self.shape:
+            self._build(*shape)
+        values = returns.to_numpy(dtype=np.float64)
+        for bars, texts, row in zip(self.bars, self.texts, values):
+            for rect, text, height in zip(bars, texts, row):
+                missing = np.isnan(height)
+                height = 0.0 if missing else height
+                rect.set_height(height)
+                text.xy = (text.xy[0], height)
+                text.xyann = (0, -3 if height < 0 else 3)
+                text.set_va('top' if height < 0 else 'bottom')
+                text.set_text('' if missing else str(round(height, 2)))
+
+        finite = values[np.isfinite(values)]
+        low, high = min(finite.min(initial=0), 0), max(finite.max(initial=0), 0)
+        pad = 0.1 * (high - low) or 1.0
+        self.axes.set_ylim(low - pad if low < 0 else 0, high + pad)
+        self.title.set_text(title)
+        return self.figure
+
+    def save(self, path, format=None):
+        """Write the current chart; the format is taken from the extension unless given."""
+        self.figure.savefig(path, format=format)
+
+
+def chart_filename(name, taken):
+    """A file name stem for ``name`` that is not in ``taken`` (which it is added to)."""
+    base = re.sub(r'[^\w.-]+', '_', str(name)).strip('_') or 'chart'
+    stem, suffix = base, 1
+    while stem in taken:
+        suffix += 1
+        stem = f'{base}-{suffix}'
+    taken.add(stem)
+    return stem
+
+
+def _render(chart, jobs, output_dir, formats):
+    paths = []
+    for stem, title, returns in jobs:
+        chart.draw(returns, title=title)
+        for fmt in formats:
+            path = os.path.join(output_dir, f'{stem}.{fmt}')
+            chart.save(path, format=fmt)
+            paths.append(path)
+    return paths
+
+
+def render_charts(scenarios, output_dir, formats=('png',), max_workers=1, chunk_size=None, **chart_options):
+    """Render every scenario to ``output_dir`` and return the paths written.
+
+    ``scenarios`` is a dict or an iterable of ``(name, returns)`` pairs; each
+    name is the chart title and, made file-safe, the file name. One file is
+    written per name and entry of ``formats`` (``'png'``, ``'svg'``). With
+    ``max_workers`` above 1 (``None``: all cores), the scenarios are split
+    over that many processes, each reusing its own ``ReturnsChart``.
+    ``chart_options`` are passed to ``ReturnsChart``.
+    """
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        raise ValueError(f'unknown chart formats {sorted(unknown)}; choose from {list(FORMATS)}')
+    scenarios = list(scenarios.items()) if hasattr(scenarios, 'items') else list(scenarios)
+    taken = set()
+    jobs = [(chart_filename(name, taken), str(name), returns) for name, returns in scenarios]
+    os.makedirs(output_dir, exist_ok=True)
+
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(jobs) < 2:
+        return _render(ReturnsChart(**chart_options), jobs, output_dir, formats)
+    chunk_size = chunk_size or max(1, -(-len(jobs) // (max_workers * 4)))
+    batches = [jobs[first:first + chunk_size] for first in range(0, len(jobs), chunk_size)]
+    with ProcessPoolExecutor(max_workers, initializer=_init_worker,
+                             initargs=(output_dir, tuple(formats), chart_options)) as pool:
+        return [path for paths in pool.map(_render_job, batches) for path in paths]
+
+
+_worker_chart = None
+_worker_output = None
+
+
+def _init_worker(output_dir, formats, chart_options):
+    global _worker_chart, _worker_output
+    _worker_chart = ReturnsChart(**chart_options)
+    _worker_output = (output_dir, formats)
+
+
+def _render_job(jobs):
+    return _render(_worker_chart, jobs, *_worker_output)
@@ -0,0 +1,115 @@
+"""Vectorized percentile ranking.
+
+``percentile_ranks`` reproduces ``scipy.stats.percentileofscore(a, x)`` with
+the default ``kind='rank'`` for every value of every column at once. Each
+column is sorted a single time and the tie groups are read off the sorted
+order, so ranking n stocks costs O(n log n) instead of the O(n^2) of calling
+``percentileofscore`` once per row.
+"""
+
+import numpy as np
+import pandas as pd
+
+from qvs.columns import METRICS
+
+
+def percentile_ranks(values, nan_policy='propagate', groups=None):
+    """Return the percentile (0-1] of each value within its own column.
+
+    ``values`` is a 1-D array or a 2-D (stocks x metrics) array. Ties share
+    the ``percentileofscore`` "rank" score. With ``nan_policy='propagate'``
+    a column holding any NaN ranks to all NaN, as scipy does; with ``'omit'``
+    NaNs are left out of the ranking and stay NaN in the output.
+
+    ``groups`` optionally gives each row an integer group code (e.g. a
+    sector); every value is then ranked only against its own group, and rows
+    with a negative code rank to NaN. All groups are ranked in the same sort.
+    """
+    if nan_policy not in ('propagate', 'omit'):
+        raise ValueError("nan_policy can only be 'propagate' or 'omit'")
+
+    values = np.asarray(values, dtype=np.float64)
+    one_dim = values.ndim == 1
+    if one_dim:
+        values = values[:, None]
+    n = values.shape[0]
+    if n == 0:
+        return np.empty(values.shape[:1] if one_dim else values.shape)
+
+    # NaNs sort to the end, so counts for real values never include them.
+    order = np.argsort(values, axis=0, kind='stable')
+    if groups is not None:
+        codes = np.asarray(groups, dtype=np.intp)
+        ungrouped = codes < 0
+        codes = np.where(ungrouped, codes.max(initial=-1) + 1, codes)
+        # A stable sort by group keeps the value order inside every group.
+        order = np.take_along_axis(
+            order, np.argsort(codes[order], axis=0, kind='stable'), axis=0)
+    ordered = np.take_along_axis(values, order, axis=0)
+    position = np.arange(n)[:, None]
+
+    starts = np.ones(ordered.shape, dtype=bool)
+    starts[1:] = ordered[1:] != ordered[:-1]
+    if groups is not None:
+        ordered_codes = codes[order]
+        group_starts = np.ones(ordered.shape, dtype=bool)
+        group_starts[1:] = ordered_codes[1:] != ordered_codes[:-1]
+        starts |= group_starts
+        offset = np.maximum.accumulate(np.where(group_starts, position, 0), axis=0)
+    else:
+        offset = 0
+    ends = np.ones(ordered.shape, dtype=bool)
+    ends[:-1] = starts[1:]
+
+    # left: values strictly below; right: values below or equal (within the group).
+    left_sorted = np.maximum.accumulate(np.where(starts, position, 0), axis=0) - offset
+    right_sorted = np.minimum.accumulate(
+        np.where(ends, position + 1, n)[::-1], axis=0)[::-1] - offset
+
+    left = np.empty_like(left_sorted)
+    right = np.empty_like(right_sorted)
+    np.put_along_axis(left, order, left_sorted, axis=0)
+    np.put_along_axis(right, order, right_sorted, axis=0)
+
+    missing = np.isnan(values)
+    if groups is None:
+        counts = (~missing).sum(axis=0)
+        if nan_policy == 'propagate':
+            counts = np.where(counts < n, 0, counts)
+    else:
+        group_counts = np.zeros((codes.max() + 1, values.shape[1]), dtype=np.intp)
+        np.add.at(group_counts, codes, ~missing)
+        if nan_policy == 'propagate':
+            sizes = np.bincount(codes)[:, None]
+            group_counts = np.where(group_counts < sizes, 0, group_counts)
+        counts = group_counts[codes]
+        counts[ungrouped] = 0
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ranks = (left + right + (left < right)) * (50.0 / counts) / 100
+    ranks[missing | (counts == 0)] = np.nan
+
+    return ranks[:, 0] if one_dim else ranks
+
+
+def group_codes(frame, column):
+    """Integer code per row for the values of ``column``; missing values get -1."""
+    codes, _ = pd.factorize(frame[column], sort=True)
+    return codes
+
+
+def assign_percentiles(frame, metrics=METRICS, nan_policy='propagate', group_by=None):
+    """Fill the percentile column of every metric in ``frame`` in one pass.
+
+    ``metrics`` maps each metric column to its percentile column, like the
+    screener's ``metrics`` dict. ``group_by`` names a column such as
+    ``'GICS Sector'`` to rank each stock only against its own group. The frame
+    is updated in place and returned.
+    """
+    ranks = percentile_ranks(
+        frame[list(metrics.keys())].to_numpy(dtype=np.float64),
+        nan_policy=nan_policy,
+        groups=None if group_by is None else group_codes(frame, group_by))
+    for i, column in enumerate(metrics.values()):
+        frame[column] = ranks[:, i]
+    return frame
@@ -0,0 +1,190 @@
+"""Rebalance orders from current holdings to a new target portfolio.
+
+``allocate`` sizes a portfolio as if it started from cash. ``rebalance``
+starts from what each account already holds. It joins the holdings of every
+account with the target weights into dense (accounts x tickers) matrices,
+so one call covers any number of sub-accounts. It then works out the
+smallest set of orders that brings each account close to the target:
+
+* Positions whose weight is within ``band`` of the target are not traded.
+  Names that leave the target are always sold in full.
+* Order sizes are rounded towards zero to whole ``lot_size`` lots.
+* With ``turnover``, an account trades no more than that share of its value
+  (one-way: half the total traded value), not counting the exits, which
+  are outside the budget. Trades are taken in order of how far the position
+  is from its target, largest first; one that does not fit in what is left
+  of the budget is skipped and smaller ones after it are still taken.
+* Buys are paid for from the account's cash and sales. Buys that would
+  overdraw it are skipped the same way, keeping the largest drifts first.
+
+The target is a frame such as the screener's ``rv_dataframe`` after
+``allocate``: ``Ticker``, ``Price`` and ``Weight``, with an ``Account``
+column to give each account its own target.
+"""
+
+import numpy as np
+import pandas as pd
+
+ACCOUNT = 'Account'
+DEFAULT_ACCOUNT = 'default'
+
+
+class RebalancePlan:
+    """The orders of a rebalance, plus per-account totals and the resulting positions."""
+
+    def __init__(self, orders, summary, positions):
+        self.orders = orders
+        self.summary = summary
+        self.positions = positions
+
+    def __repr__(self):
+        return f'RebalancePlan({len(self.orders)} orders, {len(self.summary)} accounts)'
+
+
+def _per_account(value, accounts):
+    """``value`` (a scalar, dict or Series keyed by account) as an array over ``accounts``."""
+    if value is None:
+        return np.zeros(len(accounts))
+    if np.isscalar(value):
+        return np.full(len(accounts), float(value))
+    return pd.Series(value, dtype=np.float64).reindex(accounts).fillna(0.0).to_numpy()
+
+
+def _per_ticker(value, tickers):
+    """``value`` (a scalar, dict or Series keyed by ticker) as an array over ``tickers``; missing is 1."""
+    if np.isscalar(value):
+        return np.full(len(tickers), float(value))
+    return pd.Series(value, dtype=np.float64).reindex(tickers).fillna(1.0).to_numpy()
+
+
+def _keep_fitting(amounts, priority, limit):
+    """Mask of the entries of each row kept when taken by ``priority`` (highest first) within ``limit``.
+
+    An entry that would overrun the row's remaining limit is skipped and the
+    smaller ones after it are still considered.
+    """
+    order = np.argsort(-priority, axis=1, kind='stable')
+    ranked = np.take_along_axis(amounts, order, axis=1)
+    left = limit + 1e-9
+    fits = np.zeros(amounts.shape, dtype=bool)
+    for column in range(amounts.shape[1]):
+        fits[:, column] = ranked[:, column] <= left
+        left = left - np.where(fits[:, column], ranked[:, column], 0)
+    keep = np.zeros(amounts.shape, dtype=bool)
+    np.put_along_axis(keep, order, fits, axis=1)
+    return keep
+
+
+def rebalance(holdings, target, cash=None, prices=None, lot_size=1, band=0.0, turnover=None,
+              weight_column='Weight', price_column='Price', shares_column='Shares'):
+    """Orders that move ``holdings`` towards ``target``, as a ``RebalancePlan``.
+
+    ``holdings`` has ``Ticker`` and ``Shares`` columns, and ``Account`` when
+    it covers several accounts. ``cash`` (a scalar, or a dict or Series by
+    account) is uninvested cash. Prices come from ``target``, then from a
+    ``Price`` column in ``holdings``, then from ``prices`` (a dict or Series
+    by ticker). ``lot_size`` is a scalar or per-ticker. ``band`` is the
+    weight drift tolerated without trading, and ``turnover`` the most of an
+    account's value it may trade one way, exits aside.
+    """
+    holdings = holdings if ACCOUNT in holdings else holdings.assign(**{ACCOUNT: DEFAULT_ACCOUNT})
+    per_account = ACCOUNT in target
+    held_accounts = holdings[ACCOUNT].astype(str)
+    account_index = pd.Index(pd.unique(pd.concat(
+        [held_accounts, target[ACCOUNT].astype(str)] if per_account else [held_accounts])))
+    if not per_account and len(account_index) == 0:
+        account_index = pd.Index([DEFAULT_ACCOUNT])
+    if isinstance(cash, (dict, pd.Series)):
+        account_index = account_index.union(pd.Index(pd.Series(cash).index.astype(str)), sort=False)
+    ticker_index = pd.Index(pd.unique(pd.concat([target['Ticker'], holdings['Ticker']]).astype(str)))
+
+    n_accounts, n_tickers = len(account_index), len(ticker_index)
+    rows = account_index.get_indexer(held_accounts)
+    columns = ticker_index.get_indexer(holdings['Ticker'].astype(str))
+    current = np.zeros((n_accounts, n_tickers))
+    np.add.at(current, (rows, columns), holdings[shares_column].to_numpy(dtype=np.float64))
+
+    price = pd.Series(np.nan, index=ticker_index)
+    sources = [target.drop_duplicates('Ticker').set_index('Ticker')[price_column]]
+    if price_column in holdings:
+        sources.append(holdings.drop_duplicates('Ticker').set_index('Ticker')[price_column])
+    if prices is not None:
+        sources.append(pd.Series(prices))
+    for source in sources:
+        source.index = source.index.astype(str)
+        price = price.fillna(source.reindex(ticker_index).astype(np.float64))
+    price = price.to_numpy()
+    unpriced = ~(np.isfinite(price) & (price > 0))
+    if unpriced.any():
+        raise ValueError(f'no price for {list(ticker_index[unpriced])}')
+
+    weights = np.zeros((n_accounts, n_tickers))
+    target_weights = target[weight_column].to_numpy(dtype=np.float64)
+    target_columns = ticker_index.get_indexer(target['Ticker'].astype(str))
+    if per_account:
+        np.add.at(weights, (account_index.get_indexer(target[ACCOUNT].astype(str)), target_columns),
+                  target_weights)
+    else:
+        weights[:, target_columns] = target_weights
+
+    cash = _per_account(cash, account_index)
+    lots = _per_ticker(lot_size, ticker_index)
+    value = current @ price + cash
+    with np.errstate(invalid='ignore', divide='ignore'):
+        held_weights = np.where(value[:, None] > 0, current * price / value[:, None], 0.0)
+    drift = weights - held_weights
+    exits = (weights == 0) & (current != 0)
+
+    trade = weights * value[:, None] / price - current
+    trade = np.where(exits, -current, np.trunc(trade / lots) * lots)
+    trade[(np.abs(drift) <= band) & ~exits] = 0
+
+    trade_value = np.abs(trade) * price
+    priority = np.abs(drift)
+    if turnover is not None:
+        trade[~exits & ~_keep_fitting(np.where(exits, 0, trade_value), priority, 2 * turnover * value)] = 0
+    buys = trade > 0
+    available = cash + np.where(trade < 0, trade_value, 0).sum(axis=1)
+    trade[buys & ~_keep_fitting(np.where(buys, trade_value, 0), np.where(buys, priority, -1), available)] = 0
+
+    after = current + trade
+    flows = -trade * price
+    with np.errstate(invalid='ignore', divide='ignore'):
+        after_weights = np.where(value[:, None] > 0, after * price / value[:, None], 0.0)
+    summary = pd.DataFrame({
+        'Value': value,
+        'Cash': cash,
+        'Bought': np.where(trade > 0, -flows, 0).sum(axis=1),
+        'Sold': np.where(trade < 0, flows, 0).sum(axis=1),
+        'Orders': (trade != 0).sum(axis=1),
+        'Cash After': cash + flows.sum(axis=1),
+        'Drift Before': np.abs(drift).sum(axis=1) / 2,
+        'Drift After': np.abs(weights - after_weights).sum(axis=1) / 2,
+    }, index=pd.Index(account_index, name=ACCOUNT))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        summary['Turnover'] = (summary['Bought'] + summary['Sold']) / (2 * summary['Value'])
+
+    a, t = np.nonzero(trade)
+    orders = pd.DataFrame({
+        ACCOUNT: account_index[a],
+        'Ticker': ticker_index[t],
+        'Side': np.where(trade[a, t] > 0, 'BUY', 'SELL'),
+        'Shares': np.abs(trade[a, t]).astype(np.int64),
+        'Price': price[t],
+        'Value': np.abs(trade[a, t]) * price[t],
+        'Current Shares': current[a, t].astype(np.int64),
+        'Target Weight': weights[a, t],
+    })
+    # Sales first within each account: they pay for the buys.
+    orders = orders.sort_values([ACCOUNT, 'Side', 'Value'], ascending=[True, False, False],
+                                kind='stable').reset_index(drop=True)
+
+    a, t = np.nonzero(after)
+    positions = pd.DataFrame({
+        ACCOUNT: account_index[a],
+        'Ticker': ticker_index[t],
+        'Shares': after[a, t].astype(np.int64),
+        'Weight': after_weights[a, t],
+        'Target Weight': weights[a, t],
+    })
+    return RebalancePlan(orders, summary, positions)
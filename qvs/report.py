@@ -0,0 +1,140 @@
+"""Excel reports and columnar exports of screener output.
+
+``ReportWriter`` writes DataFrames to an .xlsx workbook with XlsxWriter in
+``constant_memory`` mode: rows are streamed to disk as they are written, so
+memory stays flat however many sheets and rows a report has. Each column's
+format is derived from its name (``Price`` as dollars, percentiles and
+returns as percentages, share counts as integers and so on) instead of a
+hard-coded column letter map, so it always lines up with the frame.
+
+``export`` and ``export_scenarios`` write the same frames as CSV, Parquet
+or Arrow (Feather) files for downstream systems; the last two need pyarrow.
+"""
+
+import os
+import re
+
+BASE_STYLE = {
+    'font_color': '#000000',
+    'bg_color': '#ffffff',
+    'border': 1,
+}
+
+NUMBER_FORMATS = {
+    'string': {},
+    'dollar': {'num_format': '$0.00'},
+    'integer': {'num_format': '0'},
+    'float': {'num_format': '0.0'},
+    'percent': {'num_format': '0.0%'},
+}
+
+EXTENSIONS = {
+    '.xlsx': 'xlsx',
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+}
+
+
+def column_kind(name, dtype=None):
+    """Pick one of ``NUMBER_FORMATS`` for a column from its name (and dtype)."""
+    lower = name.lower()
+    if name in ('Ticker', 'Symbol', 'Security') or (dtype is not None and dtype.kind not in 'biuf'):
+        return 'string'
+    if 'shares' in lower:
+        return 'integer'
+    if lower == 'price' or 'allocation' in lower or 'market cap' in lower:
+        return 'dollar'
+    if 'percentile' in lower or 'return' in lower or lower in ('rv score', 'weight'):
+        return 'percent'
+    return 'float'
+
+
+def sheet_title(name, taken=()):
+    """A valid, unique Excel sheet name: at most 31 characters, none of ``[]:*?/\\``."""
+    base = re.sub(r'[\[\]:*?/\\]', '-', str(name)).strip("'")[:31] or 'Sheet'
+    title, suffix = base, 1
+    while title.lower() in {t.lower() for t in taken}:
+        suffix += 1
+        title = f'{base[:31 - len(str(suffix)) - 1]}~{suffix}'
+    return title
+
+
+class ReportWriter:
+    """Stream DataFrames into a formatted workbook, one sheet per ``add_sheet`` call."""
+
+    def __init__(self, path, constant_memory=True, column_width=25):
+        import xlsxwriter
+
+        self.path = path
+        self.column_width = column_width
+        self.book = xlsxwriter.Workbook(path, {'constant_memory': constant_memory})
+        self.formats = {kind: self.book.add_format(dict(BASE_STYLE, **spec))
+                        for kind, spec in NUMBER_FORMATS.items()}
+        self.sheets = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add_sheet(self, frame, name='Value Strategy'):
+        """Write ``frame`` (header plus rows) to a new sheet and return the sheet's title."""
+        title = sheet_title(name, self.sheets)
+        sheet = self.book.add_worksheet(title)
+        self.sheets.append(title)
+
+        for i, column in enumerate(frame.columns):
+            cell_format = self.formats[column_kind(column, frame[column].dtype)]
+            sheet.set_column(i, i, self.column_width, cell_format)
+            sheet.write_string(0, i, str(column), cell_format)
+
+        # Missing values become blank cells; XlsxWriter cannot write NaN.
+        values = frame.astype(object).where(frame.notna(), None).to_numpy()
+        write_row = sheet.write_row
+        for row, data in enumerate(values.tolist(), start=1):
+            write_row(row, 0, data)
+        return title
+
+    def close(self):
+        self.book.close()
+
+
+def write_excel(frame, path, sheet_name='Value Strategy'):
+    """Write one frame to a formatted single-sheet workbook."""
+    with ReportWriter(path) as report:
+        report.add_sheet(frame, sheet_name)
+
+
+def export(frame, path, fmt=None, sheet_name='Value Strategy'):
+    """Write ``frame`` as xlsx, csv, parquet or arrow; the format defaults to the file suffix."""
+    fmt = fmt or EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if fmt == 'xlsx':
+        write_excel(frame, path, sheet_name)
+    elif fmt == 'csv':
+        frame.to_csv(path, index=False)
+    elif fmt == 'parquet':
+        frame.to_parquet(path, index=False)
+    elif fmt == 'arrow':
+        frame.reset_index(drop=True).to_feather(path)
+    else:
+        raise ValueError(f'unknown export format {fmt!r}; choose from {sorted(set(EXTENSIONS.values()))}')
+
+
+def export_scenarios(scenarios, path, fmt='xlsx'):
+    """Write ``{name: frame}`` scenarios: one sheet each in an xlsx workbook at ``path``,
+    or one file each inside the directory ``path`` for csv, parquet and arrow.
+    """
+    if fmt == 'xlsx':
+        with ReportWriter(path) as report:
+            for name, frame in scenarios.items():
+                report.add_sheet(frame, name)
+        return
+    os.makedirs(path, exist_ok=True)
+    suffix = {'csv': '.csv', 'parquet': '.parquet', 'arrow': '.arrow'}[fmt]
+    for name, frame in scenarios.items():
+        filename = re.sub(r'[^\w.-]+', '_', str(name)) + suffix
+        export(frame, os.path.join(path, filename), fmt)
+
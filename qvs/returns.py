@@ -0,0 +1,56 @@
+"""Portfolio returns for many weighting schemes and horizons at once.
+
+Each stock's contribution over a horizon follows the screener's formula,
+``100 * Price Return / (100 + Price Return)`` scaled by its weight, with the
+stock's own return for that horizon in the denominator. Stacking the weights
+of every scheme into a (schemes x stocks) matrix and the per-stock returns
+into a (stocks x horizons) matrix gives every scheme/horizon combination in
+one matrix product.
+"""
+
+import numpy as np
+import pandas as pd
+
+from qvs.weighting import scheme_weights
+
+# Return column -> label, in the order the returns chart plots them.
+HORIZONS = {
+    'One-Month Price Return': '1 Month',
+    'Three-Month Price Return': '3 Month',
+    'Six-Month Price Return': '6 Month',
+    'One-Year Price Return': '1 Year',
+}
+
+
+def stock_returns(frame, horizons=HORIZONS):
+    """The (stocks x horizons) matrix of per-stock returns; missing returns count as 0."""
+    price_returns = frame[list(horizons)].to_numpy(dtype=np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns = 100 * price_returns / (100 + price_returns)
+    return np.where(np.isfinite(returns), returns, 0.0)
+
+
+def portfolio_returns(weights, returns):
+    """Return ``weights @ returns``: (schemes x stocks) by (stocks x horizons)."""
+    return np.asarray(weights, dtype=np.float64) @ returns
+
+
+def weight_matrix(frame, schemes):
+    """Stack weights for ``schemes`` into a (schemes x stocks) matrix.
+
+    ``schemes`` maps a label to either a scheme name from
+    ``qvs.weighting.SCHEMES`` or an array of weights; a list of scheme names
+    is used as its own labels.
+    """
+    if not isinstance(schemes, dict):
+        schemes = {name: name for name in schemes}
+    rows = [scheme_weights(frame, spec) if isinstance(spec, str) else np.asarray(spec, dtype=np.float64)
+            for spec in schemes.values()]
+    return list(schemes), np.vstack(rows) if rows else np.empty((0, len(frame)))
+
+
+def compare_schemes(frame, schemes=('equal', '80-20'), horizons=HORIZONS):
+    """DataFrame of portfolio returns with one row per scheme and one column per horizon."""
+    labels, weights = weight_matrix(frame, schemes)
+    result = portfolio_returns(weights, stock_returns(frame, horizons))
+    return pd.DataFrame(result, index=labels, columns=list(horizons.values()))
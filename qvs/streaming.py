@@ -0,0 +1,171 @@
+"""Streaming RV screen: score 100-symbol batches as they arrive.
+
+The default flow downloads every chunk, then builds the frame, imputes,
+ranks and selects. ``stream_fundamentals`` puts every chunk request in
+flight from an asyncio event loop. Each response is folded into a
+``StreamingScorer`` as soon as it arrives. The batch is written into the
+ingestor's column arrays and its EV/EBITDA and EV/GP are derived. For every
+metric, the running sum and count (for the imputation mean) are updated and
+the batch's observed values are kept as a sorted run. After the last
+response, scoring only stable-sorts the concatenated runs and reads each
+stock's rank off that order. Parsing overlaps with the downloads, so little work is left
+once the slowest request is in.
+
+``requests`` has no asyncio client, so each request runs on a thread pool
+via ``run_in_executor``, with the retries of ``BatchFetcher.fetch_chunk``.
+Scores match ``qvs.pipeline.score`` with mean imputation and no
+``group_by``.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from qvs.columns import METRICS, RV_COLUMNS
+from qvs.fetch import BatchFetcher, FetchError, chunks
+from qvs.ingest import RV_FIELDS, BatchIngestor, safe_ratio
+from qvs.instrument import Recorder
+
+# Derived metric -> (numerator, denominator) ingest columns, as in ``rv_frame``.
+RATIOS = {
+    'EV/EBITDA': ('Enterprise Value', 'EBITDA'),
+    'EV/GP': ('Enterprise Value', 'Gross Profit'),
+}
+
+
+class StreamingScorer:
+    """Fold batch responses into RV metrics, running means and sorted runs.
+
+    Call ``add_batch`` with each chunk and its parsed response in any order,
+    then ``frame`` for the unscored RV frame and ``score`` for the scored one.
+    """
+
+    def __init__(self, symbols, metrics=METRICS):
+        self.ingestor = BatchIngestor(symbols, RV_FIELDS)
+        self.metrics = dict(metrics)
+        n = len(self.ingestor.symbols)
+        columns = self.ingestor.columns
+        self.values = {metric: columns[metric] if metric in columns else np.full(n, np.nan)
+                       for metric in self.metrics}
+        self._sum = dict.fromkeys(self.metrics, 0.0)
+        self._count = dict.fromkeys(self.metrics, 0)
+        self._runs = {metric: [] for metric in self.metrics}
+        self.batches = 0
+
+    def add_batch(self, symbols, data):
+        """Ingest one chunk's response and update the running aggregates."""
+        self.ingestor.add_batch(data)
+        positions = self.ingestor.positions
+        rows = np.array([positions[symbol] for symbol in symbols if symbol in positions], dtype=np.intp)
+        columns = self.ingestor.columns
+        for metric, (numerator, denominator) in RATIOS.items():
+            if metric in self.values:
+                self.values[metric][rows] = safe_ratio(columns[numerator][rows], columns[denominator][rows],
+                                                        positive=True)
+        for metric, values in self.values.items():
+            batch = values[rows]
+            present = ~np.isnan(batch)
+            batch, batch_rows = batch[present], rows[present]
+            order = np.argsort(batch, kind='stable')
+            self._sum[metric] += batch.sum()
+            self._count[metric] += len(batch)
+            self._runs[metric].append((batch[order], batch_rows[order]))
+        self.batches += 1
+
+    def mean(self, metric):
+        """Mean of the values of ``metric`` seen so far (``NaN`` if none)."""
+        count = self._count[metric]
+        return self._sum[metric] / count if count else np.nan
+
+    def frame(self):
+        """The RV frame of everything received, like ``rv_frame``: metrics unimputed, no scores."""
+        data = {'Ticker': self.ingestor.symbols}
+        data.update(self.ingestor.columns)
+        data.update(self.values)
+        n = len(self.ingestor.symbols)
+        for column in list(self.metrics.values()) + ['RV Score']:
+            data[column] = np.full(n, np.nan)
+        return pd.DataFrame(data, columns=[c for c in RV_COLUMNS if c in data])
+
+    def score(self, frame=None):
+        """Impute, rank and score from the aggregates; ``frame`` defaults to ``self.frame()``.
+
+        A given ``frame`` must have the scorer's symbols in the same order (it
+        may carry extra columns, e.g. a sector). A copy is returned.
+        """
+        frame = self.frame() if frame is None else frame.copy()
+        for metric, column in self.metrics.items():
+            values = self.values[metric]
+            n, count = len(values), self._count[metric]
+            if count == 0:
+                frame[metric] = frame[column] = np.nan
+                continue
+            runs = self._runs[metric]
+            merged = np.concatenate([run for run, _ in runs])
+            rows = np.concatenate([run_rows for _, run_rows in runs])
+            # Stable, so tied values keep the order their batches arrived in.
+            order = np.argsort(merged, kind='stable')
+            observed, rows = merged[order], rows[order]
+            mean = self.mean(metric)
+            missing = np.isnan(values)
+            # The ``n - count`` imputed stocks all sit at the mean. Looking up
+            # the observed values in sorted order keeps the searches local.
+            left, right = np.empty(n, dtype=np.intp), np.empty(n, dtype=np.intp)
+            left[rows] = np.searchsorted(observed, observed, 'left') + np.where(mean < observed, n - count, 0)
+            right[rows] = np.searchsorted(observed, observed, 'right') + np.where(mean <= observed, n - count, 0)
+            left[missing] = np.searchsorted(observed, mean, 'left')
+            right[missing] = np.searchsorted(observed, mean, 'right') + n - count
+            frame[metric] = np.where(missing, mean, values)
+            frame[column] = (left + right + (left < right)) * (50.0 / n) / 100
+        frame['RV Score'] = frame[list(self.metrics.values())].mean(axis=1)
+        return frame
+
+
+async def stream_batches(fetcher, symbols, types=None, concurrency=None):
+    """Yield ``(chunk, data, error)`` for every chunk as its response arrives.
+
+    Like ``BatchFetcher.iter_batches``, but as an async generator. Up to
+    ``concurrency`` requests (default: the fetcher's ``max_workers``) are in
+    flight at once.
+    """
+    loop = asyncio.get_running_loop()
+    groups = list(chunks(list(symbols), fetcher.chunk_size))
+
+    with ThreadPoolExecutor(max_workers=concurrency or fetcher.max_workers) as pool:
+        async def request(group):
+            try:
+                return group, await loop.run_in_executor(pool, fetcher.fetch_chunk, group, types), None
+            except FetchError as error:
+                return group, {}, error
+
+        for next_done in asyncio.as_completed([request(group) for group in groups]):
+            yield await next_done
+
+
+async def stream_fundamentals(symbols, config, recorder=None):
+    """Fetch the RV inputs for ``symbols``, scoring each batch as it arrives.
+
+    Returns ``(rv frame, failed symbols, scorer)``; ``scorer.score`` gives
+    the scored frame. Responses are parsed inside the ``fetch`` stage, while
+    other requests are still in flight. Await it from a running event loop,
+    or call it through ``asyncio.run``.
+    """
+    recorder = recorder or Recorder()
+    symbols = list(symbols)
+    scorer = StreamingScorer(symbols)
+    failed = {}
+    with recorder.stage('fetch', rows=len(symbols)) as stage, \
+            BatchFetcher(config.token, types=('advanced-stats', 'quote'), base_url=config.base_url,
+                         max_workers=config.fetch_workers) as fetcher:
+        async for group, data, error in stream_batches(fetcher, symbols):
+            if error is not None:
+                failed.update((symbol, str(error)) for symbol in group)
+                continue
+            scorer.add_batch(group, data)
+            failed.update((symbol, 'missing from response') for symbol in group if symbol not in data)
+        stage.requests, stage.bytes = fetcher.requests, fetcher.bytes_received
+    with recorder.stage('ingest', rows=len(symbols) - len(failed)):
+        frame = scorer.frame()
+    return frame, failed, scorer
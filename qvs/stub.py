@@ -0,0 +1,254 @@
+"""Local stand-in for the IEX API, serving recorded or synthetic responses.
+
+Fixtures are a ``{symbol: {endpoint: payload}}`` mapping, i.e. the merged
+body of one or more recorded ``stock/market/batch`` responses. The server
+answers the two calls the screener makes:
+
+* ``stock/market/batch?types=...&symbols=...`` returns the requested
+  ``types`` for the requested ``symbols``. Symbols without a fixture are
+  left out, as IEX does for unknown tickers.
+* ``stock/{symbol}/{endpoint}`` (e.g. ``stock/AAPL/stats``) returns one
+  payload, or 404 ``Unknown symbol``.
+
+A ``/stable`` or ``/v1`` prefix is accepted, so the script's URLs work with
+only the host swapped. To load-test clients, ``latency`` delays every
+response by a fixed number of seconds, or by a random amount in a
+``(low, high)`` range. ``error_rate`` answers that share of requests with a
+random ``error_statuses`` code. ``rate_limit`` (requests per second, with
+``burst``) answers requests over the limit with 429 and a ``Retry-After``
+header. ``stats()`` counts requests, statuses, bytes and symbols served.
+
+``record_fixtures`` captures real responses into a fixture file, and
+``qvs.synthetic.make_responses`` makes synthetic ones; ``qvs serve`` runs the
+server from the command line.
+
+    with StubServer(load_fixtures('fixtures.json'), latency=(0.05, 0.2), rate_limit=100) as server:
+        with BatchFetcher('token', base_url=server.url) as fetcher:
+            result = fetcher.fetch(symbols)
+        print(server.stats())
+"""
+
+import json
+import math
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+# Version prefixes of IEX Cloud URLs, stripped before routing.
+API_PREFIXES = ('/stable', '/v1')
+
+
+def load_fixtures(path):
+    """Read recorded batch responses from a JSON file."""
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_fixtures(fixtures, path):
+    """Write ``{symbol: {endpoint: payload}}`` fixtures to a JSON file."""
+    with open(path, 'w') as f:
+        json.dump(fixtures, f, separators=(',', ':'))
+
+
+def record_fixtures(fetcher, symbols, path=None, fixtures=None):
+    """Fetch ``symbols`` with ``fetcher`` and merge the responses into fixtures.
+
+    ``fetcher`` is a ``BatchFetcher`` pointed at the real API; its ``types``
+    are recorded. New payloads are merged into ``fixtures`` (or a fresh
+    dict), which are saved to ``path`` when one is given. Returns
+    ``(fixtures, failed)``, ``failed`` being the ``FetchResult.failed`` of the
+    symbols that could not be recorded.
+    """
+    result = fetcher.fetch(symbols)
+    fixtures = {symbol: dict(data) for symbol, data in (fixtures or {}).items()}
+    for symbol, data in result.data.items():
+        fixtures.setdefault(symbol, {}).update(
+            {endpoint: payload for endpoint, payload in data.items() if payload is not None})
+    if path is not None:
+        save_fixtures(fixtures, path)
+    return fixtures, result.failed
+
+
+class RateLimiter:
+    """Token bucket: ``rate`` requests per second, up to ``burst`` at once."""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1, math.ceil(rate)))
+        self.clock = clock
+        self.tokens = self.burst
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token; return 0 if one was free, otherwise the seconds until one is."""
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, headers=None):
+        payload = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain' if isinstance(body, str) else 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+        return len(payload)
+
+    def do_GET(self):
+        server = self.server.stub
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        delay = server.delay()
+        if delay:
+            time.sleep(delay)
+
+        status, body, headers, symbols = server.respond(url.path, query)
+        sent = self._send(status, body, headers)
+        server.count(status, sent, symbols)
+
+
+class _Server(ThreadingHTTPServer):
+    # The default backlog of 5 drops connections when many requests arrive at once.
+    request_queue_size = 128
+    daemon_threads = True
+
+
+class StubServer:
+    """Serve ``fixtures`` on a background thread at ``self.url``.
+
+    ``token``, when set, must match each request's ``token`` parameter (403
+    otherwise). ``seed`` makes the latency and error draws repeatable.
+    """
+
+    def __init__(self, fixtures, host='127.0.0.1', port=0, latency=0.0, error_rate=0.0,
+                 error_statuses=(500, 503), rate_limit=None, burst=None, token=None, seed=None):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.limiter = None if rate_limit is None else RateLimiter(rate_limit, burst)
+        self.token = token
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.reset_stats()
+        self._httpd = _Server((host, port), _Handler)
+        self._httpd.stub = self
+        self._thread = None
+
+    def delay(self):
+        """Seconds to hold the next response back."""
+        if isinstance(self.latency, (tuple, list)):
+            with self.lock:
+                return self.random.uniform(*self.latency)
+        return self.latency
+
+    def respond(self, path, query):
+        """``(status, body, headers, symbols served)`` for a GET of ``path`` with ``query``."""
+        for prefix in API_PREFIXES:
+            if path.startswith(prefix + '/'):
+                path = path[len(prefix):]
+        parts = [unquote(part) for part in path.strip('/').split('/')]
+
+        if self.token is not None and query.get('token', [None])[0] != self.token:
+            return 403, 'The API key provided is not valid.', None, 0
+        if self.limiter is not None:
+            wait = self.limiter.acquire()
+            if wait:
+                return 429, 'Too many requests', {'Retry-After': f'{wait:.3f}'}, 0
+        if self.error_rate:
+            with self.lock:
+                failing = self.random.random() < self.error_rate
+                status = self.random.choice(self.error_statuses)
+            if failing:
+                return status, 'Injected error', None, 0
+
+        if parts[:3] == ['stock', 'market', 'batch']:
+            types = ','.join(query.get('types', [])).split(',')
+            body = {}
+            for symbol in ','.join(query.get('symbols', [])).split(','):
+                recorded = self.fixtures.get(symbol)
+                if recorded is not None:
+                    body[symbol] = {t: recorded[t] for t in types if t in recorded}
+            return 200, body, None, len(body)
+        if len(parts) == 3 and parts[0] == 'stock':
+            recorded = self.fixtures.get(parts[1], {})
+            if parts[2] not in recorded:
+                return 404, 'Unknown symbol', None, 0
+            return 200, recorded[parts[2]], None, 1
+        return 404, {'error': f'unknown path {path}'}, None, 0
+
+    def count(self, status, sent, symbols):
+        with self.lock:
+            self.requests += 1
+            self.statuses[status] += 1
+            self.bytes_sent += sent
+            self.symbols_served += symbols
+
+    def stats(self):
+        """Requests, responses by status, bytes and symbols served since the last reset."""
+        with self.lock:
+            elapsed = time.perf_counter() - self._since
+            return {
+                'requests': self.requests,
+                'statuses': dict(sorted(self.statuses.items())),
+                'bytes': self.bytes_sent,
+                'symbols': self.symbols_served,
+                'seconds': elapsed,
+                'requests_per_second': self.requests / elapsed if elapsed else 0.0,
+            }
+
+    def reset_stats(self):
+        with self.lock:
+            self.requests = 0
+            self.statuses = Counter()
+            self.bytes_sent = 0
+            self.symbols_served = 0
+            self._since = time.perf_counter()
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Serve on the calling thread until interrupted (e.g. Ctrl-C)."""
+        try:
+            self._httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._httpd.server_close()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,353 @@
+"""Parameter sweeps of the RV composite against backtested returns.
+
+The screen has fixed choices: ``RV Score`` is the unweighted mean of five
+percentiles, 50 stocks are held, the 80-20 scheme puts 80% of the capital in
+the top 20% of them, and the sector cap is optional. ``Sweep`` backtests
+many alternatives at once. A candidate is a row of ``metric weights``,
+``top`` (stocks held), ``top_share`` and ``top_capital`` (the first tier: its
+share of the stocks and of the capital; equal shares give equal weights)
+and ``sector_cap`` (0 for none).
+
+The per-metric percentiles of every rebalance date (``rank_panel``) are
+computed once and shared by all candidates. Candidates with the same
+weights also share their score matrix and its sort order, so each distinct
+weight vector costs one matrix product and one sort. Every (top, tiers,
+cap) variant then costs a top-K read off that order. ``grid`` and
+``random_candidates`` build candidate tables. Random weights are drawn on a
+``weight_step`` grid so that draws repeat and share that work.
+``Sweep.run`` splits the weight groups across processes. The rank matrices
+sit in shared memory, which every worker reads in place. ``ResultStore``
+keeps each sweep's results in SQLite, so runs can be compared later.
+"""
+
+import itertools
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from qvs.backtest import (METRIC_COLUMNS, forward_returns, panel_members, rank_panel, rebalance_panel,
+                          sector_codes, weighted_scores)
+from qvs.weighting import tiered_weights
+
+PARAMETERS = ['top', 'top_share', 'top_capital', 'sector_cap']
+
+RESULTS = ['total_return', 'annual_return', 'volatility', 'sharpe', 'max_drawdown']
+
+PERIODS_PER_YEAR = {'D': 252, 'W': 52, 'M': 12, 'Q': 4, 'A': 1, 'Y': 1}
+
+
+def grid(weights=None, top=(50,), tiers=((0.2, 0.8),), sector_cap=(0,), metrics=METRIC_COLUMNS):
+    """Every combination of the given values as a candidate table.
+
+    ``weights`` is a list of weight vectors, one weight per metric (default:
+    equal weights only). ``tiers`` is a list of ``(top_share, top_capital)``.
+    """
+    weights = [np.full(len(metrics), 1.0 / len(metrics))] if weights is None else weights
+    rows = [list(w) + [n, share, capital, cap]
+            for w, n, (share, capital), cap in itertools.product(weights, top, tiers, sector_cap)]
+    return _candidates(rows, metrics)
+
+
+def random_candidates(count, top=(10, 100), top_share=(0.1, 0.5), top_capital=(0.1, 0.9),
+                      sector_cap=(0, 5, 10), weight_step=0.05, metrics=METRIC_COLUMNS, seed=0):
+    """``count`` random candidates.
+
+    Weights are uniform over the simplex, rounded to multiples of
+    ``weight_step`` (``None`` to keep them continuous). ``top`` is drawn from
+    an inclusive integer range, and ``top_share`` and ``top_capital`` from
+    ranges. ``sector_cap`` is drawn from a list of values.
+    """
+    rng = np.random.default_rng(seed)
+    weights = rng.dirichlet(np.ones(len(metrics)), count)
+    if weight_step:
+        units = int(round(1 / weight_step))
+        weights = np.array([rng.multinomial(units, w) for w in weights]) / units
+    rows = np.column_stack([
+        weights,
+        rng.integers(top[0], top[1] + 1, count),
+        np.round(rng.uniform(*top_share, count), 2),
+        np.round(rng.uniform(*top_capital, count), 2),
+        rng.choice(np.asarray(sector_cap), count),
+    ])
+    return _candidates(rows, metrics)
+
+
+def _candidates(rows, metrics):
+    frame = pd.DataFrame(np.asarray(rows, dtype=np.float64).reshape(-1, len(metrics) + len(PARAMETERS)),
+                         columns=list(metrics) + PARAMETERS)
+    frame['top'] = frame['top'].astype(int)
+    frame['sector_cap'] = frame['sector_cap'].astype(int)
+    return frame
+
+
+def summarize(returns, periods_per_year=12):
+    """``RESULTS`` for every row of a (candidates x periods) matrix of period returns.
+
+    Periods with no return (nothing held) count as flat.
+    """
+    returns = np.nan_to_num(np.atleast_2d(returns))
+    wealth = np.cumprod(1 + returns, axis=1)
+    total = wealth[:, -1] - 1 if returns.shape[1] else np.zeros(len(returns))
+    years = returns.shape[1] / periods_per_year
+    with np.errstate(invalid='ignore', divide='ignore'):
+        annual = np.where(total > -1, np.abs(1 + total) ** (1 / years) - 1, -1.0) if years else total
+        volatility = returns.std(axis=1, ddof=1) * np.sqrt(periods_per_year)
+        sharpe = returns.mean(axis=1) * periods_per_year / volatility
+        drawdown = (wealth / np.maximum.accumulate(wealth, axis=1) - 1).min(axis=1, initial=0)
+    return dict(zip(RESULTS, (total, annual, volatility, sharpe, drawdown)))
+
+
+def _ranked(key, forward, groups, width, capped=True):
+    """The best ``width`` tickers of every period, in score order.
+
+    Returns their forward returns, whether they have a score, and (when
+    ``capped``) how many better-scored tickers of the same sector precede
+    each of them, -1 for tickers without a sector.
+    """
+    n_tickers = key.shape[1]
+    if width < n_tickers:
+        order = np.argpartition(key, width - 1, axis=1)[:, :width]
+        selected = np.take_along_axis(key, order, axis=1)
+        # Bring in every ticker tied at the cut-off, so that equal scores go
+        # to the earlier ticker, as with a stable sort.
+        cutoff = selected.max(axis=1, keepdims=True)
+        left_out = ((key == cutoff) & np.isfinite(cutoff)).sum(axis=1) - (selected == cutoff).sum(axis=1)
+        if left_out.any():
+            extra = width + int(left_out.max())
+            order = np.argpartition(key, extra - 1, axis=1)[:, :extra] if extra < n_tickers else \
+                np.broadcast_to(np.arange(n_tickers), key.shape)
+            selected = np.take_along_axis(key, order, axis=1)
+        order = np.take_along_axis(order, np.lexsort((order, selected), axis=1)[:, :width], axis=1)
+    else:
+        order = np.argsort(key, axis=1, kind='stable')
+    valid = np.isfinite(np.take_along_axis(key, order, axis=1))
+    gains = np.take_along_axis(forward, order, axis=1)
+    if not capped:
+        return gains, valid, None
+    ordered = groups[order]
+    within = np.full(order.shape, -1, dtype=np.intp)
+    if groups.max(initial=-1) >= 0:
+        counts = np.cumsum(ordered[:, :, None] == np.arange(groups.max() + 1), axis=1) - 1
+        sector = ordered >= 0
+        within[sector] = np.take_along_axis(counts, np.maximum(ordered, 0)[:, :, None], axis=2)[:, :, 0][sector]
+    return gains, valid, within
+
+
+def evaluate_group(ranks, forward, groups, weights, params):
+    """Period returns of the candidates in ``params`` that share ``weights``.
+
+    ``ranks`` is the (metrics x periods * tickers) matrix of percentiles on
+    every rebalance date but the last, ``forward`` the (periods x tickers)
+    forward returns and ``groups`` each ticker's sector code (-1 for none;
+    such tickers are never capped). ``params`` holds one row of
+    ``PARAMETERS`` per candidate. Lower scores are better, as in
+    ``backtest``. Returns a (candidates x periods) array.
+    """
+    n_periods, n_tickers = forward.shape
+    scores = weighted_scores(ranks, weights)
+    key = np.where(np.isnan(scores), np.inf, scores).reshape(n_periods, n_tickers)
+    params = np.asarray(params, dtype=np.float64).reshape(-1, len(PARAMETERS))
+    top, share, capital, cap = params.T
+    most = int(min(top.max(), n_tickers))
+
+    # A sector cap skips tickers, so capped candidates look further down the
+    # order. Widen until, under every cap, each period holds as many stocks
+    # as it can (its ``top``, or all the cap lets in).
+    limits = [(limit, int(min(top[cap == limit].max(), n_tickers))) for limit in np.unique(cap[cap > 0])]
+    if limits:
+        scored = np.isfinite(key)
+        sector_counts = np.stack([(scored & (groups == code)).sum(axis=1)
+                                  for code in range(groups.max(initial=-1) + 1)], axis=1) \
+            if groups.max(initial=-1) >= 0 else np.zeros((n_periods, 0), dtype=np.intp)
+        unsectored = (scored & (groups < 0)).sum(axis=1)
+    width = min(n_tickers, most * 4 if limits else most)
+    while True:
+        gains, valid, within = _ranked(key, forward, groups, width, bool(limits))
+        if not limits or width == n_tickers or all(
+                np.all((valid & (within < limit)).sum(axis=1) >=
+                       np.minimum(needed, np.minimum(sector_counts, limit).sum(axis=1) + unsectored))
+                for limit, needed in limits):
+            break
+        width = min(n_tickers, width * 4)
+
+    out = np.empty((len(params), n_periods))
+    for limit in np.unique(cap):
+        eligible = valid if limit <= 0 else valid & (within < limit)
+        position = np.cumsum(eligible, axis=1) - 1
+        for n in np.unique(top[cap == limit]).astype(int):
+            rows = np.flatnonzero((cap == limit) & (top == n))
+            # Forward returns of the stocks held, by rank: (periods x n), NaN where none.
+            date, column = np.nonzero(eligible & (position < n))
+            held = np.full((n_periods, n), np.nan)
+            held[date, position[date, column]] = gains[date, column]
+            present = ~np.isnan(held)
+            tiers = np.array([tiered_weights(n, ((share[i], capital[i]), (1 - share[i], 1 - capital[i])))
+                              for i in rows])
+            totals = present @ tiers.T
+            with np.errstate(invalid='ignore', divide='ignore'):
+                out[rows] = np.where(totals > 0, np.where(present, held, 0.0) @ tiers.T / totals, np.nan).T
+    return out
+
+
+class Sweep:
+    """Backtest many candidates over one history.
+
+    ``source`` is anything ``backtest`` accepts. ``sectors`` maps tickers to
+    a sector (a dict or Series), needed for ``sector_cap`` and used for the
+    sector medians of ``impute='median'``. ``membership`` and ``impute`` are
+    as in ``backtest``.
+    """
+
+    def __init__(self, source, sectors=None, start=None, end=None, freq='M', block=64, membership=None,
+                 impute='median'):
+        panel = rebalance_panel(source, start, end, freq)
+        self.dates = panel.dates
+        self.tickers = panel.tickers
+        self.metrics = list(panel.metrics)
+        self.periods_per_year = PERIODS_PER_YEAR.get(str(freq)[:1].upper(), 12) if freq else 252
+        self.groups = sector_codes(self.tickers, sectors)
+        # No portfolio is formed on the last date, so its ranks are not kept.
+        ranks = rank_panel(panel.values[:-1], panel_members(panel, membership)[:-1], block, impute, self.groups)
+        self.ranks = np.ascontiguousarray(ranks.reshape(-1, len(self.metrics)).T)
+        self.forward = forward_returns(panel.prices)
+
+    def returns(self, candidates):
+        """(candidates x periods) period returns, in candidate order."""
+        weights = candidates[self.metrics].to_numpy(dtype=np.float64)
+        params = candidates[PARAMETERS].to_numpy(dtype=np.float64)
+        out = np.empty((len(candidates), len(self.forward)))
+        unique, inverse = np.unique(weights, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.searchsorted(inverse[order], np.arange(len(unique) + 1))
+        for i, w in enumerate(unique):
+            rows = order[bounds[i]:bounds[i + 1]]
+            out[rows] = evaluate_group(self.ranks, self.forward, self.groups, w, params[rows])
+        return out
+
+    def evaluate(self, candidates):
+        """The candidate table with a ``RESULTS`` column per metric, in one process."""
+        candidates = candidates.reset_index(drop=True)
+        results = summarize(self.returns(candidates), self.periods_per_year)
+        return candidates.assign(**results)
+
+    def run(self, candidates, max_workers=None, chunk_size=None):
+        """Like ``evaluate``, with the weight groups spread over ``max_workers`` processes."""
+        candidates = candidates.reset_index(drop=True)
+        max_workers = max_workers or os.cpu_count() or 1
+        keys = candidates.groupby(self.metrics, sort=False).ngroup()
+        if max_workers == 1 or keys.max() < 1:
+            return self.evaluate(candidates)
+        n_groups = keys.max() + 1
+        chunk_size = chunk_size or max(1, -(-n_groups // (max_workers * 4)))
+        jobs = [candidates[(keys >= first) & (keys < first + chunk_size)]
+                for first in range(0, n_groups, chunk_size)]
+        with SharedArrays(ranks=self.ranks, forward=self.forward, groups=self.groups) as shared, \
+                ProcessPoolExecutor(max_workers, initializer=_init_worker,
+                                    initargs=(shared.spec, self.metrics, self.periods_per_year)) as pool:
+            parts = list(pool.map(_evaluate_job, jobs))
+        return pd.concat(parts).sort_index()
+
+
+class SharedArrays:
+    """Named numpy arrays copied into shared-memory blocks for worker processes."""
+
+    def __init__(self, **arrays):
+        self._blocks = []
+        self.spec = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, array.dtype, buffer=block.buf)[:] = array
+            self._blocks.append(block)
+            self.spec[name] = (block.name, array.shape, array.dtype.str)
+
+    @staticmethod
+    def attach(spec):
+        """Return ``({name: array}, handles)``; keep ``handles`` alive while the arrays are used."""
+        arrays, handles = {}, []
+        for name, (block_name, shape, dtype) in spec.items():
+            block = shared_memory.SharedMemory(name=block_name)
+            handles.append(block)
+            arrays[name] = np.ndarray(shape, dtype, buffer=block.buf)
+        return arrays, handles
+
+    def close(self):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_worker_sweep = None
+_worker_handles = None
+
+
+def _init_worker(spec, metrics, periods_per_year):
+    global _worker_sweep, _worker_handles
+    arrays, _worker_handles = SharedArrays.attach(spec)
+    sweep = Sweep.__new__(Sweep)
+    sweep.ranks, sweep.forward, sweep.groups = arrays['ranks'], arrays['forward'], arrays['groups']
+    sweep.metrics, sweep.periods_per_year = metrics, periods_per_year
+    _worker_sweep = sweep
+
+
+def _evaluate_job(candidates):
+    return _worker_sweep.evaluate(candidates).set_index(candidates.index)
+
+
+class ResultStore:
+    """Sweep results kept in a SQLite file, one run per ``save``."""
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute('CREATE TABLE IF NOT EXISTS runs (run TEXT PRIMARY KEY, created REAL, '
+                         'candidates INTEGER, meta TEXT)')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._db.close()
+
+    def save(self, run, results, **meta):
+        """Store ``results`` (from ``Sweep.run``) under the name ``run``, replacing any earlier one."""
+        with self._db:
+            self._db.execute('DELETE FROM runs WHERE run = ?', (run,))
+            if self._db.execute("SELECT 1 FROM sqlite_master WHERE name = 'results'").fetchone():
+                self._db.execute('DELETE FROM results WHERE run = ?', (run,))
+            self._db.execute('INSERT INTO runs VALUES (?, ?, ?, ?)',
+                             (run, time.time(), len(results), json.dumps(meta, default=str)))
+        results.assign(run=run).to_sql('results', self._db, if_exists='append', index=False)
+        return run
+
+    def runs(self):
+        """One row per stored run."""
+        frame = pd.read_sql('SELECT * FROM runs ORDER BY created', self._db)
+        frame['created'] = pd.to_datetime(frame['created'], unit='s')
+        return frame.set_index('run')
+
+    def load(self, run=None):
+        """The results of ``run``, or of every run with a ``run`` column."""
+        if run is None:
+            return pd.read_sql('SELECT * FROM results', self._db)
+        return pd.read_sql('SELECT * FROM results WHERE run = ?', self._db, params=(run,))
+
+    def best(self, by='sharpe', n=10, run=None):
+        """The ``n`` best results by ``by`` (higher is better), across runs unless ``run`` is given."""
+        return self.load(run).nlargest(n, by).reset_index(drop=True)
@@ -0,0 +1,116 @@
+"""Synthetic universes and IEX-shaped batch responses.
+
+Benchmarks and offline runs need data without a live API. ``make_listing``
+builds a listing frame in the format of ``sp500.csv`` for any number of
+symbols. ``make_responses`` builds matching ``{symbol: {endpoint: payload}}``
+bodies for the ``quote``, ``stats`` and ``advanced-stats`` endpoints, with
+the field names of the real batch responses. It is the format
+``qvs.stub.StubServer`` serves and ``BatchIngestor.add_batch`` reads.
+Random fields are set to ``None`` at the ``missing`` rate. ``EBITDA`` and
+``grossProfit`` get an extra ``null_fundamentals`` rate. A ``negative``
+share of companies report losses, which gives negative P/E and EBITDA.
+"""
+
+import numpy as np
+import pandas as pd
+
+GICS_SECTORS = [
+    'Communication Services', 'Consumer Discretionary', 'Consumer Staples', 'Energy',
+    'Financials', 'Health Care', 'Industrials', 'Information Technology', 'Materials',
+    'Real Estate', 'Utilities',
+]
+
+ENDPOINTS = ('quote', 'stats', 'advanced-stats')
+
+
+def make_symbols(n, prefix='S'):
+    width = max(5, len(str(n - 1)))
+    return [f'{prefix}{i:0{width}d}' for i in range(n)]
+
+
+def make_listing(n, seed=0, prefix='S'):
+    """A listing frame with the columns of ``sp500.csv`` for ``n`` made-up companies."""
+    rng = np.random.default_rng(seed)
+    symbols = make_symbols(n, prefix)
+    sectors = rng.integers(0, len(GICS_SECTORS), n)
+    added = pd.Timestamp('1957-03-04') + pd.to_timedelta(rng.integers(0, 24000, n), unit='D')
+    return pd.DataFrame({
+        'Symbol': symbols,
+        'Security': [f'Company {symbol}' for symbol in symbols],
+        'GICS Sector': np.array(GICS_SECTORS)[sectors],
+        'GICS Sub-Industry': [f'{GICS_SECTORS[s]} {k}' for s, k in zip(sectors, rng.integers(0, 6, n))],
+        'Headquarters Location': 'Nowhere, Anystate',
+        'Date added': added.strftime('%Y-%m-%d'),
+        'CIK': 1000000 + np.arange(n),
+        'Founded': rng.integers(1850, 2015, n).astype(str),
+    })
+
+
+def make_responses(symbols, missing=0.05, null_fundamentals=0.05, negative=0.05,
+                   endpoints=ENDPOINTS, seed=0):
+    """Batch response bodies for ``symbols``: ``{symbol: {endpoint: payload}}``."""
+    rng = np.random.default_rng(seed)
+    n = len(symbols)
+
+    def column(values, rate=missing):
+        values = values.astype(object)
+        values[rng.random(n) < rate] = None
+        return values
+
+    losses = rng.random(n) < negative
+    price = np.round(rng.lognormal(4, 0.8, n), 2)
+    shares = np.round(rng.lognormal(19, 1.2, n))
+    market_cap = price * shares
+    revenue = market_cap / rng.lognormal(1, 0.6, n)
+    gross_profit = revenue * rng.uniform(0.1, 0.7, n)
+    ebitda = gross_profit * rng.uniform(0.2, 0.8, n) * np.where(losses, -0.5, 1.0)
+    earnings = np.where(losses, -rng.lognormal(0, 1, n), rng.lognormal(1.2, 0.5, n))
+    pe_ratio = np.round(price / earnings, 2)
+    enterprise_value = market_cap * rng.lognormal(0.1, 0.3, n)
+
+    fields = {
+        'latestPrice': column(price, 0),
+        'peRatio': column(pe_ratio),
+        'marketcap': column(market_cap),
+        'sharesOutstanding': column(shares),
+        'priceToBook': column(np.round(rng.lognormal(1, 0.7, n), 2)),
+        'priceToSales': column(np.round(market_cap / revenue, 2)),
+        'enterpriseValue': column(enterprise_value),
+        'EBITDA': column(ebitda, missing + null_fundamentals),
+        'grossProfit': column(gross_profit, missing + null_fundamentals),
+        'revenue': column(revenue),
+        'year1ChangePercent': column(rng.normal(0.1, 0.3, n)),
+        'month6ChangePercent': column(rng.normal(0.05, 0.2, n)),
+        'month3ChangePercent': column(rng.normal(0.02, 0.1, n)),
+        'month1ChangePercent': column(rng.normal(0.01, 0.05, n)),
+    }
+    # Convert once to Python floats/None so the payloads are JSON-ready.
+    fields = {name: [None if v is None else float(v) for v in values] for name, values in fields.items()}
+
+    layout = {
+        'quote': ('latestPrice', 'peRatio', 'marketcap'),
+        'stats': ('peRatio', 'marketcap', 'sharesOutstanding', 'year1ChangePercent',
+                  'month6ChangePercent', 'month3ChangePercent', 'month1ChangePercent'),
+        'advanced-stats': ('peRatio', 'marketcap', 'sharesOutstanding', 'priceToBook', 'priceToSales',
+                           'enterpriseValue', 'EBITDA', 'grossProfit', 'revenue', 'year1ChangePercent',
+                           'month6ChangePercent', 'month3ChangePercent', 'month1ChangePercent'),
+    }
+    responses = {}
+    for i, symbol in enumerate(symbols):
+        body = {}
+        for endpoint in endpoints:
+            payload = {name: fields[name][i] for name in layout[endpoint]}
+            if endpoint == 'quote':
+                # The quote endpoint spells it marketCap.
+                market_cap = payload.pop('marketcap')
+                payload = dict(symbol=symbol, marketCap=market_cap, **payload)
+            body[endpoint] = payload
+        responses[symbol] = body
+    return responses
+
+
+def split_batches(responses, batch_size=100):
+    """Split ``responses`` into the per-request bodies of ``batch_size``-symbol batch calls."""
+    symbols = list(responses)
+    return [{symbol: responses[symbol] for symbol in symbols[start:start + batch_size]}
+            for start in range(0, len(symbols), batch_size)]
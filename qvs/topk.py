@@ -0,0 +1,168 @@
+"""Partial top-N selection.
+
+The screener used to sort the whole universe just to keep 50 rows. ``top_n``
+finds the cut-off with ``np.partition`` (linear time) and only sorts the rows
+that make it in. Ties are broken deterministically: first by ``tie_break``
+(a column, ascending), then by position in the input.
+
+``StreamingTopK`` keeps a bounded top-N while scored batches arrive, so the
+selection is ready as soon as the last batch lands and the full scored frame
+never has to be held. It suits scores that are final per symbol, such as the
+raw P/E screen; RV percentiles need the whole universe before they exist.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def top_k_indices(scores, k, ascending=True, tie_keys=None):
+    """Positions of the ``k`` best ``scores``, best first.
+
+    ``NaN`` scores rank after every real score, as with ``sort_values``.
+    Equal scores are ordered by ``tie_keys`` (ascending) and then position.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    n = len(scores)
+    k = max(0, min(k, n))
+    if k == 0:
+        return np.empty(0, dtype=np.intp)
+
+    missing = np.isnan(scores)
+    key = np.where(missing, np.inf, scores if ascending else -scores)
+    if k < n:
+        cutoff = np.partition(key, k - 1)[k - 1]
+        candidates = np.flatnonzero(key <= cutoff)
+    else:
+        candidates = np.arange(n)
+
+    sort_keys = [candidates]
+    if tie_keys is not None:
+        codes, _ = pd.factorize(np.asarray(tie_keys)[candidates], sort=True)
+        sort_keys.append(codes)
+    sort_keys += [key[candidates], missing[candidates]]
+    order = np.lexsort(sort_keys)
+    return candidates[order[:k]]
+
+
+def rank_within_groups(scores, groups, ascending=True, tie_keys=None):
+    """0-based rank of every score inside its group (0 is the best), in one sort."""
+    scores = np.asarray(scores, dtype=np.float64)
+    missing = np.isnan(scores)
+    key = np.where(missing, np.inf, scores if ascending else -scores)
+    sort_keys = [np.arange(len(scores))]
+    if tie_keys is not None:
+        sort_keys.append(pd.factorize(np.asarray(tie_keys), sort=True)[0])
+    sort_keys += [key, missing, groups]
+    order = np.lexsort(sort_keys)
+    ordered_groups = np.asarray(groups)[order]
+    position = np.arange(len(order))
+    starts = np.ones(len(order), dtype=bool)
+    starts[1:] = ordered_groups[1:] != ordered_groups[:-1]
+    within = position - np.maximum.accumulate(np.where(starts, position, 0))
+    ranks = np.empty(len(order), dtype=np.intp)
+    ranks[order] = within
+    return ranks
+
+
+def top_n(frame, column, n, ascending=True, tie_break='Ticker', group_by=None, group_cap=None):
+    """Return the best ``n`` rows of ``frame`` by ``column``, sorted, with a fresh index.
+
+    A drop-in for ``frame.sort_values(column)[:n]``. ``tie_break`` names a
+    column used to order equal scores, or ``None`` to keep input order.
+    With ``group_by`` and ``group_cap`` (e.g. ``'GICS Sector'`` and 10) no
+    more than ``group_cap`` rows of any one group are selected; rows with no
+    group value are not capped.
+    """
+    scores = frame[column].to_numpy(dtype=np.float64)
+    tie_keys = None if tie_break is None else frame[tie_break].to_numpy()
+    if group_cap is None:
+        picks = top_k_indices(scores, n, ascending, tie_keys)
+    else:
+        groups, _ = pd.factorize(frame[group_by], sort=True)
+        # Rows without a group (code -1) are not capped, as in ``qvs.sweep``.
+        within = rank_within_groups(scores, groups, ascending, tie_keys)
+        eligible = np.flatnonzero((within < group_cap) | (groups < 0))
+        picks = eligible[top_k_indices(scores[eligible], n, ascending,
+                                       None if tie_keys is None else tie_keys[eligible])]
+    return frame.iloc[picks].reset_index(drop=True)
+
+
+class StreamingTopK:
+    """Maintain the top ``n`` rows by ``column`` across pushed batches.
+
+    The running top ``n`` is held as arrays: sort keys, tie-break values,
+    arrival positions and the batch each row came from. A ``push`` reads
+    only the batch's score and tie-break columns, drops the rows worse than
+    the current n-th best and re-selects among at most ``n`` plus one batch.
+    Only batches that still hold a top row are kept, and ``top`` builds the
+    DataFrame from them. Ties are ordered as in ``top_n`` over all the rows
+    pushed, in order.
+    """
+
+    def __init__(self, column, n, ascending=True, tie_break='Ticker'):
+        self.column = column
+        self.n = n
+        self.ascending = ascending
+        self.tie_break = tie_break
+        self.seen = 0
+        self._key = np.empty(0)
+        self._missing = np.empty(0, dtype=bool)
+        self._ties = np.empty(0, dtype=object)
+        self._position = np.empty(0, dtype=np.intp)
+        self._source = np.empty(0, dtype=np.intp)
+        self._batches = {}
+        self._empty = pd.DataFrame(columns=[column])
+
+    def push(self, batch):
+        """Offer a DataFrame of newly scored rows."""
+        if not self.seen:
+            self._empty = batch.iloc[:0]
+        offset = self.seen
+        self.seen += len(batch)
+        scores = batch[self.column].to_numpy(dtype=np.float64)
+        missing = np.isnan(scores)
+        key = np.where(missing, np.inf, scores if self.ascending else -scores)
+        rows = np.arange(len(batch))
+        if len(self._key) >= self.n:
+            # Rows worse than the current n-th best can never make it in.
+            cutoff = self._key[-1] if self.n else -np.inf
+            rows = np.flatnonzero(key <= cutoff)
+        if len(rows) == 0:
+            return self
+
+        key = np.concatenate([self._key, key[rows]])
+        missing = np.concatenate([self._missing, missing[rows]])
+        position = np.concatenate([self._position, offset + rows])
+        source = np.concatenate([self._source, np.full(len(rows), offset, dtype=np.intp)])
+        sort_keys = [position]
+        if self.tie_break is not None:
+            ties = np.concatenate([self._ties, batch[self.tie_break].to_numpy()[rows]])
+            # Tie-break codes are only needed when some keys are equal.
+            if len(np.unique(key)) < len(key):
+                sort_keys.append(pd.factorize(ties, sort=True)[0])
+        sort_keys += [key, missing]
+        keep = np.lexsort(sort_keys)[:self.n]
+
+        self._key, self._missing = key[keep], missing[keep]
+        self._position, self._source = position[keep], source[keep]
+        if self.tie_break is not None:
+            self._ties = ties[keep]
+        self._batches[offset] = batch
+        live = set(self._source.tolist())
+        for dead in [source for source in self._batches if source not in live]:
+            del self._batches[dead]
+        return self
+
+    @property
+    def top(self):
+        """The current top ``n`` rows, best first."""
+        if not len(self._position):
+            return self._empty.copy()
+        sources = pd.unique(self._source)
+        ranks, pieces = [], []
+        for source in sources:
+            taken = np.flatnonzero(self._source == source)
+            ranks.append(taken)
+            pieces.append(self._batches[source].iloc[self._position[taken] - source])
+        frame = pd.concat(pieces, ignore_index=True) if len(pieces) > 1 else pieces[0]
+        return frame.iloc[np.argsort(np.concatenate(ranks))].reset_index(drop=True)
@@ -0,0 +1,322 @@
+"""Stock universes to screen.
+
+A ``Universe`` is a named list of symbols plus the rows of the listing file
+they came from (``GICS Sector``, ``GICS Sub-Industry`` and so on). Besides
+the S&P 500 in ``sp500.csv``, any CSV with a ``Symbol`` column works, and
+``sector_universes`` splits one listing into a universe per sector. Listings
+are read with the compact dtypes of ``qvs.compact.read_listing``.
+
+A listing is a snapshot. ``MembershipIndex`` keeps membership over time as
+intervals keyed by ``CIK``, so a ticker change continues the same
+membership instead of looking like one stock leaving and another joining.
+Each call to ``update`` diffs a new listing against the current members and
+closes or opens only the intervals that changed. Alongside, a boolean
+matrix records which intervals are active after every change date. "Members
+as of D" is then a binary search for D plus one row read, and ``mask`` answers
+it for every rebalance date of a backtest at once. The index also keeps the
+100-symbol request batches of the last run. An update patches only the
+batches that lost or gained symbols, so refetching and cache invalidation
+scale with the number of membership changes, not with the universe.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from qvs.compact import read_listing
+from qvs.fetch import chunks
+
+DEFAULT_LISTING = 'sp500.csv'
+
+
+class Universe:
+    """A named set of symbols to screen."""
+
+    def __init__(self, name, symbols, info=None):
+        self.name = name
+        self.symbols = list(symbols)
+        self.info = info
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __repr__(self):
+        return f'Universe({self.name!r}, {len(self.symbols)} symbols)'
+
+
+def load_universe(path=DEFAULT_LISTING, name=None, sector=None, sub_industry=None, columns=None):
+    """Read a listing CSV, optionally restricted to one GICS sector or sub-industry.
+
+    ``columns`` limits the listing columns kept in ``info`` (default: all).
+    """
+    stocks = read_listing(path, columns)
+    if sector is not None:
+        stocks = stocks[stocks['GICS Sector'] == sector]
+    if sub_industry is not None:
+        stocks = stocks[stocks['GICS Sub-Industry'] == sub_industry]
+    stocks = stocks.reset_index(drop=True)
+    name = name or sector or sub_industry or os.path.splitext(os.path.basename(path))[0]
+    return Universe(name, stocks['Symbol'], stocks)
+
+
+def sector_universes(universe, column='GICS Sector'):
+    """Split ``universe`` into one universe per value of ``column``."""
+    return [Universe(value, group['Symbol'], group.reset_index(drop=True))
+            for value, group in universe.info.groupby(column, sort=True, observed=True)]
+
+
+class MembershipChanges:
+    """Symbols that joined, left or changed ticker, and the batches that were rewritten."""
+
+    def __init__(self, added=(), removed=(), renamed=None, batches=()):
+        self.added = list(added)
+        self.removed = list(removed)
+        self.renamed = dict(renamed or {})
+        self.batches = list(batches)
+
+    @property
+    def entering(self):
+        """Symbols with nothing fetched under their ticker yet: additions and new tickers."""
+        return self.added + list(self.renamed.values())
+
+    @property
+    def leaving(self):
+        """Symbols no longer in the universe under that ticker: removals and old tickers."""
+        return self.removed + list(self.renamed)
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.renamed)
+
+    def __repr__(self):
+        return (f'MembershipChanges({len(self.added)} added, {len(self.removed)} removed, '
+                f'{len(self.renamed)} renamed)')
+
+
+def rebatch(batches, changes, chunk_size=100):
+    """Patch request batches for ``changes``; return ``(batches, indices of rewritten batches)``.
+
+    Leaving symbols are taken out of their batch and entering ones fill the
+    gaps, first batch first, before any new batch is started. Untouched
+    batches keep their exact symbols and order. Emptied batches are dropped.
+    """
+    leaving = set(changes.leaving)
+    batches = [list(batch) for batch in batches]
+    changed = set()
+    for i, batch in enumerate(batches):
+        kept = [symbol for symbol in batch if symbol not in leaving]
+        if len(kept) != len(batch):
+            batches[i] = kept
+            changed.add(i)
+    pending = [symbol for symbol in changes.entering if symbol not in leaving]
+    for i, batch in enumerate(batches):
+        if pending and len(batch) < chunk_size:
+            room = chunk_size - len(batch)
+            batch.extend(pending[:room])
+            pending = pending[room:]
+            changed.add(i)
+    for group in chunks(pending, chunk_size):
+        changed.add(len(batches))
+        batches.append(list(group))
+
+    kept = [i for i, batch in enumerate(batches) if batch]
+    position = {old: new for new, old in enumerate(kept)}
+    return [batches[i] for i in kept], sorted(position[i] for i in changed if i in position)
+
+
+class MembershipIndex:
+    """Dated index membership, keyed by CIK, with the request batches of the last update.
+
+    ``intervals`` has one row per (CIK, ticker) stretch of membership:
+    ``CIK``, ``Symbol``, ``Start`` and ``End`` (``NaT`` while still a member).
+    """
+
+    COLUMNS = ['CIK', 'Symbol', 'Start', 'End']
+
+    def __init__(self, intervals=None, updated=None, batches=None, chunk_size=100):
+        if intervals is None:
+            intervals = pd.DataFrame({'CIK': np.array([], dtype=np.int64), 'Symbol': np.array([], dtype=object),
+                                      'Start': pd.DatetimeIndex([]), 'End': pd.DatetimeIndex([])})
+        self.intervals = intervals[self.COLUMNS].reset_index(drop=True)
+        self.updated = None if updated is None else pd.Timestamp(updated)
+        self.chunk_size = chunk_size
+        self._build()
+        self.batches = [list(batch) for batch in batches] if batches is not None else \
+            [list(group) for group in chunks(self.symbols(), chunk_size)]
+
+    def _build(self):
+        """Recompute the change dates and the (change dates x intervals) activity matrix."""
+        start = self.intervals['Start'].to_numpy(dtype='datetime64[ns]')
+        end = self.intervals['End'].to_numpy(dtype='datetime64[ns]')
+        open_ = np.isnat(end)
+        self.dates = pd.DatetimeIndex(np.unique(np.concatenate([start, end[~open_]])))
+        start_rows = self.dates.searchsorted(start)
+        end_rows = np.where(open_, len(self.dates), self.dates.searchsorted(end))
+        rows = np.arange(len(self.dates))[:, None]
+        self.active = (rows >= start_rows) & (rows < end_rows)
+        self._cik = self.intervals['CIK'].to_numpy(dtype=np.int64)
+        self._symbol = self.intervals['Symbol'].to_numpy(dtype=object)
+
+    def __len__(self):
+        return int(self.intervals['End'].isna().sum())
+
+    def __repr__(self):
+        return f'MembershipIndex({len(self)} members, {len(self.intervals)} intervals, updated {self.updated})'
+
+    @classmethod
+    def from_listing(cls, listing, as_of=None, chunk_size=100):
+        """Start an index from a listing: every row is a member since its ``Date added``.
+
+        Rows without ``Date added`` start at ``as_of`` (default: today).
+        """
+        as_of = pd.Timestamp(as_of or pd.Timestamp.today()).normalize()
+        index = cls(updated=as_of, batches=[], chunk_size=chunk_size)
+        index.update(listing, as_of)
+        return index
+
+    def _rows_at(self, dates):
+        """Row of ``active`` in effect on each of ``dates`` (-1 before the first change)."""
+        return self.dates.searchsorted(pd.DatetimeIndex(dates), 'right') - 1
+
+    def _active_at(self, date):
+        """Boolean mask of the intervals active on ``date`` (default: now)."""
+        if date is None:
+            return self.intervals['End'].isna().to_numpy()
+        row = self._rows_at([date])[0]
+        return self.active[row] if row >= 0 else np.zeros(len(self.intervals), dtype=bool)
+
+    def members(self, date=None):
+        """``CIK`` and ``Symbol`` of the members on ``date`` (default: now)."""
+        active = self._active_at(date)
+        return pd.DataFrame({'CIK': self._cik[active], 'Symbol': self._symbol[active]})
+
+    def symbols(self, date=None):
+        """Tickers of the members on ``date`` (default: now)."""
+        return self._symbol[self._active_at(date)].tolist()
+
+    def universe(self, date=None, name='members'):
+        """The members on ``date`` as a ``Universe``."""
+        members = self.members(date)
+        return Universe(name, members['Symbol'], members)
+
+    def mask(self, dates, symbols):
+        """Boolean (dates x symbols) matrix: was the symbol a member on the date?
+
+        A ticker is matched only while a membership interval carried it, so a
+        stock that changed ticker is a member under each name in turn.
+        """
+        rows = self._rows_at(dates)
+        columns = pd.Index(symbols).get_indexer(self.intervals['Symbol'])
+        used = columns >= 0
+        active = self.active[np.maximum(rows, 0)][:, used] & (rows >= 0)[:, None]
+        out = np.zeros((len(rows), len(symbols)), dtype=bool)
+        np.logical_or.at(out, (slice(None), columns[used]), active)
+        return out
+
+    def changes(self, start, end=None):
+        """``MembershipChanges`` between the members on ``start`` and on ``end`` (default: now)."""
+        before, after = self.members(start), self.members(end)
+        return _diff(before, after)[0]
+
+    def update(self, listing, as_of=None):
+        """Record the membership in ``listing`` as of ``as_of`` and return the ``MembershipChanges``.
+
+        Stocks are matched on ``CIK`` and ticker. A CIK that keeps its
+        listing row under a new ticker is a rename. Leavers, renames and joiners
+        without a usable ``Date added`` change on ``as_of`` (default: today);
+        a joiner's ``Date added`` is used when it falls since the last update.
+        """
+        as_of = pd.Timestamp(as_of or pd.Timestamp.today()).normalize()
+        if self.updated is not None and as_of < self.updated:
+            raise ValueError(f'update as of {as_of.date()} is before the last update ({self.updated.date()})')
+        if listing['CIK'].isna().any():
+            raise ValueError(f"listing rows without a CIK: {list(listing.loc[listing['CIK'].isna(), 'Symbol'])}")
+        new = listing.drop_duplicates('Symbol')
+        current = self.intervals[self.intervals['End'].isna()]
+        changes, gone, fresh = _diff(current[['CIK', 'Symbol']], new[['CIK', 'Symbol']])
+
+        intervals = self.intervals.copy()
+        intervals.loc[gone, 'End'] = as_of
+        added = new[new['Symbol'].isin(fresh)]
+        start = pd.Series(as_of, index=added.index)
+        if 'Date added' in added:
+            since = pd.Timestamp.min if self.updated is None or not len(self.intervals) else self.updated
+            dated = pd.to_datetime(added['Date added'])
+            usable = dated.notna() & (dated >= since) & (dated <= as_of) & added['Symbol'].isin(changes.added)
+            start[usable] = dated[usable]
+        joined = pd.DataFrame({'CIK': added['CIK'].astype(np.int64), 'Symbol': added['Symbol'].astype(object),
+                               'Start': start.to_numpy(dtype='datetime64[ns]'), 'End': pd.NaT})
+        intervals = pd.concat([intervals, joined], ignore_index=True)
+        # An interval that opens and closes on the same day never held.
+        self.intervals = intervals[~(intervals['End'] <= intervals['Start'])].reset_index(drop=True)
+        self.batches, changes.batches = rebatch(self.batches, changes, self.chunk_size)
+        self.updated = as_of
+        self._build()
+        return changes
+
+    def save(self, path):
+        """Write the index and its batches to a JSON file."""
+        intervals = self.intervals
+        state = {
+            'updated': None if self.updated is None else self.updated.strftime('%Y-%m-%d'),
+            'chunk_size': self.chunk_size,
+            'intervals': {
+                'CIK': intervals['CIK'].astype(np.int64).tolist(),
+                'Symbol': intervals['Symbol'].astype(str).tolist(),
+                'Start': intervals['Start'].dt.strftime('%Y-%m-%d').tolist(),
+                'End': [None if pd.isna(end) else end.strftime('%Y-%m-%d') for end in intervals['End']],
+            },
+            'batches': self.batches,
+        }
+        with open(path, 'w') as f:
+            json.dump(state, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            state = json.load(f)
+        raw = state['intervals']
+        intervals = pd.DataFrame({'CIK': np.array(raw['CIK'], dtype=np.int64),
+                                  'Symbol': np.array(raw['Symbol'], dtype=object),
+                                  'Start': pd.to_datetime(raw['Start']), 'End': pd.to_datetime(raw['End'])})
+        return cls(intervals, state['updated'], state['batches'], state['chunk_size'])
+
+    @classmethod
+    def sync(cls, path, listing, as_of=None, cache=None):
+        """Update the index saved at ``path`` (or start one) from ``listing`` and save it.
+
+        Returns ``(index, changes)``. With a ``ResponseCache``, responses for
+        the tickers that left are dropped from it.
+        """
+        if os.path.exists(path):
+            index = cls.load(path)
+            changes = index.update(listing, as_of)
+        else:
+            index = cls.from_listing(listing, as_of)
+            changes = MembershipChanges(added=index.symbols(), batches=range(len(index.batches)))
+        if cache is not None and changes.leaving:
+            cache.drop(changes.leaving)
+        index.save(path)
+        return index, changes
+
+
+def _diff(before, after):
+    """``(MembershipChanges, index labels of leaving rows in before, entering symbols)``.
+
+    Rows match on (CIK, Symbol). Unmatched rows of the same CIK are paired
+    up in ticker order as renames; the rest joined or left.
+    """
+    merged = before.reset_index().merge(after[['CIK', 'Symbol']], on=['CIK', 'Symbol'], how='outer',
+                                        indicator=True)
+    gone = merged[merged['_merge'] == 'left_only'].sort_values('Symbol')
+    fresh = merged[merged['_merge'] == 'right_only'].sort_values('Symbol')
+    gone = gone.assign(nth=gone.groupby('CIK').cumcount())
+    fresh = fresh.assign(nth=fresh.groupby('CIK').cumcount())
+    pairs = gone.merge(fresh, on=['CIK', 'nth'], suffixes=('', ' New'))
+    changes = MembershipChanges(
+        added=fresh.loc[~fresh['Symbol'].isin(pairs['Symbol New']), 'Symbol'],
+        removed=gone.loc[~gone['Symbol'].isin(pairs['Symbol']), 'Symbol'],
+        renamed=dict(zip(pairs['Symbol'], pairs['Symbol New'])),
+    )
+    return changes, gone['index'].astype(np.int64).to_numpy(), list(fresh['Symbol'])
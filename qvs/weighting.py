@@ -0,0 +1,175 @@
+"""Portfolio weighting schemes and vectorized position sizing.
+
+A weighting scheme turns the selected stocks (best first) into weights that
+sum to 1. ``SCHEMES`` holds the built-in ones and can be extended:
+
+* ``equal`` - the same weight for every stock.
+* ``80-20`` - the original tiers: the top 20% of stocks get 80% of the capital.
+* ``score`` - proportional to ``1 - RV Score``, so cheaper stocks get more.
+* ``inverse-volatility`` - proportional to ``1 / volatility``. IEX has no
+  volatility field, so the frame needs a ``Volatility`` column added by the
+  caller (e.g. from price history).
+* ``market-cap`` - proportional to ``Market Capitalization`` (ingested from
+  ``advanced-stats``), no stock above ``cap``.
+
+``share_counts`` converts weights into whole shares for one or many portfolio
+sizes at once, optionally spending the leftover cash on extra shares.
+"""
+
+import numpy as np
+
+
+def equal_weights(n):
+    return np.full(n, 1.0 / n) if n else np.empty(0)
+
+
+def tiered_weights(n, tiers=((0.2, 0.8), (0.8, 0.2))):
+    """Split capital across rank tiers given as ``(share of stocks, share of capital)``.
+
+    The default is the 80-20 principle: with 50 stocks the first 10 get 8%
+    each and the other 40 get 0.5% each.
+    """
+    counts = [int(round(n * stocks)) for stocks, _ in tiers[:-1]]
+    counts.append(n - sum(counts))
+    weights = np.concatenate([np.full(count, capital / count) if count else np.empty(0)
+                              for count, (_, capital) in zip(counts, tiers)])
+    return weights / weights.sum() if n else weights
+
+
+def proportional_weights(values):
+    """Weights proportional to ``values`` along the last axis; non-positive values get 0."""
+    values = np.where(np.isfinite(values) & (values > 0), values, 0.0)
+    totals = values.sum(axis=-1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(totals > 0, values / totals, 0.0)
+
+
+def capped_weights(values, cap):
+    """Proportional weights with every weight held at or below ``cap``.
+
+    Weight cut from capped stocks is handed to the uncapped ones in proportion
+    to their weight, repeating until no stock is over the cap. If ``cap`` is
+    below ``1 / n`` the weights cannot all fit and every stock ends at ``cap``.
+    """
+    weights = proportional_weights(np.asarray(values, dtype=np.float64))
+    capped = np.zeros(weights.shape, dtype=bool)
+    for _ in range(weights.shape[-1]):
+        over = weights > cap + 1e-12
+        if not over.any():
+            break
+        capped |= over
+        excess = np.where(over, weights - cap, 0.0).sum(axis=-1, keepdims=True)
+        weights = np.where(over, cap, weights)
+        free = np.where(capped, 0.0, weights)
+        free_total = free.sum(axis=-1, keepdims=True)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weights = np.where(capped | (free_total == 0), weights, weights + excess * free / free_total)
+    return weights
+
+
+def _equal(frame):
+    return equal_weights(len(frame))
+
+
+def _eighty_twenty(frame, tiers=((0.2, 0.8), (0.8, 0.2))):
+    return tiered_weights(len(frame), tiers)
+
+
+def _column(frame, column, scheme):
+    """``frame[column]`` as floats, or a ``ValueError`` naming what the scheme is missing."""
+    if column not in frame:
+        raise ValueError(f'weighting scheme {scheme!r} needs a {column!r} column')
+    return frame[column].to_numpy(dtype=np.float64)
+
+
+def _score(frame, column='RV Score'):
+    return proportional_weights(1 - _column(frame, column, 'score'))
+
+
+def _inverse_volatility(frame, column='Volatility'):
+    with np.errstate(divide='ignore'):
+        return proportional_weights(1 / _column(frame, column, 'inverse-volatility'))
+
+
+def _market_cap(frame, column='Market Capitalization', cap=0.05):
+    return capped_weights(_column(frame, column, 'market-cap'), cap)
+
+
+# Scheme name -> function(frame, **options) returning one weight per row.
+SCHEMES = {
+    'equal': _equal,
+    '80-20': _eighty_twenty,
+    'score': _score,
+    'inverse-volatility': _inverse_volatility,
+    'market-cap': _market_cap,
+}
+
+
+def scheme_weights(frame, scheme='equal', **options):
+    """Weights for the rows of ``frame`` (best first) under a named scheme."""
+    try:
+        func = SCHEMES[scheme]
+    except KeyError:
+        raise ValueError(f'unknown weighting scheme {scheme!r}; choose from {sorted(SCHEMES)}') from None
+    return func(frame, **options)
+
+
+def share_counts(prices, weights, portfolio_size, redistribute=False, max_rounds=10):
+    """Whole shares to buy, and the cash left over, for every portfolio size.
+
+    ``weights`` is ``(stocks,)`` or ``(..., stocks)`` and ``portfolio_size`` a
+    scalar or an array that broadcasts against ``weights[..., 0]``, so many
+    what-if sizes (or weight vectors) are sized in one call. Stocks without a
+    usable price get no shares.
+
+    With ``redistribute`` the cash left after rounding down is spent on one
+    extra share at a time, going first to the stocks furthest below their
+    target allocation, for up to ``max_rounds`` rounds. Stocks with no
+    target weight never get one.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    sizes = np.asarray(portfolio_size, dtype=np.float64)[..., None]
+    valid = np.isfinite(prices) & (prices > 0)
+    safe_prices = np.where(valid, prices, np.inf)
+
+    targets = sizes * weights
+    shares = np.floor(targets / safe_prices)
+    leftover = sizes[..., 0] - (shares * np.where(valid, prices, 0)).sum(axis=-1)
+
+    if redistribute:
+        shares, leftover = _spend_leftover(shares, leftover, targets, prices, valid, max_rounds)
+    return shares.astype(np.int64), leftover
+
+
+def _spend_leftover(shares, leftover, targets, prices, valid, max_rounds):
+    invested = shares * np.where(valid, prices, 0)
+    prices = np.broadcast_to(np.where(valid, prices, np.inf), shares.shape)
+    for _ in range(max_rounds):
+        affordable = (prices <= leftover[..., None]) & (targets > 0)
+        shortfall = np.where(affordable, targets - invested, -np.inf)
+        order = np.argsort(-shortfall, axis=-1, kind='stable')
+        ordered = np.take_along_axis(np.where(affordable, prices, 0), order, axis=-1)
+        # Buy one share of each affordable stock, most under-allocated first, while cash lasts.
+        spent = np.cumsum(ordered, axis=-1)
+        buy_ordered = np.take_along_axis(affordable, order, axis=-1) & (spent <= leftover[..., None])
+        if not buy_ordered.any():
+            break
+        buy = np.zeros(shares.shape, dtype=bool)
+        np.put_along_axis(buy, order, buy_ordered, axis=-1)
+        shares = shares + buy
+        invested = invested + np.where(buy, prices, 0)
+        leftover = leftover - np.where(buy, prices, 0).sum(axis=-1)
+    return shares, leftover
+
+
+def allocate(frame, portfolio_size, scheme='equal', redistribute=False,
+             price_column='Price', shares_column='Number of Shares to Buy', **options):
+    """Add weight, share-count and dollar-allocation columns to ``frame`` and return it."""
+    weights = scheme_weights(frame, scheme, **options)
+    prices = frame[price_column].to_numpy(dtype=np.float64)
+    shares, _ = share_counts(prices, weights, float(portfolio_size), redistribute)
+    frame['Weight'] = weights
+    frame[shares_column] = shares
+    frame['Dollar Allocation'] = shares * np.where(np.isfinite(prices), prices, 0)
+    return frame